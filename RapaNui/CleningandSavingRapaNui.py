@@ -34,226 +34,14 @@ import numpy as np
 import pandas as pd
 import os
 import platform
-from scipy.interpolate import interp1d
 import warnings
+from __toolsSondes import cargar_almacen
+from __toolsInterpolacion import (Z_INTERP, ascendentes, interpolar_sondeos,
+                                  columna_ozono)
 
 
 
 
-def remov_desc(df):
-    """
-    Remove rows with points in sonde data that are descending in altitude 
-    during flight time
-    
-    Parameters
-    ----------
-    df : DataFrame
-        DataFrame with data per launch.
-
-    Returns
-    -------
-    df_clean : DataFrame
-        DataFrame without points that are descending in profile
-
-    """
-    
-    # Extract altitude
-    z = df.GPHeight.values
-    
-    # Find z decreasing
-    i_zasc = [0]
-    zant = z[0]
-    for i in range(1,len(z)):
-        if z[i] > zant:
-            zant = z[i]
-            i_zasc.append(i)
-        else:
-            pass
-            
-    # remove zdec in dataframe
-    df_clean = df.iloc[i_zasc]
-    
-    return df_clean
-
-
-
-def ozone_column(pO3, pressure, z, z_intp, type_intp='linear', prof_val=0,  
-                 Hinf=[], Hsup=[], dHmax = 0.3):
-    """
-    Calculate ozone column profile and interpolate to regular altitudes in array z. 
-    Return profile with nan's if serie does not validate. If it is validate and Hinf 
-    and Hsup are not [], there are 2 posibilities:
-        - If atmospheric layer depth is less than dHmax (by defeault = 1 km), 
-          points inside this layer don't be considerated for interpolation
-        - If atmospheric layer depth is greater than dHmax (by defeault = 1 km), 
-          points inside this layer are set to nan's.
-
-    Parameters
-    ----------
-    pO3 : array
-        Ozone partial pressure profile in [mPa].
-    pressure : array
-        Atmospheric pressure profile in [hPa].
-    z : array
-        Array with altitudes measured altitudes in [km].
-    z_intp : array
-        Array with altitudes where interpolate in [km].
-    type_intp : str, optional
-        Type of interpolation. The default is 'linear'.
-    prof_val: int or float
-        Indicate if serie is validated. If it is not validated, prof_val=0; if
-        it is validated, prof_val=1 if is. By defalt prof_val=0
-    Hinf: list
-        Contains lower limit of atmospheric layers does not validate in [km]. By 
-        default is []
-    Hsup: list
-        Contains upper limit of atmospheric layers does not validate in [km]. By
-        default is []
-    dHmax: float
-        Maximum atmospheric layer depth, in km, to interpolate with missing data
-
-
-    Returns
-    -------
-    serie_intp : array
-        Variable interpolated to regular altitudes.
-
-    """
-    
-    # If profile doesn't validated, return profile interpolated with nan's
-    if prof_val == 0:
-        
-        O3_col_intp = np.nan * np.zeros(len(z_intp))
-        
-        return O3_col_intp
-    
-    
-    # If profile is validated, to interpolate data
-    
-    # copy original data to interpolate
-    z_cp = z.copy()
-    pO3_cp = pO3.copy()
-    pressure_cp = pressure.copy()
-
-    # Remove individual nan's
-    ind = ~np.isnan(pO3_cp) & ~np.isnan(pressure_cp)
-    z_cp = z_cp[ind]    
-    pressure_cp = pressure_cp[ind]
-    pO3_cp = pO3_cp[ind]  
-
-    
-    if len(Hinf) > 0:
-        for i in range(len(Hinf)):
-            dH = Hsup[i] - Hinf[i]
-            
-            if dH <= dHmax:
-                pO3_cp = pO3_cp[(z_cp < Hinf[i]) | (z_cp > Hsup[i])]
-                pressure_cp = pressure_cp[(z_cp < Hinf[i]) | (z_cp > Hsup[i])]
-                z_cp = z_cp[(z_cp < Hinf[i]) | (z_cp > Hsup[i])]
-                
-                
-            else: #dH > dHmax
-                pO3_cp[(z_cp >= Hinf[i]) & (z_cp <= Hsup[i])] = np.nan
-                pressure_cp[(z_cp >= Hinf[i]) & (z_cp <= Hsup[i])] = np.nan
-                z_cp[(z_cp >= Hinf[i]) & (z_cp <= Hsup[i])] = np.nan
-            
-    
-    # Calculate ozone by layers
-    dO3 =  3.9449*(pO3_cp[0:-1] + pO3_cp[1:]) * np.log(pressure_cp[0:-1]/pressure_cp[1:])
-    # Integrate ozone
-    O3_col = np.cumsum(dO3)
-    
-    # Interpolate ozone column
-    O3_f = interp1d(z_cp[0:-1], O3_col, type_intp, bounds_error=False)
-    O3_col_intp = O3_f(z_intp)
-
-    
-    return O3_col_intp
-
-
-
-
-def interp_serie(z_intp, z, serie, type_intp='linear', prof_val=0, Hinf=[], 
-                 Hsup=[], dHmax = 0.3):
-    """
-    Interpolate vertical profiles to regular altitudes in array z. Return
-    profile with nan's if serie does not validate. If it is validate and Hinf 
-    and Hsup are not [], there are 2 posibilities:
-        - If atmospheric layer depth is less than dHmax (by defeault = 0.3 km), 
-          points inside this layer don't be considerated for interpolation
-        - If atmospheric layer depth is greater than dHmax (by defeault = 0.3 km), 
-          points inside this layer are set to nan's.
-
-    Parameters
-    ----------
-    z_intp : array
-        Array with altitudes where interpolate in [km].
-    z : array
-        Array with altitudes measured altitudes in [km].
-    serie : array
-        Measured variable to interpolate.
-    type_intp : str, optional
-        Type of interpolation. The default is 'linear'.
-    prof_val: int or float
-        Indicate if serie is validated. If it is not validated, prof_val=0; if
-        it is validated, prof_val=1 if is. By defalt prof_val=0
-    Hinf: list
-        Contains lower limit of atmospheric layers does not validate in [km]. By 
-        default is []
-    Hsup: list
-        Contains upper limit of atmospheric layers does not validate in [km]. By
-        default is []
-    dHmax: float
-        Maximum atmospheric layer depth, in km, to interpolate with missing data
-
-    Returns
-    -------
-    serie_intp : array
-        Variable interpolated to regular altitudes.
-
-    """
-    
-    # If profile doesn't validated, return profile interpolated with nan's
-    if prof_val == 0:
-        
-        serie_intp = np.nan * np.zeros(len(z_intp))
-        
-        return serie_intp
-    
-    
-    # If profile is validated, to interpolate data
-    
-    # copy original data to interpolate
-    z_cp = z.copy()
-    serie_cp = serie.copy()
-
-    # Remove individual nan's in serie
-    z_cp = z_cp[~np.isnan(serie_cp)]    
-    serie_cp = serie_cp[~np.isnan(serie_cp)]  
-    
-    if len(Hinf) > 0:
-        for i in range(len(Hinf)):
-            dH = Hsup[i] - Hinf[i]
-            
-            if dH <= dHmax:
-                serie_cp = serie_cp[(z_cp < Hinf[i]) | (z_cp > Hsup[i])]
-                z_cp = z_cp[(z_cp < Hinf[i]) | (z_cp > Hsup[i])]
-                
-                
-            else: #dH > dHmax
-                serie_cp[(z_cp >= Hinf[i]) & (z_cp <= Hsup[i])] = np.nan
-                z_cp[(z_cp >= Hinf[i]) & (z_cp <= Hsup[i])] = np.nan
-            
-    
-    # Interpolate data
-    serie_f = interp1d(z_cp, serie_cp, type_intp, bounds_error=False)
-    serie_intp = serie_f(z_intp)
-
-    
-    return serie_intp
-
-
-
 def df_to_csv(df_interp, launch_datetime, z0):
     """
     Save dataFrame with sonde data to file .csv
@@ -275,8 +63,8 @@ def df_to_csv(df_interp, launch_datetime, z0):
     
     
     # Lauch date and launch time to str
-    date_str = date.strftime('%Y%m%d')
-    time_str = date.strftime('%H:%M')
+    date_str = launch_datetime.strftime('%Y%m%d')
+    time_str = launch_datetime.strftime('%H:%M')
     # Launch altitude to str
     z0_str = str(z0)
     
@@ -324,7 +112,7 @@ def df_to_csv(df_interp, launch_datetime, z0):
     pd.DataFrame([hd1, hd2]).to_csv(path_fn, mode='a', sep='\t', header=False, index=False)
     
     # Save data
-    df_clear.to_csv(path_fn, mode='a', sep='\t', header=False)
+    df_interp.to_csv(path_fn, mode='a', sep='\t', header=False)
     
     
     return()
@@ -339,7 +127,8 @@ path = os.getcwd()
 
 # Read data ozonosondes
 fn_allsondes = os.path.join(path, 'RapaNui_all_ozonesondes.csv')
-dfold = pd.read_csv(fn_allsondes, delimiter=';', index_col=0, parse_dates=True)
+# (ragged array store of the file, __toolsSondes)
+almacen = cargar_almacen(fn_allsondes)
 
 # Read dates launch
 fn_validate = os.path.join(path, 'RapaNui_dates_valid.csv')
@@ -354,23 +143,28 @@ Cp=29.19; #(J/(mol K))
 
 
 # Height to interpolate, between 0-35 km every 100 m
-z = np.arange(0,35.1, 0.1)
+z = Z_INTERP
 
 # Output filename with all soundings interpolated
 fn_clear_all = os.path.join(path, 'RapaNui_all_clear.csv')
 
+# ignore warnings
+warnings.filterwarnings("ignore")
 
-# Make dataframe for data complete
-dfold_clear = pd.DataFrame()
 
+# Validation info per launch. Only the bookkeeping is done launch by launch,
+# the interpolation of all the launches is done at once below
+# (__toolsInterpolacion)
+launches = []
+val = {}
+capas = {}
+grupos = ['P', 'T', 'RH', 'Theta', 'W', 'Thetae', 'V', 'O3', 'O3ppbv', 'O3col']
+for g in grupos:
+    val[g] = []
+    capas[g] = []
 
 for date in dates:
     
-    # ignore warnings
-    warnings.filterwarnings("ignore")
-    
-    print(date)
-    
     # Extract info about validation profiles at date
     val_info = df_validate.loc[date]
     # Ozone
@@ -395,185 +189,180 @@ for date in dates:
     Hsup_V = val_info.Height_sup_V
     
     
-    # If the profile is not repeated, then interpolate
-    if val_O3 != -1:
+    # If the profile is repeated, it is not interpolated
+    if val_O3 == -1:
+        continue
     
-        # Correct validate profile value according to validity of ozone profile
-        # if ozone profile is not validated, the other variables will not be valid.
-        if val_O3 == 0:
-            val_T = 0
-            val_P = 0
-            val_RH = 0
-            val_V = 0
-        
-        # Correct to list
-        # Ozone
-        if np.isnan(Hinf_O3): Hinf_O3 = []; Hsup_O3 = []
-        else: Hinf_O3 = [Hinf_O3]; Hsup_O3 = [Hsup_O3]
-        # Temperature
-        if np.isnan(Hinf_T): Hinf_T = []; Hsup_T = []
-        else: Hinf_T = [Hinf_T]; Hsup_T = [Hsup_T]
-        # Pressure
-        if np.isnan(Hinf_P): Hinf_P = []; Hsup_P = []
-        else: Hinf_P = [Hinf_P]; Hsup_P = [Hsup_P]
-        # Relative Humidity
-        if np.isnan(Hinf_RH): Hinf_RH = []; Hsup_RH = []
-        else: Hinf_RH = [Hinf_RH]; Hsup_RH = [Hsup_RH]
-        # Winds
-        if np.isnan(Hinf_V): Hinf_V = []; Hsup_V = []
-        else: Hinf_V = [Hinf_V]; Hsup_V = [Hsup_V]
-        
+    # Correct validate profile value according to validity of ozone profile
+    # if ozone profile is not validated, the other variables will not be valid.
+    if val_O3 == 0:
+        val_T = 0
+        val_P = 0
+        val_RH = 0
+        val_V = 0
     
-        # Extract data at date
-        df = dfold.loc[date]
-        
-        # Check if height is monotonic increasing. If is not monotonic, remove
-        # rows associated to those data
-        if (df.GPHeight.is_monotonic_increasing and df.GPHeight.is_unique):
-            pass
-        else:
-            df = remov_desc(df)
+    # Correct to list
+    # Ozone
+    if np.isnan(Hinf_O3): Hinf_O3 = []; Hsup_O3 = []
+    else: Hinf_O3 = [Hinf_O3]; Hsup_O3 = [Hsup_O3]
+    # Temperature
+    if np.isnan(Hinf_T): Hinf_T = []; Hsup_T = []
+    else: Hinf_T = [Hinf_T]; Hsup_T = [Hsup_T]
+    # Pressure
+    if np.isnan(Hinf_P): Hinf_P = []; Hsup_P = []
+    else: Hinf_P = [Hinf_P]; Hsup_P = [Hsup_P]
+    # Relative Humidity
+    if np.isnan(Hinf_RH): Hinf_RH = []; Hsup_RH = []
+    else: Hinf_RH = [Hinf_RH]; Hsup_RH = [Hsup_RH]
+    # Winds
+    if np.isnan(Hinf_V): Hinf_V = []; Hsup_V = []
+    else: Hinf_V = [Hinf_V]; Hsup_V = [Hsup_V]
+    
+    launches.append((date, almacen.posicion(date)))
+    
+    # Validity and layers of each variable, for interpolar_sondeos and
+    # columna_ozono
+    for g, v, Hinf, Hsup in [
+            ('P', val_P, Hinf_P, Hsup_P),
+            ('T', val_T, Hinf_T, Hsup_T),
+            ('RH', val_RH, Hinf_RH, Hsup_RH),
+            # Potential Temperature
+            ('Theta', min(val_T, val_P), list(set(Hinf_T + Hinf_P)), list(set(Hsup_T + Hsup_P))),
+            # Mixing ratio H2O
+            ('W', min(val_RH, val_T, val_P), list(set(Hinf_T + Hinf_P + Hinf_RH)),
+             list(set(Hsup_T + Hsup_P + Hsup_RH))),
+            # Equivalent Potential Temperature
+            ('Thetae', min(val_T, val_P, val_RH), list(set(Hinf_T + Hinf_P + Hinf_RH)),
+             list(set(Hsup_T + Hsup_P + Hsup_RH))),
+            ('V', val_V, Hinf_V, Hsup_V),
+            ('O3', val_O3, Hinf_O3, Hsup_O3),
+            # Ozone mixing ratio by volume
+            ('O3ppbv', min(val_O3, val_P), list(set(Hinf_O3 + Hinf_P)), list(set(Hsup_O3 + Hsup_P))),
+            # Ozone column
+            ('O3col', min(val_O3, val_P), Hinf_O3, Hsup_O3)]:
+        val[g].append(v)
+        capas[g].append([(Hinf[i], Hsup[i]) for i in range(len(Hinf))])
+
+
+# Layers as arrays (launch x layer), NaN where a launch has fewer layers
+def capas_array(lista):
+    K = max([len(c) for c in lista] + [0])
+    inf = np.full((len(lista), K), np.nan)
+    sup = np.full((len(lista), K), np.nan)
+    for i, c in enumerate(lista):
+        for k, (hi, hs) in enumerate(c):
+            inf[i, k] = hi
+            sup[i, k] = hs
+    return inf, sup
+
+for g in grupos:
+    val[g] = np.array(val[g], dtype=np.float64)
+    capas[g] = capas_array(capas[g])
+
+
+# Samples of the launches to interpolate, flat arrays (ragged array)
+L = len(launches)
+pos = np.array([p for d, p in launches], dtype=np.int64)
+n_por = almacen.n_por_lanzamiento[pos]
+offsets = np.r_[0, np.cumsum(n_por)]
+idx = np.repeat(almacen.offsets[pos], n_por) + np.arange(offsets[-1]) - np.repeat(offsets[:-1], n_por)
+lanz = np.repeat(np.arange(L), n_por)
+
+# Remove points where height is descending
+asc = ascendentes(almacen.columnas['GPHeight'][idx], offsets)
+idx, lanz = idx[asc], lanz[asc]
+# first sample of each launch (launch altitude)
+primero = np.searchsorted(lanz, np.arange(L))
+
+
+#Lecture of Data
+GPHeight = almacen.columnas['GPHeight'][idx]*10**-3
+Pressure = almacen.columnas['Pressure'][idx]
+O3PartialPressure = almacen.columnas['O3PartialPressure'][idx]
+Temperature = almacen.columnas['Temperature'][idx]
+RelativeHumidity = almacen.columnas['RelativeHumidity'][idx]
+Wind_Speed = almacen.columnas['WindSpeed'][idx]
+Wind_Direction = almacen.columnas['WindDirection'][idx]
+
+
+#Determination of variables
+Temperature_K = Temperature + 273.15
+
+# Potential Temperature
+T_potencial = Temperature_K*(1000/Pressure)**(R/Cp)
+
+# Mixing ratio H2O [g/kg]
+Satured_Vapor_Pressure = 6.11*np.exp(5.42*10**3*(1/273-1/Temperature_K))
+Satured_Mixing_Ratio = 0.622*(Satured_Vapor_Pressure/(Pressure-Satured_Vapor_Pressure))
+Mixing_Ratio = 1e3*(RelativeHumidity/100)*Satured_Mixing_Ratio
+
+# Equivalent Potential Temperature (Stull 1988, p.546)
+T_potencial_e = (Temperature_K + (2.5e6/1005)*Mixing_Ratio*1e-3)*((1000/Pressure)**(287.04/1005))
+
+# Winds: zonal and meridional components
+U = - Wind_Speed*np.sin((np.pi/180)*Wind_Direction) 
+V = - Wind_Speed*np.cos((np.pi/180)*Wind_Direction)
+
+# Ozone mixing ratio by volume [ppbv]
+O3_ppbv = (O3PartialPressure*10**-3)/ (Pressure*10**2)*10**9
+
+
+# Interpolation of all the launches, (launch x level x variable)
+series = {'Pressure': (Pressure, 'P'), 'Temp': (Temperature_K, 'T'),
+          'RH': (RelativeHumidity, 'RH'), 'O3_mPa': (O3PartialPressure, 'O3'),
+          'O3_ppbv': (O3_ppbv, 'O3ppbv'), 'U': (U, 'V'), 'V': (V, 'V'),
+          'Theta': (T_potencial, 'Theta'), 'Theta_e': (T_potencial_e, 'Thetae'),
+          'Mixing_Ratio': (Mixing_Ratio, 'W')}
+interp = interpolar_sondeos(GPHeight, lanz, L, {k: s for k, (s, g) in series.items()},
+                            {k: val[g] for k, (s, g) in series.items()},
+                            {k: capas[g] for k, (s, g) in series.items()}, z)
+interp = dict(zip(series, np.moveaxis(interp, 2, 0)))
+
+# Ozone column
+interp['O3_column'] = columna_ozono(O3PartialPressure, Pressure, GPHeight, lanz, L,
+                                    val['O3col'], capas['O3col'], z)
+
+# Calculate magnitude and direction
+interp['WndSpd'] = np.sqrt(interp['U']**2 + interp['V']**2)
+interp['WndDir'] = np.arctan2(-interp['U'], -interp['V']) * (180/np.pi)
+interp['WndDir'][interp['WndDir'] < 0] = interp['WndDir'][interp['WndDir'] < 0] + 360
+
+
+# Save individual files and make dataframe for data complete
+variables = ['Pressure', 'Temp', 'RH', 'O3_mPa', 'O3_ppbv', 'O3_column', 'U', 'V',
+             'WndSpd', 'WndDir', 'Theta', 'Theta_e', 'Mixing_Ratio']
+dfs_clear = []
+
+for i, (date, p) in enumerate(launches):
     
-        
-        #Lecture of Data
-        GPHeight = df.GPHeight.values*10**-3
-        Pressure = df.Pressure.values
-        O3PartialPressure = df.O3PartialPressure.values
-        Temperature = df.Temperature.values
-        RelativeHumidity = df.RelativeHumidity.values
-        Wind_Speed = df.WindSpeed.values
-        Wind_Direction = df.WindDirection.values
-        
-       
-        #Determination and Interpolation
-        
-        # Pressure interp
-        Pressure_interp = interp_serie(z, GPHeight, Pressure, prof_val=val_P, Hinf=Hinf_P, Hsup=Hsup_P)
-        
-        # Temperature to interpolate
-        Temperature_K = Temperature + 273.15
-        Temperature_K_interp = interp_serie(z, GPHeight, Temperature_K, prof_val=val_T, Hinf=Hinf_T, Hsup=Hsup_T)
-        
-        # Relative Humidity to interpolate
-        RelativeHumidity_interp = interp_serie(z, GPHeight, RelativeHumidity, prof_val=val_RH, Hinf=Hinf_RH, Hsup=Hsup_RH)
-        
-        # Potential Temperature
-        val_Theta = min(val_T, val_P)
-        Hinf_Theta = list(set(Hinf_T + Hinf_P))
-        Hsup_Theta = list(set(Hsup_T + Hsup_P))
-        
-        T_potencial = Temperature_K*(1000/Pressure)**(R/Cp)
-        T_potencial_interp = interp_serie(z, GPHeight, T_potencial, prof_val=val_Theta, Hinf=Hinf_Theta, Hsup=Hsup_Theta)
-        
-        
-        # Mixing ratio H2O [g/kg]
-        val_W = min(val_RH, val_T, val_P)
-        Hinf_W = list(set(Hinf_T + Hinf_P + Hinf_RH))
-        Hsup_W = list(set(Hsup_T + Hsup_P + Hsup_RH))
-        
-        Satured_Vapor_Pressure = 6.11*np.exp(5.42*10**3*(1/273-1/Temperature_K))
-        Satured_Mixing_Ratio = 0.622*(Satured_Vapor_Pressure/(Pressure-Satured_Vapor_Pressure))
-        Mixing_Ratio = 1e3*(RelativeHumidity/100)*Satured_Mixing_Ratio
-        
-        Mixing_Ratio_interp = interp_serie(z, GPHeight, Mixing_Ratio, prof_val=val_W, Hinf=Hinf_W, Hsup=Hsup_W)
+    print(date)
     
-        
-        # Equivalent Potential Temperature (Stull 1988, p.546)
-        val_Thetae = min(val_T, val_P, val_RH)
-        Hinf_Thetae = list(set(Hinf_T + Hinf_P + Hinf_RH))
-        Hsup_Thetae = list(set(Hsup_T + Hsup_P + Hsup_RH))
-        
-        T_potencial_e = (Temperature_K + (2.5e6/1005)*Mixing_Ratio*1e-3)*((1000/Pressure)**(287.04/1005))
-        T_potencial_e_interp = interp_serie(z, GPHeight, T_potencial_e, prof_val=val_Thetae, Hinf=Hinf_Thetae, Hsup=Hsup_Thetae)
-        
-        
-        # Winds to interpolate
-        # CAlculate zonal and meridional components
-        U = - Wind_Speed*np.sin((np.pi/180)*Wind_Direction) 
-        V = - Wind_Speed*np.cos((np.pi/180)*Wind_Direction)
-        
-        U_interp = interp_serie(z, GPHeight, U, prof_val=val_V, Hinf=Hinf_V, Hsup=Hsup_V)
-        V_interp = interp_serie(z, GPHeight, V, prof_val=val_V, Hinf=Hinf_V, Hsup=Hsup_V)
-        
-        # Calculate magnitude and direction
-        Wind_Speed_interp = np.sqrt(U_interp**2 + V_interp**2)
-        Wind_Direction_interp = np.arctan2(-U_interp, -V_interp) * (180/np.pi)
-        Wind_Direction_interp[Wind_Direction_interp < 0] = Wind_Direction_interp[Wind_Direction_interp<0] + 360
-        
-        
-        # Ozone
-        # Ozone partial pressure
-        O3PartialPressure_interp = interp_serie(z, GPHeight, O3PartialPressure, prof_val=val_O3, Hinf=Hinf_O3, Hsup=Hsup_O3)
-        
-        # Ozone mixing ratio by volume [ppbv]
-        val_O3ppbv = min(val_O3, val_P)
-        Hinf_O3ppbv = list(set(Hinf_O3 + Hinf_P))
-        Hsup_O3ppbv = list(set(Hsup_O3 + Hsup_P))
-        
-        O3_ppbv = (O3PartialPressure*10**-3)/ (Pressure*10**2)*10**9
-        O3_ppbv_interp = interp_serie(z, GPHeight, O3_ppbv, prof_val=val_O3ppbv, Hinf=Hinf_O3ppbv, Hsup=Hsup_O3ppbv)
-        
-        # Ozone column
-        val_O3col = min(val_O3, val_P)
-        Hinf_O3col = list(set(Hinf_O3 + Hinf_P))
-        Hsup_O3col = list(set(Hsup_O3 + Hsup_P))
-        
-        Sum_Omega_S_interp = ozone_column(O3PartialPressure, Pressure, GPHeight, z, prof_val=val_O3col, Hinf=Hinf_O3, Hsup=Hsup_O3)
-        
-        
-        
-        # Make dataframe with variables
-        df_clear = pd.DataFrame(data={'Pressure':Pressure_interp,'Temp':Temperature_K_interp, 
-                                      'RH':RelativeHumidity_interp, 'O3_mPa': O3PartialPressure_interp,
-                                      'O3_ppbv':O3_ppbv_interp, 'O3_column':Sum_Omega_S_interp,
-                                      'U':U_interp, 'V':V_interp, 'WndSpd' : Wind_Speed_interp,
-                                      'WndDir' : Wind_Direction_interp, 'Theta':T_potencial_interp,
-                                      'Theta_e':T_potencial_e_interp, 'Mixing_Ratio':Mixing_Ratio_interp}, 
-                                index=z)
-        df_clear.index.rename('Alt', inplace=True)
-        
-        # Change nan to 9000
-        df_clear.fillna(9000, inplace=True)
-        
-        # Round values in dataframe
-        df_clear.index = np.around(df_clear.index, 1)
-        df_clear['Pressure'] = df_clear['Pressure'].map('{:.3f}'.format)
-        df_clear['Temp'] = df_clear['Temp'].map('{:.3f}'.format)
-        df_clear['RH'] = df_clear['RH'].map('{:.3f}'.format)
-        df_clear['O3_mPa'] = df_clear['O3_mPa'].map('{:.3f}'.format)
-        df_clear['O3_ppbv'] = df_clear['O3_ppbv'].map('{:.3f}'.format)
-        df_clear['O3_column'] = df_clear['O3_column'].map('{:.3f}'.format)
-        df_clear['U'] = df_clear['U'].map('{:.3f}'.format)
-        df_clear['V'] = df_clear['V'].map('{:.3f}'.format)
-        df_clear['WndSpd'] = df_clear['WndSpd'].map('{:.3f}'.format)
-        df_clear['WndDir'] = df_clear['WndDir'].map('{:.3f}'.format)
-        df_clear['Theta'] = df_clear['Theta'].map('{:.3f}'.format)
-        df_clear['Theta_e'] = df_clear['Theta_e'].map('{:.3f}'.format)
-        df_clear['Mixing_Ratio'] = df_clear['Mixing_Ratio'].map('{:.5f}'.format)
-        
-        
-        # Save sounding interpolated
-        df_to_csv(df_clear, date, 1e3*GPHeight[0])
-        
-        
-        
-        # Add ozonesonde to dataframe with all soundings
-        df_clear2 = df_clear.copy()
-        
-        # Make index datetime
-        N = len(z)
-        time = []
-        for i in range(N):
-            time.append(date)
-        time = pd.to_datetime(time)
-        time.name ='Datetime'
-        
-        # Add multi index to dataframe [datetime, altitude]
-        df_clear2.set_index([time, df_clear2.index], inplace=True)
-        
-        # Add to dataframe complete
-        dfold_clear = pd.concat([dfold_clear, df_clear2])
-                
+    # Make dataframe with variables
+    df_clear = pd.DataFrame(data={v: interp[v][i] for v in variables}, index=z)
+    df_clear.index.rename('Alt', inplace=True)
+    
+    # Change nan to 9000
+    df_clear.fillna(9000, inplace=True)
+    
+    # Round values in dataframe
+    df_clear.index = np.around(df_clear.index, 1)
+    for v in variables:
+        formato = '{:.5f}' if v == 'Mixing_Ratio' else '{:.3f}'
+        df_clear[v] = df_clear[v].map(formato.format)
+    
+    
+    # Save sounding interpolated
+    df_to_csv(df_clear, date, 1e3*GPHeight[primero[i]])
+    
+    
+    # Add multi index to dataframe [datetime, altitude]
+    df_clear2 = df_clear.copy()
+    time = pd.DatetimeIndex([date]*len(z), name='Datetime')
+    df_clear2.set_index([time, df_clear2.index], inplace=True)
+    dfs_clear.append(df_clear2)
+
+# Add to dataframe complete
+dfold_clear = pd.concat(dfs_clear) if dfs_clear else pd.DataFrame()
 
     
 # Save in .csv all ozonesondes interpolated
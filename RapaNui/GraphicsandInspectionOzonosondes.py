@@ -21,6 +21,7 @@ from matplotlib.ticker import MultipleLocator
 from matplotlib.ticker import ScalarFormatter
 import os as os                  # Directory management
 import platform
+from __toolsSondes import cargar_almacen
 
 
 def plot_sonde(df, date, station, save=False, path_to_save=None):
@@ -154,10 +155,11 @@ path_save= os.path.join(path, "Graphs_Inspection_Valid")
 
 # Read data ozonosondes
 fn_sondes = os.path.join(path, "RapaNui_all_ozonesondes.csv")
-dfold = pd.read_csv(fn_sondes, delimiter=';', index_col=0, parse_dates=True)
+# (ragged array store of the file, __toolsSondes)
+almacen = cargar_almacen(fn_sondes)
 
 # Sounding datess
-dates = dfold.index.drop_duplicates()
+dates = almacen.fechas
 
 # Estacion
 station = 'Rapa Nui'
@@ -171,7 +173,7 @@ for date in dates:
     if date.year in range(yi, yf+1):
         
         # extract profile per date
-        df = dfold.loc[date]
+        df = almacen.dataframe(date)
         
         # plot
         plot_sonde(df, date, station, save=True, path_to_save=path_save)
@@ -22,8 +22,10 @@ from datetime import date
 from datetime import timedelta
 from textwrap import dedent
 from datetime import datetime as dt
-from scipy.optimize import leastsq
+import sys
 import dash_bootstrap_components as dbc
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Tololo'))
+from __toolsTrend import ajustar_tendencia
 
 orig = os.getcwd()
 fn_ozonosondes = orig + '\\' + 'RapaNui_all_clear.csv' 
@@ -276,76 +278,19 @@ def update_graph(btn1, btn2, btn3, Language, input1):
     #aux_a , aux_b = info_data('2015-01-01 01','2020-08-09 23',df,'D')
 
     df_m = df.resample('M').mean()["O3_ppbv"]
-    df_m_aux  = df_m.fillna(df_m.mean())
     changed_id = [p['prop_id'] for p in dash.callback_context.triggered][0]
-    if (changed_id=='.')==True:
-       
-        def model(t, coeffs):
-            return  (coeffs[0] + coeffs[1]*t + coeffs[2]*np.sin(2*np.pi*t/12) + coeffs[3]*np.cos(2*np.pi*t/12) +
-                    coeffs[4]*np.sin(4*np.pi*t/12) + coeffs[5]*np.cos(4*np.pi*t/12) + 
-                    coeffs[6]*np.sin(6*np.pi*t/12) + coeffs[7]*np.cos(6*np.pi*t/12) +
-                    coeffs[8]*np.sin(8*np.pi*t/12) + coeffs[9]*np.cos(8*np.pi*t/12) +
-                    coeffs[10]*np.sin(10*np.pi*t/12) + coeffs[11]*np.cos(10*np.pi*t/12) +
-                    coeffs[12]*np.sin(12*np.pi*t/12) + coeffs[13]*np.cos(12*np.pi*t/12) +
-                    coeffs[14]*np.sin(14*np.pi*t/12) + coeffs[15]*np.cos(14*np.pi*t/12) +
-                    coeffs[15]*np.sin(16*np.pi*t/12) + coeffs[16]*np.cos(16*np.pi*t/12) +
-                    coeffs[17]*np.sin(18*np.pi*t/12) + coeffs[18]*np.cos(18*np.pi*t/12) 
-        )
-    
-        def residuals(coeffs, y, t):
-            return y - model(t, coeffs)
-        
-        
-        x0 = np.array([1, 1 ,1, 1,1 ,1,1,1,1,1,1,1,1,1,1,1,1,1,1], dtype=float)
-    
-        t = np.arange(len(df_m_aux))
-        x, flag = leastsq(residuals, x0, args=(df_m_aux.values, t))
-        model_trend =  model(t, x)
-    elif 'btn-Lamsal' in changed_id:
-       
-        def model(t, coeffs):
-            return  (coeffs[0] + coeffs[1]*t + coeffs[2]*np.sin(2*np.pi*t/12) + coeffs[3]*np.cos(2*np.pi*t/12) +
-                    coeffs[4]*np.sin(4*np.pi*t/12) + coeffs[5]*np.cos(4*np.pi*t/12) + 
-                    coeffs[6]*np.sin(6*np.pi*t/12) + coeffs[7]*np.cos(6*np.pi*t/12) +
-                    coeffs[8]*np.sin(8*np.pi*t/12) + coeffs[9]*np.cos(8*np.pi*t/12) +
-                    coeffs[10]*np.sin(10*np.pi*t/12) + coeffs[11]*np.cos(10*np.pi*t/12) +
-                    coeffs[12]*np.sin(12*np.pi*t/12) + coeffs[13]*np.cos(12*np.pi*t/12) +
-                    coeffs[14]*np.sin(14*np.pi*t/12) + coeffs[15]*np.cos(14*np.pi*t/12) +
-                    coeffs[15]*np.sin(16*np.pi*t/12) + coeffs[16]*np.cos(16*np.pi*t/12) +
-                    coeffs[17]*np.sin(18*np.pi*t/12) + coeffs[18]*np.cos(18*np.pi*t/12) 
-        )
-    
-        def residuals(coeffs, y, t):
-            return y - model(t, coeffs)
-        
-        
-        x0 = np.array([1, 1 ,1, 1,1 ,1,1,1,1,1,1,1,1,1,1,1,1,1,1], dtype=float)
-    
-        t = np.arange(len(df_m_aux))
-        x, flag = leastsq(residuals, x0, args=(df_m_aux.values, t))
-        model_trend =  model(t, x)    
-
-
-    elif 'btn-Linear' in changed_id:
- 
-        def model(t, coeffs):
-            return  (coeffs[0] + coeffs[1]*t )
-    
-        def residuals(coeffs, y, t):
-            return y - model(t, coeffs)
-        
-        
-        x0 = np.array([1, 1], dtype=float)
-    
-        t = np.arange(len(df_m_aux))
-        x, flag = leastsq(residuals, x0, args=(df_m_aux.values, t))
-        model_trend =  model(t, x)    
+    # Lamsal (default, 9 harmonics of one year) or a straight line, from the
+    # trend registry (__toolsTrend). Months without soundings stay NaN and are
+    # skipped, the trend and its error are per year
+    metodo = 'Linear' if 'btn-Linear' in changed_id else 'Lamsal'
+    resultado = ajustar_tendencia(metodo, df_m)
+    model_trend, error = resultado.ajuste, resultado.error
 
     if Language== 'English':
-        info = ["Decadal Tendency = " + str(round(x[1]*10*12,1)) + ' +/- xx [ppbv]  <br>Mean= '+ str(round(df["O3_ppbv"].mean(),1)) + " [ppbv]"]
+        info = ["Decadal Tendency = " + str(round(resultado.pendiente*10,1)) + ' +/- ' + str(round(error*10,1)) + ' [ppbv]  <br>Mean= '+ str(round(df["O3_ppbv"].mean(),1)) + " [ppbv]"]
         xlabel = 'Date'
     elif Language == 'Espanish': 
-        info = ["Tendencia Decadal= " + str(round(x[1]*10*12,1)) + ' +/- xx [ppbv]  <br>Promedio= '+ str(round(df["O3_ppbv"].mean(),1)) + " [ppbv]"]
+        info = ["Tendencia Decadal= " + str(round(resultado.pendiente*10,1)) + ' +/- ' + str(round(error*10,1)) + ' [ppbv]  <br>Promedio= '+ str(round(df["O3_ppbv"].mean(),1)) + " [ppbv]"]
         xlabel= 'Fecha'
     fig = go.Figure()  
     fig.add_trace(go.Scatter(
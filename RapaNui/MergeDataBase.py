@@ -31,6 +31,7 @@ save info about ozone profiles validation. This file must be filled with:
 import pandas as pd
 import numpy as np
 import os
+from __toolsSondes import AlmacenSondeos, cargar_almacen
 
 
 def merge_winds_df(df1, df2):
@@ -87,6 +88,148 @@ def merge_winds_df(df1, df2):
 
 
 
+def merge_winds(gaw, cr2, columnas):
+    """
+    Same result as merge_winds_df, for one launch, with one sorted merge.
+
+    The CR2 levels with wind whose height is also in the GAW profile replace
+    those GAW rows. The other CR2 wind levels are inserted in the GAW
+    profile at their height (searchsorted), with only GPHeight, WindSpeed
+    and WindDirection. GAW heights must be strictly increasing, without NaN.
+
+    Parameters
+    ----------
+    gaw : ndarray (n1, m)
+        GAW sounding data, columns in the order of columnas.
+    cr2 : ndarray (n2, m)
+        CR2 sounding data, same columns.
+    columnas : list
+        Names of the columns.
+
+    Returns
+    -------
+    ndarray (n, m)
+        GAW sounding data with CR2 sounding data wind
+    """
+    iz = columnas.index('GPHeight')
+    iw = [columnas.index('WindSpeed'), columnas.index('WindDirection')]
+    
+    # Niveles de CR2 con viento, ordenados por altura
+    cr2 = cr2[~np.isnan(cr2[:, iw]).any(axis=1)]
+    cr2 = cr2[np.argsort(cr2[:, iz], kind='stable')]
+    z1, z2 = gaw[:, iz], cr2[:, iz]
+    
+    # Alturas de GAW que estan en CR2: se reemplaza la fila completa
+    df1c = gaw.copy()
+    i2 = np.minimum(np.searchsorted(z2, z1), len(z2) - 1)
+    igual = (z2[i2] == z1) if len(z2) else np.zeros(len(z1), dtype=bool)
+    df1c[igual] = cr2[i2[igual]]
+    
+    # Alturas de CR2 que no estan en GAW: se insertan solo altura y viento
+    i1 = np.minimum(np.searchsorted(z1, z2), len(z1) - 1)
+    nuevas = cr2[(z1[i1] != z2) if len(z1) else np.ones(len(z2), dtype=bool)].copy()
+    otras = [k for k in range(len(columnas)) if k != iz and k not in iw]
+    nuevas[:, otras] = np.nan
+    
+    return np.insert(df1c, np.searchsorted(z1, nuevas[:, iz]), nuevas, axis=0)
+
+
+
+def merge_databases(alm_GAW, alm_CR2):
+    """
+    Merge the GAW and CR2 soundings (ragged array stores, __toolsSondes),
+    with the rules of the module docstring.
+
+    The launches of both databases are aligned by launch day with one join.
+    The number of ozone and wind samples of every launch is counted at once
+    (np.add.reduceat over the columns), so the choice between GAW and CR2 is
+    made for all the launches together. Only the launches that take the
+    CR2 wind go through merge_winds.
+
+    Parameters
+    ----------
+    alm_GAW : AlmacenSondeos
+        GAW soundings (RapaNui_GAW_ozonesondes.csv).
+    alm_CR2 : AlmacenSondeos
+        CR2 soundings (RapaNui_CR2_ozonesondes.csv).
+
+    Returns
+    -------
+    dfold : DataFrame
+        All soundings, index 'Datetime' of the launch, sorted by launch day.
+    """
+    
+    def conteo(alm, var):
+        # Datos validos de var en cada lanzamiento
+        n = np.zeros(len(alm), dtype=np.int64)
+        if var in alm.columnas and alm.n_muestras:
+            llenos = alm.n_por_lanzamiento > 0
+            validos = (~np.isnan(alm.columnas[var])).astype(np.int64)
+            n[llenos] = np.add.reduceat(validos, alm.offsets[:-1][llenos])
+        return n
+    
+    # Union por dia de lanzamiento
+    gaw = pd.DataFrame({'dia': alm_GAW.lanzamientos.astype('datetime64[D]'),
+                        'i_gaw': np.arange(len(alm_GAW)),
+                        'N_gaw': conteo(alm_GAW, 'O3PartialPressure'),
+                        'Nw_gaw': conteo(alm_GAW, 'WindSpeed')})
+    cr2 = pd.DataFrame({'dia': alm_CR2.lanzamientos.astype('datetime64[D]'),
+                        'i_cr2': np.arange(len(alm_CR2)),
+                        'N_cr2': conteo(alm_CR2, 'O3PartialPressure'),
+                        'Nw_cr2': conteo(alm_CR2, 'WindSpeed')})
+    union = pd.merge(gaw, cr2, on='dia', how='outer', sort=True)
+    
+    # Regla: solo en una base de datos, esa. En ambas: CR2 si tiene mas datos
+    # de ozono (con la fecha de GAW), si no GAW, con el viento de CR2 si
+    # tiene mas datos de viento
+    en_gaw = union.i_gaw.notna().values
+    en_cr2 = union.i_cr2.notna().values
+    ambas = en_gaw & en_cr2
+    usa_cr2 = en_cr2 & (~en_gaw | (union.N_cr2.values > union.N_gaw.values))
+    viento = ambas & ~usa_cr2 & (union.Nw_cr2.values > union.Nw_gaw.values)
+    i_gaw = union.i_gaw.fillna(-1).values.astype(np.int64)
+    i_cr2 = union.i_cr2.fillna(-1).values.astype(np.int64)
+    
+    # Columnas en el orden de la primera base de datos usada
+    primero, segundo = ((alm_CR2, alm_GAW) if len(usa_cr2) and usa_cr2[0]
+                        else (alm_GAW, alm_CR2))
+    columnas = list(dict.fromkeys(primero.variables + segundo.variables))
+    
+    def matriz(alm, i):
+        # Perfil del lanzamiento i como matriz, en el orden de columnas
+        s = alm.muestras(i)
+        n = s.stop - s.start
+        return np.column_stack([alm.columnas[c][s] if c in alm.columnas
+                                else np.full(n, np.nan) for c in columnas])
+    
+    bloques, tiempos = [], []
+    for k in range(len(union)):
+        if usa_cr2[k]:
+            bloque = matriz(alm_CR2, i_cr2[k])
+            t = alm_GAW.lanzamientos[i_gaw[k]] if ambas[k] else alm_CR2.lanzamientos[i_cr2[k]]
+        else:
+            bloque = matriz(alm_GAW, i_gaw[k])
+            t = alm_GAW.lanzamientos[i_gaw[k]]
+            if viento[k]:
+                z = bloque[:, columnas.index('GPHeight')]
+                if (np.diff(z) > 0).all():
+                    bloque = merge_winds(bloque, matriz(alm_CR2, i_cr2[k]), columnas)
+                else:
+                    # alturas no crecientes o con NaN, insercion nivel a nivel
+                    df1 = pd.DataFrame(bloque, columns=columnas,
+                                       index=pd.DatetimeIndex([t]*len(bloque), name='Datetime'))
+                    df2 = alm_CR2.dataframe(i_cr2[k])[columnas]
+                    bloque = merge_winds_df(df1, df2).values.astype(np.float64)
+        bloques.append(bloque)
+        tiempos.append(np.repeat(t, len(bloque)))
+    
+    if not bloques:
+        return pd.DataFrame(columns=columnas, index=pd.DatetimeIndex([], name='Datetime'))
+    return pd.DataFrame(np.concatenate(bloques), columns=columnas,
+                        index=pd.DatetimeIndex(np.concatenate(tiempos), name='Datetime'))
+
+
+
 # Get path
 path = os.getcwd()# use your path
 
@@ -94,73 +237,19 @@ path = os.getcwd()# use your path
 fn_GAW = os.path.join(path, 'RapaNui_GAW_ozonesondes.csv')
 fn_CR2 = os.path.join(path, 'RapaNui_CR2_ozonesondes.csv')
 
-# Lee los archivos de GAW y CR2
-dfold_GAW = pd.read_csv(fn_GAW, index_col=[0], delimiter=';', parse_dates=[0],
-                         float_precision='round_trip')
-dfold_CR2 = pd.read_csv(fn_CR2, index_col=[0], delimiter=';', parse_dates=[0],
-                         float_precision='round_trip')
-
-# Obtiene las fechas de lanzamiento en ambas bases de datos
-dates_GAW = dfold_GAW.index.get_level_values('Datetime').drop_duplicates()
-dates_CR2 = dfold_CR2.index.get_level_values('Datetime').drop_duplicates()
-
-# Genera un vector auxiliar de fechas de GAW con formato '%Y-%m-%d'
-dates_GAW_aux = pd.to_datetime(dates_GAW.strftime('%Y-%m-%d'), format='%Y-%m-%d')
-
-# Genera vector auxiliar juntando fechas de ambas bases de datos
-dates_aux = dates_GAW_aux.copy()
-dates_aux = dates_aux.append(dates_CR2)
-dates_aux = dates_aux.drop_duplicates()
-dates_aux = dates_aux.sort_values()
+# Lee los archivos de GAW y CR2 (ragged array, __toolsSondes)
+alm_GAW = cargar_almacen(fn_GAW)
+alm_CR2 = cargar_almacen(fn_CR2)
 
 # Juntar las bases de datos
-dfold = pd.DataFrame()
-
-for d in dates_aux:
-    # Si solo esta en GAW se agrega
-    if (d in dates_GAW_aux) and (d not in dates_CR2):
-        dgaw = dates_GAW[dates_GAW_aux.get_loc(d)]
-        df_gaw = dfold_GAW.loc[[dgaw]]
-        dfold = pd.concat([dfold, df_gaw])
-        
-    # Si solo esta en CR2 se agrega
-    elif (d in dates_CR2) and (d not in dates_GAW_aux):
-        df_cr2 = dfold_CR2.loc[[d]]
-        dfold = pd.concat([dfold, df_cr2])
-        
-    # Si esta en ambas bases de datos, se guarda: 1) los datos de CR2 si
-    # tienen mas registros en el perfil de ozono que GAW; o 2) GAW si tiene mas
-    # datos en el perfil de ozono que CR2. Para el caso 2), si CR2 tiene datos
-    # de viento pero GAW no, se agregan los datos de viento a GAW.
-    elif (d in dates_GAW_aux) and (d in dates_CR2):
-        dgaw = dates_GAW[dates_GAW_aux.get_loc(d)]
-        df_gaw = dfold_GAW.loc[[dgaw]]
-        df_cr2 = dfold_CR2.loc[[d]]
-        
-        N_cr2 = df_cr2.O3PartialPressure.dropna().size
-        N_gaw = df_gaw.O3PartialPressure.dropna().size
-        
-        if N_cr2 > N_gaw:
-            N = df_cr2.shape[0]
-            tnew = [dgaw] * N
-            df_cr2.reset_index(drop=True, inplace=True)
-            df_cr2.index = tnew
-            df_cr2.index.rename('Datetime', inplace=True)
-            dfold = pd.concat([dfold, df_cr2])
-            
-        elif N_cr2 <= N_gaw:
-            Nw_cr2 = df_cr2.WindSpeed.dropna().size
-            Nw_gaw = df_gaw.WindSpeed.dropna().size
-            
-            if Nw_cr2 > Nw_gaw:
-                df_gaw = merge_winds_df(df_gaw, df_cr2)
-            
-            dfold = pd.concat([dfold, df_gaw])
+dfold = merge_databases(alm_GAW, alm_CR2)
 
 
 # Guardar archivo con sondeos
 out_allsondes = os.path.join(path, 'RapaNui_all_ozonesondes.csv')
 dfold.to_csv(out_allsondes, sep=';')
+# y como ragged array (RapaNui_all_ozonesondes.npz/.json, __toolsSondes)
+AlmacenSondeos.desde_dataframe(dfold).guardar(out_allsondes)
 
 
 
@@ -23,9 +23,164 @@ This sets correspond to sounding data per launch in Eastern Island station
 import pandas as pd
 import numpy as np
 from glob import glob
+from collections import namedtuple
+import io
 import os
-import csv
-import chardet
+import tarfile
+from concurrent.futures import ProcessPoolExecutor
+from __toolsSondes import AlmacenSondeos
+
+
+# Metadata of a WOUDC extCSV sounding file
+MetadatosSondeo = namedtuple('MetadatosSondeo', [
+    'archivo',          # path of the file
+    'codificacion',     # 'utf-8' or 'latin-1'
+    'fecha',            # launch date as written in #TIMESTAMP, str
+    'hora',             # launch time as written in #TIMESTAMP, str
+    'lanzamiento',      # launch datetime (Date + Time, Timestamp)
+    'utc_offset',       # UTCOffset of #TIMESTAMP, str
+    'latitud',          # #LOCATION, float
+    'longitud',
+    'altura',
+    'instrumento',      # #INSTRUMENT, dict Name/Model/Number
+    'resumen',          # #FLIGHT_SUMMARY, dict, numbers as float
+    'intercambio',      # True if the GPHeight/RelativeHumidity and
+                        # WindSpeed/WindDirection labels were swapped
+    ])
+
+
+def _decodificar(raw):
+    # UTF-8, and Latin-1 (every byte is valid) if that fails
+    try:
+        return raw.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        return raw.decode('latin-1'), 'latin-1'
+
+
+def _numero(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def leer_extcsv(filename):
+    """
+    Read a WOUDC extCSV ozonesonde file in one pass: the file is read once,
+    decoded (UTF-8, Latin-1 if that fails), split in tables (#NAME, a header
+    line and rows until the next table) and the #PROFILE block is parsed
+    from memory into float64 columns.
+
+    Rows of #PROFILE with text that is not a number (e.g. repeated header
+    or unit lines, as in the file of 2008-7-5) and the empty rows right
+    after them are dropped, other rows of '///' are kept as NaN. Some files of 2007 and
+    2008 have the labels of GPHeight/RelativeHumidity and
+    WindSpeed/WindDirection swapped. This is detected from the labelled
+    columns (the column labelled GPHeight reaches lower values than the one
+    labelled WindSpeed) and the labels are fixed.
+
+    Parameters
+    ----------
+    filename : str
+        Path + filename sounding data.
+
+    Returns
+    -------
+    metadatos : MetadatosSondeo
+    perfil : dict
+        Column name of #PROFILE -> ndarray of float64, '///' and empty
+        fields are NaN (int64 for columns of integers without missing
+        values, as read by pandas.read_csv).
+    """
+    with open(filename, 'rb') as file:
+        texto, codificacion = _decodificar(file.read())
+
+    tablas = {}
+    perfil_lineas, perfil_cabecera = [], None
+    actual, cabecera = None, None
+    lineas = texto.splitlines()
+    i = 0
+    while i < len(lineas):
+        linea = lineas[i].strip()
+        i += 1
+        if not linea or linea.startswith('*'):
+            continue
+        if linea.startswith('#'):
+            actual, cabecera = linea[1:].strip().upper(), None
+            continue
+        if actual is None:
+            continue
+        if cabecera is None:
+            cabecera = [c.strip() for c in linea.split(',')]
+            if actual == 'PROFILE':
+                # the rows of the profile go as a block to the parser, up to
+                # the next table
+                perfil_cabecera = cabecera
+                fin = i
+                while fin < len(lineas) and not lineas[fin].lstrip().startswith('#'):
+                    fin += 1
+                perfil_lineas, i = lineas[i:fin], fin
+            continue
+        if actual not in tablas:
+            # first row of each metadata table
+            tablas[actual] = dict(zip(cabecera, [c.strip() for c in linea.split(',')]))
+
+    perfil = {}
+    if perfil_cabecera is not None:
+        def leer_bloque(lineas):
+            return pd.read_csv(io.StringIO('\n'.join(lineas)), header=None,
+                               names=perfil_cabecera, usecols=range(len(perfil_cabecera)),
+                               na_values=['///'], float_precision='round_trip')
+        # blank lines are skipped by read_csv, without them row k is line k
+        perfil_lineas = [linea for linea in perfil_lineas if linea.strip()]
+        datos = leer_bloque(perfil_lineas)
+        # the columns keep the type given by pandas (int64 if all the values
+        # are integers, e.g. GPHeight, as in the files read with read_csv
+        # before). Columns with text have junk rows
+        texto_cols = datos.columns[datos.dtypes == object]
+        if len(texto_cols) and len(datos) == len(perfil_lineas):
+            numeros = datos[texto_cols].apply(pd.to_numeric, errors='coerce')
+            # rows with text that is not a number are not data, nor the empty
+            # rows right after them (the unit and blank lines of 2008-7-5).
+            # Other rows of '///' or empty fields are kept as NaN
+            basura = (numeros.isna() & datos[texto_cols].notna()).any(axis=1).values
+            vacia = datos.isna().all(axis=1).values
+            previa = np.maximum.accumulate(np.where(vacia, -1, np.arange(len(datos))))
+            basura |= vacia & (previa >= 0) & basura[np.maximum(previa, 0)]
+            # the block without them is read again, so the columns get the
+            # types of a clean file
+            datos = leer_bloque([linea for linea, b in zip(perfil_lineas, basura) if not b])
+            texto_cols = datos.columns[datos.dtypes == object]
+        if len(texto_cols):
+            datos[texto_cols] = datos[texto_cols].apply(pd.to_numeric, errors='coerce')
+        perfil = {nombre: datos[nombre].values for nombre in perfil_cabecera}
+
+    intercambio = False
+    if 'GPHeight' in perfil and 'WindSpeed' in perfil:
+        altura, viento = perfil['GPHeight'], perfil['WindSpeed']
+        if (~np.isnan(altura)).any() and (~np.isnan(viento)).any():
+            intercambio = bool(np.nanmax(altura) < np.nanmax(viento))
+    if intercambio:
+        perfil['GPHeight'], perfil['WindSpeed'] = perfil['WindSpeed'], perfil['GPHeight']
+        if 'RelativeHumidity' in perfil and 'WindDirection' in perfil:
+            perfil['RelativeHumidity'], perfil['WindDirection'] = (perfil['WindDirection'],
+                                                                   perfil['RelativeHumidity'])
+
+    timestamp = tablas.get('TIMESTAMP', {})
+    localizacion = tablas.get('LOCATION', {})
+    fecha, hora = timestamp.get('Date', ''), timestamp.get('Time', '')
+    metadatos = MetadatosSondeo(
+        archivo=filename, codificacion=codificacion, fecha=fecha, hora=hora,
+        lanzamiento=pd.to_datetime(fecha + ' ' + hora),
+        utc_offset=timestamp.get('UTCOffset'),
+        latitud=_numero(localizacion.get('Latitude')),
+        longitud=_numero(localizacion.get('Longitude')),
+        altura=_numero(localizacion.get('Height')),
+        instrumento=tablas.get('INSTRUMENT', {}),
+        resumen={k: _numero(v) if _numero(v) == _numero(v) else v
+                 for k, v in tablas.get('FLIGHT_SUMMARY', {}).items()},
+        intercambio=intercambio)
+    return metadatos, perfil
 
 
 def lecture_GAW(filename):
@@ -53,63 +208,10 @@ def lecture_GAW(filename):
 
     """
     
-    # Buscar tipo de encode del archivo
-    with open(filename, 'rb') as file:
-        enc=chardet.detect(file.read())['encoding']
-
-    
-    # Buscar lineas a saltar del header para leer datos del archivo.
-    # Tambien busca fecha y hora de lanzamiento del sondeo en el archivo
-    with open(filename, 'r', encoding=enc) as file:
-        reader = csv.reader(file, delimiter=',')
-             
-        iline = 0
-        for row in reader:
-            if row == []:
-                pass
-            elif row[0] == 'UTCOffset':
-                date = next(reader)[1:3]
-                fecha = date[0]
-                hora = date[1]
-                fechahora = date[0] + ' ' + hora
-            elif row[0] == '#PROFILE' or row[0] == '#PROFILE ':
-                iline += 2
-                break
-            iline += 1
-    
-    # Cargar mediciones del sonde en dateframe
-    if fecha == '2008-7-5':
-        # Excepcion para archivo del 2008-7-5, distinto encode y error en header
-        rows = []
-        rows.extend(range(iline))
-        rows.extend(range(iline+1, iline+3))
-        dataframes = pd.read_csv(filename, skiprows=rows, encoding=enc, float_precision='round_trip')
-    else:
-        dataframes = pd.read_csv(filename, skiprows=iline, na_values= ['///'], float_precision='round_trip')
-    
-    # Crear vector de tiempo, con el tiempo de lanzamiento para agregar index
-    # a dateframes
-    N = dataframes.shape
-    time = []
-    for i in range(N[0]):
-        time.append(fechahora)
-    time = pd.to_datetime(time)
-        
-    dataframes.index = time
-    dataframes.index.rename('Datetime', inplace=True)
-    
-    # Renombrar columnas que estan mal ordenadas
-    badfiles = ['2007', '2008']
-    
-    if fecha[0:4] in badfiles:
-        dataframes.rename(columns={'WindSpeed' : 'GPHeight', 'WindDirection' : 'RelativeHumidity',
-                                  'GPHeight' : 'WindSpeed', 'RelativeHumidity' : 'WindDirection'},
-                          inplace=True)
-    
-
+    metadatos, perfil = leer_extcsv(filename)
     
     # Extraer variables a ocupar
-    if 'WindSpeed' in dataframes.keys():
+    if 'WindSpeed' in perfil:
         # Si el archivo tiene mediciones de viento
         variables = ['GPHeight','Pressure', 'Temperature', 'RelativeHumidity',
                       'O3PartialPressure', 'WindSpeed', 'WindDirection']
@@ -117,15 +219,19 @@ def lecture_GAW(filename):
         # Si el archivo no tiene mediciones de viento
         variables = ['GPHeight','Pressure', 'Temperature', 'RelativeHumidity',
                       'O3PartialPressure']
-        
-    dataframes = dataframes[variables]
+    
+    # Index con el tiempo de lanzamiento, igual para todas las filas
+    n = len(perfil[variables[0]])
+    time = pd.DatetimeIndex(np.repeat(np.datetime64(metadatos.lanzamiento, 'ns'), n),
+                            name='Datetime')
+    dataframes = pd.DataFrame({v: perfil[v] for v in variables}, index=time)
     
     
     return dataframes    
 
 
 
-def lecture_CR2(filename):
+def lecture_CR2(filename, contenido=None):
     """
     Read individual sounding file obtained from CR2 database and return 
     dataframe with:
@@ -138,10 +244,16 @@ def lecture_CR2(filename):
         - wind speed [m/s]
         - wind direction [°]
 
+    The file is read once: the header (19 lines 'Key : value', with the
+    launch date and time) and the data block are parsed from the same text.
+
     Parameters
     ----------
     filename : str
-        Path + filename soundig data.
+        Path + filename soundig data, or name of the member in the archive.
+    contenido : bytes, optional
+        Content of the file, e.g. a member of DB-CR2.tgz (miembros_CR2).
+        If not given the file is read from disk.
 
     Returns
     -------
@@ -150,23 +262,24 @@ def lecture_CR2(filename):
 
     """
     
+    if contenido is None:
+        with open(filename, 'rb') as file:
+            contenido = file.read()
+    texto, _ = _decodificar(contenido)
     
-    df = pd.read_csv(filename, skiprows=list(range(19))+[20], sep='\s+', 
-                     na_values=9000, float_precision='round_trip')
-    
+    # Header, lineas 'Clave : valor'
+    cabecera = {}
+    for linea in texto.splitlines()[:19]:
+        clave, _, valor = linea.partition(':')
+        cabecera[clave.strip()] = valor.strip()
+    ti = pd.to_datetime(cabecera['Launch Date'] + ' ' + cabecera.get('Launch Time (UT)', ''))
     
-    ti_df = pd.read_csv(filename,nrows=1, skiprows=7, delimiter=":", header=None, parse_dates=[1])
-    ti = ti_df[1][0]
+    # Datos, desde el mismo texto (linea 20 nombres, linea 21 unidades)
+    df = pd.read_csv(io.StringIO(texto), skiprows=list(range(19))+[20], sep=r'\s+', 
+                     na_values=9000, float_precision='round_trip')
     
-    # Crear vector de tiempo, con el tiempo de lanzamiento para agregar index
-    # a dateframes
-    N = df.shape
-    time = []
-    for i in range(N[0]):
-        time.append(ti)
-        
-    df.index = time
-    df.index.rename('Datetime', inplace=True)
+    # Index con el tiempo de lanzamiento, igual para todas las filas
+    df.index = pd.DatetimeIndex(np.repeat(np.datetime64(ti, 'ns'), len(df)), name='Datetime')
     
     WSpeed = np.sqrt(df['u']**2 + df['v']**2)
     WDir = np.arctan2(-df['u'], -df['v']) * (180/np.pi)
@@ -190,66 +303,112 @@ def lecture_CR2(filename):
     return df
 
 
+def lecture_CR2_miembro(miembro):
+    """
+    lecture_CR2 for one (name, content) pair of miembros_CR2, for the pool
+    of cargar_sondeos.
+    """
+    return lecture_CR2(*miembro)
 
 
+def miembros_CR2(fn_tgz):
+    """
+    Soundings of the CR2 archive (DB-CR2.tgz), read in memory without
+    extracting it.
 
-# Get path
-path = os.getcwd()# use your path
-
-# Cargar los nombres de todos los archivos en las carpetas de la base de datos
-# de GAW
-filenames_GAW = []
-for year in range(1995, 2021):
-    # Path de carpeta de año en base datos de GAW
-    fns = os.path.join(path, "Data", "DB-GAW", str(year), str(year)+"*.csv")
-    filenames_GAW += glob(fns)
-
-
-# cargar todos los datos de ozonosondas en mismo dateframe
-dfold_GAW_aux = pd.DataFrame()
-for filename in filenames_GAW:
-    df = lecture_GAW(filename)
-    dfold_GAW_aux = pd.concat([dfold_GAW_aux, df])
-
-# Datetime de lanzamiento
-dates_GAW = dfold_GAW_aux.index.drop_duplicates()
-dates_GAW = dates_GAW.sort_values()
-
-# sort dataframe by launch datetime
-dfold_GAW = pd.DataFrame()
-for dat in dates_GAW:
-    dfold_GAW = pd.concat([dfold_GAW, dfold_GAW_aux.loc[dat]])
-    
-# remove negative values in O3PartialPressure
-dfold_GAW.O3PartialPressure[dfold_GAW.O3PartialPressure<0] = np.nan
-
-# Save all profiles in one file
-out_GAW = os.path.join(path, 'RapaNui_GAW_ozonesondes.csv')
-dfold_GAW.to_csv(out_GAW, sep=';')
-
-
-
+    Parameters
+    ----------
+    fn_tgz : str
+        Path of the archive.
 
+    Yields
+    ------
+    (name, content) : (str, bytes)
+        One pair per .dat member, in the order of the archive.
+    """
+    with tarfile.open(fn_tgz, 'r:*') as tar:
+        for miembro in tar:
+            if miembro.isfile() and miembro.name.endswith('.dat'):
+                yield miembro.name, tar.extractfile(miembro).read()
 
-# Cargar los nombres de todos los archivos en la carpeta DB-CR2
-path_CR2 = os.path.join(path, "Data", "DB-CR2", "*.dat")
-filenames_CR2 = glob(path_CR2)
 
+def cargar_sondeos(lector, fuentes, n_workers=None):
+    """
+    Read many soundings in a pool of worker processes and put them in one
+    dataframe, sorted by launch datetime.
 
-dfold_CR2_aux = pd.DataFrame()
-for filename in filenames_CR2:
-    df = lecture_CR2(filename)
-    dfold_CR2_aux = pd.concat([dfold_CR2_aux, df])
+    Each sounding gets a launch ID (its position in fuentes). The profiles
+    are concatenated once, and sorted with a stable sort on (launch
+    datetime, launch ID, sample order), so the rows of each launch keep the
+    order of the file, as before.
 
+    Parameters
+    ----------
+    lector : function
+        lecture_GAW, lecture_CR2 or lecture_CR2_miembro, must be defined at module level (it is
+        sent to the workers).
+    fuentes : iterable
+        Argument of lector for each sounding, e.g. the filenames or the
+        members of miembros_CR2.
+    n_workers : int, optional
+        Number of processes. The default is the number of CPUs. With 1 the
+        files are read in this process.
 
-dates_CR2 = dfold_CR2_aux.index.drop_duplicates()
-dates_CR2 = dates_CR2.sort_values()
+    Returns
+    -------
+    DataFrame
+        All the soundings, index 'Datetime' of the launch.
+    """
+    fuentes = list(fuentes)
+    if not fuentes:
+        return pd.DataFrame()
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1:
+        perfiles = [lector(f) for f in fuentes]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            perfiles = list(pool.map(lector, fuentes,
+                                     chunksize=max(1, len(fuentes)//(4*n_workers))))
 
-# sort dataframe by launch datetime
-dfold_CR2 = pd.DataFrame()
-for dat in dates_CR2:
-    dfold_CR2 = pd.concat([dfold_CR2, dfold_CR2_aux.loc[dat]])
+    n = np.array([len(df) for df in perfiles])
+    lanzamiento_id = np.repeat(np.arange(len(perfiles)), n)
+    muestra = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    df = pd.concat(perfiles)
+    orden = np.lexsort((muestra, lanzamiento_id, df.index.values))
+    return df.iloc[orden]
 
-out_CR2 = os.path.join(path, 'RapaNui_CR2_ozonesondes.csv')
-dfold_CR2.to_csv(out_CR2, sep=';')
 
+if __name__ == '__main__':
+    # Get path
+    path = os.getcwd()# use your path
+    
+    # Cargar los nombres de todos los archivos en las carpetas de la base de datos
+    # de GAW
+    filenames_GAW = []
+    for year in range(1995, 2021):
+        # Path de carpeta de año en base datos de GAW
+        fns = os.path.join(path, "Data", "DB-GAW", str(year), str(year)+"*.csv")
+        filenames_GAW += glob(fns)
+    
+    # cargar todos los datos de ozonosondas en mismo dateframe, ordenado por
+    # datetime de lanzamiento
+    dfold_GAW = cargar_sondeos(lecture_GAW, filenames_GAW)
+        
+    # remove negative values in O3PartialPressure
+    dfold_GAW.loc[dfold_GAW.O3PartialPressure<0, 'O3PartialPressure'] = np.nan
+    
+    # Save all profiles in one file
+    out_GAW = os.path.join(path, 'RapaNui_GAW_ozonesondes.csv')
+    dfold_GAW.to_csv(out_GAW, sep=';')
+    # and as ragged array (RapaNui_GAW_ozonesondes.npz/.json, __toolsSondes)
+    AlmacenSondeos.desde_dataframe(dfold_GAW).guardar(out_GAW)
+    
+    
+    # Leer los sondeos del archivo DB-CR2.tgz, sin extraerlo
+    fn_CR2 = os.path.join(path, "Data", "DB-CR2", "DB-CR2.tgz")
+    
+    dfold_CR2 = cargar_sondeos(lecture_CR2_miembro, miembros_CR2(fn_CR2))
+    
+    out_CR2 = os.path.join(path, 'RapaNui_CR2_ozonesondes.csv')
+    dfold_CR2.to_csv(out_CR2, sep=';')
+    AlmacenSondeos.desde_dataframe(dfold_CR2).guardar(out_CR2)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:17:45 2026
+
+Vertical interpolation of all the Rapa Nui soundings at once, onto the grid
+Z_INTERP (0-35 km every 100 m).
+
+The samples come from the ragged array store (__toolsSondes): flat columns
+with the samples of every launch one after the other, and the launch of each
+sample (lanz). Every step works on those flat arrays:
+    - ascendentes   : samples kept by remov_desc (height always increasing)
+    - mascara_capas : samples inside the layers of each launch that are not
+                      validated (Height_inf/Height_sup of RapaNui_dates_valid)
+    - interp_lote   : linear interpolation of every launch, the nodes of all
+                      launches are merged with the grid in one lexsort
+    - interpolar_sondeos, columna_ozono : every variable, dense result
+                      (launch x level x variable)
+
+The results are the ones of the former per launch functions interp_serie,
+ozone_column and remov_desc of CleningandSavingRapaNui.py, kept as reference
+in test_interpolacion.py: scipy interp1d(kind='linear', bounds_error=False),
+which evaluates with numpy.interp and fills with NaN outside the measured
+heights.
+"""
+
+import numpy as np
+
+
+# Height to interpolate, between 0-35 km every 100 m
+Z_INTERP = np.arange(0, 35.1, 0.1)
+
+
+def _rango(x):
+    # Dense rank of x (equal values, equal rank), exact integer keys
+    _, rango = np.unique(x, return_inverse=True)
+    return rango.astype(np.int64)
+
+
+def ascendentes(z, offsets):
+    """
+    Samples kept by remov_desc: the first one of each launch and those
+    higher than all the previous ones of the launch.
+
+    Parameters
+    ----------
+    z : array (n,)
+        Height of the samples of all the launches.
+    offsets : array (L+1,)
+        Samples of launch i are offsets[i]:offsets[i+1].
+
+    Returns
+    -------
+    ndarray of bool (n,)
+    """
+    n = len(z)
+    conservar = np.zeros(n, dtype=bool)
+    if n == 0:
+        return conservar
+    lanz = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    primero = np.zeros(n, dtype=bool)
+    primero[offsets[:-1][np.diff(offsets) > 0]] = True
+
+    # Heights as integer ranks, shifted by launch, so one running maximum
+    # serves all the launches. NaN never go up, a NaN first sample is above
+    # everything (nothing else of that launch is kept, as in remov_desc)
+    nan = np.isnan(z)
+    clave = np.full(n, -1, dtype=np.int64)
+    clave[~nan] = _rango(z[~nan])
+    tope = (clave.max() if n else 0) + 2
+    clave[primero & nan] = tope - 1
+    clave += lanz*tope
+    previo = np.maximum.accumulate(np.r_[np.iinfo(np.int64).min, clave[:-1]])
+    conservar = primero | (~primero & (clave > previo))
+    return conservar
+
+
+def mascara_capas(z, lanz, inf, sup, dHmax=0.3):
+    """
+    Samples inside the layers that are not validated, as in interp_serie and
+    ozone_column: a layer of depth <= dHmax is removed, a deeper one is set
+    to NaN. The layers of each launch are applied in order.
+
+    Parameters
+    ----------
+    z : array (n,)
+        Height of the samples [km].
+    lanz : array (n,)
+        Launch of each sample.
+    inf, sup : array (L, K)
+        Lower and upper limit [km] of the K layers of each launch, NaN where
+        a launch has fewer layers.
+    dHmax : float, optional
+        Maximum depth of a removed layer [km]. The default is 0.3.
+
+    Returns
+    -------
+    quitado : ndarray of bool (n,)
+        Samples removed (layers of depth <= dHmax).
+    anulado : ndarray of bool (n,)
+        Samples set to NaN (deeper layers).
+    """
+    quitado = np.zeros(len(z), dtype=bool)
+    anulado = np.zeros(len(z), dtype=bool)
+    for k in range(np.shape(inf)[1] if np.ndim(inf) == 2 else 0):
+        hi, hs = inf[lanz, k], sup[lanz, k]
+        hay = ~np.isnan(hi)
+        chica = hay & (hs - hi <= dHmax)
+        zk = np.where(anulado, np.nan, z)
+        with np.errstate(invalid='ignore'):
+            quitado |= chica & ~((zk < hi) | (zk > hs))
+            anulado |= hay & ~chica & (zk >= hi) & (zk <= hs)
+    return quitado, anulado
+
+
+def interp_lote(x, y, lanz, n_lanz, z=Z_INTERP):
+    """
+    Linear interpolation of many profiles at once, same values as
+    numpy.interp per profile, NaN outside the heights of each profile (as
+    interp1d with bounds_error=False).
+
+    Parameters
+    ----------
+    x : array (n,)
+        Nodes, grouped by launch and increasing inside each launch.
+    y : array (n,)
+        Values at the nodes (NaN propagate as in numpy.interp).
+    lanz : array (n,)
+        Launch of each node, non decreasing.
+    n_lanz : int
+        Number of launches L.
+    z : array (m,), optional
+        Heights where to interpolate. The default is Z_INTERP.
+
+    Returns
+    -------
+    ndarray (L, m)
+    """
+    z = np.asarray(z, dtype=np.float64)
+    m = len(z)
+    if len(x) == 0:
+        return np.full((n_lanz, m), np.nan)
+    n_por = np.bincount(lanz, minlength=n_lanz)
+    inicio = np.r_[0, np.cumsum(n_por)[:-1]]
+
+    # Nodes <= each height of the grid, in each launch: nodes and grid of
+    # all the launches sorted together (launch, height, node before grid)
+    zq = np.tile(z, n_lanz)
+    lq = np.repeat(np.arange(n_lanz), m)
+    orden = np.lexsort((np.r_[np.zeros(len(x), dtype=np.int8), np.ones(len(zq), dtype=np.int8)],
+                        np.r_[x, zq], np.r_[lanz, lq]))
+    es_nodo = orden < len(x)
+    antes = np.cumsum(es_nodo) - es_nodo
+    j = np.empty(len(zq), dtype=np.int64)
+    j[orden[~es_nodo] - len(x)] = antes[~es_nodo]
+    j = j - inicio[lq] - 1
+
+    n = n_por[lq]
+    res = np.full(len(zq), np.nan)
+    dentro = (n > 0) & (j >= 0)
+    dentro[dentro] = zq[dentro] <= x[inicio[lq[dentro]] + n[dentro] - 1]
+    jg = inicio[lq] + j
+    # Last node or exactly on a node: value of the node
+    exacto = dentro & ((j == n - 1) | (x[np.where(dentro, jg, 0)] == zq))
+    res[exacto] = y[jg[exacto]]
+    # Between nodes jg and jg+1, as numpy.interp (other side if NaN)
+    entre = dentro & ~exacto
+    a, b, q = jg[entre], jg[entre] + 1, zq[entre]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pendiente = (y[b] - y[a])/(x[b] - x[a])
+        v = pendiente*(q - x[a]) + y[a]
+        otro = np.isnan(v)
+        v[otro] = pendiente[otro]*(q[otro] - x[b[otro]]) + y[b[otro]]
+        igual = otro & np.isnan(v) & (y[a] == y[b])
+        v[igual] = y[a[igual]]
+    res[entre] = v
+    return res.reshape(n_lanz, m)
+
+
+def interpolar_sondeos(z, lanz, n_lanz, series, validos, capas, z_intp=Z_INTERP, dHmax=0.3):
+    """
+    Interpolate every variable of every launch, as interp_serie.
+
+    Parameters
+    ----------
+    z : array (n,)
+        Height of the samples [km], increasing inside each launch (see
+        ascendentes).
+    lanz : array (n,)
+        Launch of each sample, 0..L-1, non decreasing.
+    n_lanz : int
+        Number of launches L.
+    series : dict
+        Variable name -> values of the samples, array (n,).
+    validos : dict
+        Variable name -> array (L,), the profile is interpolated where it is
+        not 0 (prof_val of interp_serie), else it is NaN.
+    capas : dict
+        Variable name -> (inf, sup), arrays (L, K) with the layers not
+        validated, see mascara_capas.
+    z_intp : array (m,), optional
+        Heights where to interpolate [km]. The default is Z_INTERP.
+    dHmax : float, optional
+        See mascara_capas. The default is 0.3.
+
+    Returns
+    -------
+    ndarray (L, m, number of variables)
+        In the order of series.
+    """
+    resultado = np.full((n_lanz, len(z_intp), len(series)), np.nan)
+    for k, (nombre, y) in enumerate(series.items()):
+        y = np.asarray(y, dtype=np.float64)
+        valido = np.asarray(validos[nombre]) != 0
+        quitado, anulado = mascara_capas(z, lanz, *capas[nombre], dHmax=dHmax)
+        nodo = valido[lanz] & ~np.isnan(y) & ~quitado & ~anulado
+        resultado[:, :, k] = interp_lote(z[nodo], y[nodo], lanz[nodo], n_lanz, z_intp)
+    return resultado
+
+
+def columna_ozono(pO3, pressure, z, lanz, n_lanz, valido, capas, z_intp=Z_INTERP, dHmax=0.3):
+    """
+    Ozone column of every launch, as ozone_column: integrated between
+    consecutive samples from the ground, and interpolated to z_intp. Above a
+    deep layer set to NaN the column is NaN.
+
+    Parameters
+    ----------
+    pO3 : array (n,)
+        Ozone partial pressure [mPa].
+    pressure : array (n,)
+        Pressure [hPa].
+    z, lanz, n_lanz, z_intp, dHmax :
+        See interpolar_sondeos.
+    valido : array (L,)
+        prof_val of each launch.
+    capas : (inf, sup)
+        Arrays (L, K), see mascara_capas.
+
+    Returns
+    -------
+    ndarray (L, m)
+    """
+    usado = (np.asarray(valido) != 0)[lanz] & ~np.isnan(pO3) & ~np.isnan(pressure)
+    z, pO3, pressure, lanz = z[usado], pO3[usado], pressure[usado], lanz[usado]
+    quitado, anulado = mascara_capas(z, lanz, *capas, dHmax=dHmax)
+    z, pO3, pressure, lanz, anulado = (a[~quitado] for a in (z, pO3, pressure, lanz, anulado))
+    z = np.where(anulado, np.nan, z)
+    pO3 = np.where(anulado, np.nan, pO3)
+    pressure = np.where(anulado, np.nan, pressure)
+
+    # Ozone by layers, between consecutive samples of the same launch
+    mismo = lanz[:-1] == lanz[1:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dO3 = 3.9449*(pO3[:-1] + pO3[1:]) * np.log(pressure[:-1]/pressure[1:])
+    dO3, z_capa, l_capa = dO3[mismo], z[:-1][mismo], lanz[:-1][mismo]
+
+    # Integrate ozone, one row per launch (same sums as np.cumsum per launch)
+    n_por = np.bincount(l_capa, minlength=n_lanz)
+    inicio = np.r_[0, np.cumsum(n_por)[:-1]]
+    col = np.arange(len(dO3)) - inicio[l_capa]
+    matriz = np.zeros((n_lanz, n_por.max() if len(n_por) else 0))
+    matriz[l_capa, col] = dO3
+    O3_col = np.cumsum(matriz, axis=1)[l_capa, col]
+
+    # Samples set to NaN are not nodes
+    nodo = ~np.isnan(z_capa)
+    return interp_lote(z_capa[nodo], O3_col[nodo], l_capa[nodo], n_lanz, z_intp)
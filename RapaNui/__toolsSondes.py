@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:41:09 2026
+
+Ragged-array store of the Rapa Nui soundings.
+
+The CSV files of the soundings (RapaNui_GAW_ozonesondes.csv,
+RapaNui_CR2_ozonesondes.csv, RapaNui_all_ozonesondes.csv) are long tables
+indexed by the launch datetime, repeated for every sample. AlmacenSondeos
+keeps the same data as a CF "contiguous ragged array":
+    - lanzamientos : launch datetimes, sorted, datetime64[ns] (L,)
+    - offsets      : int64 (L+1,), the samples of launch i are
+                     offsets[i]:offsets[i+1]
+    - columnas     : one contiguous float64 array per variable (GPHeight,
+                     Pressure, ...), all the samples of all the launches
+so the profile of one launch is a slice (views, no copy) instead of a .loc
+on a non-unique DatetimeIndex.
+
+Each CSV is also saved next to it as <name>.npz (lanzamientos, offsets and
+the columns) and <name>.json (manifest: version, columns, number of launches
+and samples, size/mtime of the CSV). cargar_almacen reads the .npz in one go,
+or the CSV if the store is missing or older than the CSV.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+
+ALMACEN_VERSION = 1
+
+
+def ruta_almacen(fn):
+    """
+    Parameters
+    ----------
+    fn : str
+        Path of the CSV file, e.g. RapaNui_all_ozonesondes.csv
+
+    Returns
+    -------
+    fn_npz, fn_json : str
+        Paths of the arrays and of the manifest of the store.
+    """
+    base = os.path.splitext(fn)[0]
+    return base + '.npz', base + '.json'
+
+
+def _firma(fn):
+    """Size and modification time of a file, None if it does not exist."""
+    if not os.path.isfile(fn):
+        return None
+    st = os.stat(fn)
+    return {'name': os.path.basename(fn), 'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns}
+
+
+class AlmacenSondeos:
+    """
+    Soundings as a contiguous ragged array (see the module docstring).
+
+    Parameters
+    ----------
+    lanzamientos : array (L,)
+        Launch datetimes, sorted and unique.
+    offsets : array (L+1,)
+        Start of the samples of each launch, offsets[-1] is the number of
+        samples.
+    columnas : dict
+        Variable name -> float64 array (offsets[-1],).
+    """
+
+    def __init__(self, lanzamientos, offsets, columnas):
+        self.lanzamientos = np.asarray(lanzamientos, dtype='datetime64[ns]')
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.columnas = {c: np.asarray(v, dtype=np.float64) for c, v in columnas.items()}
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        """
+        Store of a long table of soundings, indexed by the launch datetime.
+        The rows of each launch keep their order (the same rows, in the same
+        order, as df.loc[[fecha]]).
+        """
+        tiempo = pd.DatetimeIndex(df.index).values.astype('datetime64[ns]')
+        orden = np.argsort(tiempo, kind='stable')
+        tiempo = tiempo[orden]
+        # first sample of each launch
+        inicio = np.flatnonzero(np.r_[True, tiempo[1:] != tiempo[:-1]])
+        if not len(tiempo):
+            inicio = inicio[:0]
+        columnas = {str(c): np.ascontiguousarray(df[c].values[orden], dtype=np.float64)
+                    for c in df.columns}
+        return cls(tiempo[inicio], np.r_[inicio, len(tiempo)], columnas)
+
+    def __len__(self):
+        return len(self.lanzamientos)
+
+    @property
+    def n_muestras(self):
+        """Number of samples, all launches."""
+        return int(self.offsets[-1])
+
+    @property
+    def variables(self):
+        return list(self.columnas)
+
+    @property
+    def fechas(self):
+        """Launch datetimes, DatetimeIndex named 'Datetime'."""
+        return pd.DatetimeIndex(self.lanzamientos, name='Datetime')
+
+    @property
+    def n_por_lanzamiento(self):
+        """Number of samples of each launch, int64 (L,)."""
+        return np.diff(self.offsets)
+
+    def posicion(self, fecha):
+        """
+        Position of a launch, fecha is a datetime of self.lanzamientos or
+        already a position (int).
+        """
+        if isinstance(fecha, (int, np.integer)):
+            return int(fecha)
+        t = np.datetime64(pd.Timestamp(fecha), 'ns')
+        i = int(np.searchsorted(self.lanzamientos, t))
+        if i == len(self.lanzamientos) or self.lanzamientos[i] != t:
+            raise KeyError(fecha)
+        return i
+
+    def muestras(self, fecha):
+        """slice of the samples of one launch in the columns."""
+        i = self.posicion(fecha)
+        return slice(self.offsets[i], self.offsets[i+1])
+
+    def perfil(self, fecha):
+        """
+        Profile of one launch.
+
+        Returns
+        -------
+        dict
+            Variable name -> float64 array, views of the columns (do not
+            modify them in place).
+        """
+        s = self.muestras(fecha)
+        return {c: v[s] for c, v in self.columnas.items()}
+
+    def dataframe(self, fecha):
+        """
+        Profile of one launch as a DataFrame, like dfold.loc[[fecha]] on the
+        CSV: index 'Datetime' with the launch datetime repeated.
+        """
+        i = self.posicion(fecha)
+        perfil = self.perfil(i)
+        n = int(self.offsets[i+1] - self.offsets[i])
+        tiempo = pd.DatetimeIndex(np.repeat(self.lanzamientos[i], n), name='Datetime')
+        return pd.DataFrame(perfil, index=tiempo)
+
+    def a_dataframe(self):
+        """All the soundings as the long table of the CSV files."""
+        tiempo = pd.DatetimeIndex(np.repeat(self.lanzamientos, self.n_por_lanzamiento),
+                                  name='Datetime')
+        return pd.DataFrame(self.columnas, index=tiempo)
+
+    def guardar(self, fn):
+        """
+        Save the store next to the CSV file fn. Call it right after
+        df.to_csv(fn), so the store is bound to that version of the CSV.
+
+        Returns
+        -------
+        fn_npz : str
+        """
+        fn_npz, fn_json = ruta_almacen(fn)
+        # The manifest is written last, a store without manifest is not valid
+        if os.path.isfile(fn_json):
+            os.remove(fn_json)
+        arrays = {'lanzamientos': self.lanzamientos, 'offsets': self.offsets}
+        arrays.update({'col-' + str(k): v for k, v in enumerate(self.columnas.values())})
+        np.savez(fn_npz, **arrays)
+
+        manifest = {'version': ALMACEN_VERSION,
+                    'columns': self.variables,
+                    'launches': len(self),
+                    'samples': self.n_muestras,
+                    'source': _firma(fn)}
+        with open(fn_json + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(fn_json + '.tmp', fn_json)
+        return fn_npz
+
+    @classmethod
+    def leer(cls, fn):
+        """
+        Store saved next to the CSV file fn, None if it is missing, written
+        by another version of this module or older than the CSV.
+        """
+        fn_npz, fn_json = ruta_almacen(fn)
+        if not (os.path.isfile(fn_npz) and os.path.isfile(fn_json)):
+            return None
+        with open(fn_json) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != ALMACEN_VERSION:
+            return None
+        # If the CSV was rewritten after the store, the store is stale
+        firma = _firma(fn)
+        if firma is not None and firma != manifest['source']:
+            return None
+        with np.load(fn_npz) as z:
+            columnas = {c: z['col-' + str(k)] for k, c in enumerate(manifest['columns'])}
+            return cls(z['lanzamientos'], z['offsets'], columnas)
+
+
+def cargar_almacen(fn):
+    """
+    Soundings of the CSV file fn (sep=';', index of launch datetimes), from
+    its store if it is up to date. Otherwise the CSV is read and its store
+    saved for the next time.
+
+    Returns
+    -------
+    AlmacenSondeos
+    """
+    almacen = AlmacenSondeos.leer(fn)
+    if almacen is None:
+        df = pd.read_csv(fn, delimiter=';', index_col=0, parse_dates=True,
+                         float_precision='round_trip')
+        almacen = AlmacenSondeos.desde_dataframe(df)
+        almacen.guardar(fn)
+    return almacen
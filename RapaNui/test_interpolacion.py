@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 00:21:14 2026
+
+Batch interpolation of __toolsInterpolacion against the per launch functions
+it replaced in CleningandSavingRapaNui.py (remov_desc, interp_serie and
+ozone_column, kept here as reference).
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import interp1d
+from __toolsInterpolacion import (Z_INTERP, ascendentes, interpolar_sondeos,
+                                  columna_ozono)
+
+
+############################# Reference ######################################
+
+def remov_desc(df):
+    """
+    Remove rows with points in sonde data that are descending in altitude 
+    during flight time
+    
+    Parameters
+    ----------
+    df : DataFrame
+        DataFrame with data per launch.
+
+    Returns
+    -------
+    df_clean : DataFrame
+        DataFrame without points that are descending in profile
+
+    """
+    
+    # Extract altitude
+    z = df.GPHeight.values
+    
+    # Find z decreasing
+    i_zasc = [0]
+    zant = z[0]
+    for i in range(1,len(z)):
+        if z[i] > zant:
+            zant = z[i]
+            i_zasc.append(i)
+        else:
+            pass
+            
+    # remove zdec in dataframe
+    df_clean = df.iloc[i_zasc]
+    
+    return df_clean
+
+
+
+def ozone_column(pO3, pressure, z, z_intp, type_intp='linear', prof_val=0,  
+                 Hinf=[], Hsup=[], dHmax = 0.3):
+    """
+    Calculate ozone column profile and interpolate to regular altitudes in array z. 
+    Return profile with nan's if serie does not validate. If it is validate and Hinf 
+    and Hsup are not [], there are 2 posibilities:
+        - If atmospheric layer depth is less than dHmax (by defeault = 1 km), 
+          points inside this layer don't be considerated for interpolation
+        - If atmospheric layer depth is greater than dHmax (by defeault = 1 km), 
+          points inside this layer are set to nan's.
+
+    Parameters
+    ----------
+    pO3 : array
+        Ozone partial pressure profile in [mPa].
+    pressure : array
+        Atmospheric pressure profile in [hPa].
+    z : array
+        Array with altitudes measured altitudes in [km].
+    z_intp : array
+        Array with altitudes where interpolate in [km].
+    type_intp : str, optional
+        Type of interpolation. The default is 'linear'.
+    prof_val: int or float
+        Indicate if serie is validated. If it is not validated, prof_val=0; if
+        it is validated, prof_val=1 if is. By defalt prof_val=0
+    Hinf: list
+        Contains lower limit of atmospheric layers does not validate in [km]. By 
+        default is []
+    Hsup: list
+        Contains upper limit of atmospheric layers does not validate in [km]. By
+        default is []
+    dHmax: float
+        Maximum atmospheric layer depth, in km, to interpolate with missing data
+
+
+    Returns
+    -------
+    serie_intp : array
+        Variable interpolated to regular altitudes.
+
+    """
+    
+    # If profile doesn't validated, return profile interpolated with nan's
+    if prof_val == 0:
+        
+        O3_col_intp = np.nan * np.zeros(len(z_intp))
+        
+        return O3_col_intp
+    
+    
+    # If profile is validated, to interpolate data
+    
+    # copy original data to interpolate
+    z_cp = z.copy()
+    pO3_cp = pO3.copy()
+    pressure_cp = pressure.copy()
+
+    # Remove individual nan's
+    ind = ~np.isnan(pO3_cp) & ~np.isnan(pressure_cp)
+    z_cp = z_cp[ind]    
+    pressure_cp = pressure_cp[ind]
+    pO3_cp = pO3_cp[ind]  
+
+    
+    if len(Hinf) > 0:
+        for i in range(len(Hinf)):
+            dH = Hsup[i] - Hinf[i]
+            
+            if dH <= dHmax:
+                pO3_cp = pO3_cp[(z_cp < Hinf[i]) | (z_cp > Hsup[i])]
+                pressure_cp = pressure_cp[(z_cp < Hinf[i]) | (z_cp > Hsup[i])]
+                z_cp = z_cp[(z_cp < Hinf[i]) | (z_cp > Hsup[i])]
+                
+                
+            else: #dH > dHmax
+                pO3_cp[(z_cp >= Hinf[i]) & (z_cp <= Hsup[i])] = np.nan
+                pressure_cp[(z_cp >= Hinf[i]) & (z_cp <= Hsup[i])] = np.nan
+                z_cp[(z_cp >= Hinf[i]) & (z_cp <= Hsup[i])] = np.nan
+            
+    
+    # Calculate ozone by layers
+    dO3 =  3.9449*(pO3_cp[0:-1] + pO3_cp[1:]) * np.log(pressure_cp[0:-1]/pressure_cp[1:])
+    # Integrate ozone
+    O3_col = np.cumsum(dO3)
+    
+    # Interpolate ozone column
+    O3_f = interp1d(z_cp[0:-1], O3_col, type_intp, bounds_error=False)
+    O3_col_intp = O3_f(z_intp)
+
+    
+    return O3_col_intp
+
+
+
+
+def interp_serie(z_intp, z, serie, type_intp='linear', prof_val=0, Hinf=[], 
+                 Hsup=[], dHmax = 0.3):
+    """
+    Interpolate vertical profiles to regular altitudes in array z. Return
+    profile with nan's if serie does not validate. If it is validate and Hinf 
+    and Hsup are not [], there are 2 posibilities:
+        - If atmospheric layer depth is less than dHmax (by defeault = 0.3 km), 
+          points inside this layer don't be considerated for interpolation
+        - If atmospheric layer depth is greater than dHmax (by defeault = 0.3 km), 
+          points inside this layer are set to nan's.
+
+    Parameters
+    ----------
+    z_intp : array
+        Array with altitudes where interpolate in [km].
+    z : array
+        Array with altitudes measured altitudes in [km].
+    serie : array
+        Measured variable to interpolate.
+    type_intp : str, optional
+        Type of interpolation. The default is 'linear'.
+    prof_val: int or float
+        Indicate if serie is validated. If it is not validated, prof_val=0; if
+        it is validated, prof_val=1 if is. By defalt prof_val=0
+    Hinf: list
+        Contains lower limit of atmospheric layers does not validate in [km]. By 
+        default is []
+    Hsup: list
+        Contains upper limit of atmospheric layers does not validate in [km]. By
+        default is []
+    dHmax: float
+        Maximum atmospheric layer depth, in km, to interpolate with missing data
+
+    Returns
+    -------
+    serie_intp : array
+        Variable interpolated to regular altitudes.
+
+    """
+    
+    # If profile doesn't validated, return profile interpolated with nan's
+    if prof_val == 0:
+        
+        serie_intp = np.nan * np.zeros(len(z_intp))
+        
+        return serie_intp
+    
+    
+    # If profile is validated, to interpolate data
+    
+    # copy original data to interpolate
+    z_cp = z.copy()
+    serie_cp = serie.copy()
+
+    # Remove individual nan's in serie
+    z_cp = z_cp[~np.isnan(serie_cp)]    
+    serie_cp = serie_cp[~np.isnan(serie_cp)]  
+    
+    if len(Hinf) > 0:
+        for i in range(len(Hinf)):
+            dH = Hsup[i] - Hinf[i]
+            
+            if dH <= dHmax:
+                serie_cp = serie_cp[(z_cp < Hinf[i]) | (z_cp > Hsup[i])]
+                z_cp = z_cp[(z_cp < Hinf[i]) | (z_cp > Hsup[i])]
+                
+                
+            else: #dH > dHmax
+                serie_cp[(z_cp >= Hinf[i]) & (z_cp <= Hsup[i])] = np.nan
+                z_cp[(z_cp >= Hinf[i]) & (z_cp <= Hsup[i])] = np.nan
+            
+    
+    # Interpolate data
+    serie_f = interp1d(z_cp, serie_cp, type_intp, bounds_error=False)
+    serie_intp = serie_f(z_intp)
+
+    
+    return serie_intp
+
+
+############################# Tests ##########################################
+
+def sondeos(semilla, L=40):
+    # Random launches: heights mostly ascending (with some descents), NaN,
+    # validity and layers (shallow and deep) for each launch
+    rng = np.random.default_rng(semilla)
+    n = rng.integers(60, 400, L)
+    offsets = np.r_[0, np.cumsum(n)]
+    z = np.concatenate([np.cumsum(rng.uniform(-0.02, 0.2, k)) + rng.uniform(0, 0.1)
+                        for k in n])
+    y = rng.normal(10, 3, offsets[-1])
+    y[rng.random(len(y)) < 0.05] = np.nan
+    p = np.concatenate([1013*np.exp(-np.maximum.accumulate(z[a:b])/7)
+                        for a, b in zip(offsets[:-1], offsets[1:])])
+    valido = (rng.random(L) < 0.8).astype(float)
+    capas = []
+    for i in range(L):
+        c = []
+        for _ in range(rng.integers(0, 3)):
+            hi = rng.uniform(0, 25)
+            c.append((hi, hi + rng.choice([0.1, 0.2, 1., 3.])))
+        capas.append(c)
+    return offsets, z, y, p, valido, capas
+
+
+def capas_array(capas):
+    K = max([len(c) for c in capas] + [0])
+    inf = np.full((len(capas), K), np.nan)
+    sup = np.full((len(capas), K), np.nan)
+    for i, c in enumerate(capas):
+        for k, (hi, hs) in enumerate(c):
+            inf[i, k], sup[i, k] = hi, hs
+    return inf, sup
+
+
+def test_ascendentes():
+    offsets, z = sondeos(0)[:2]
+    esperado = np.concatenate([
+        a + remov_desc(pd.DataFrame({'GPHeight': z[a:b]})).index.values
+        for a, b in zip(offsets[:-1], offsets[1:])])
+    np.testing.assert_array_equal(np.flatnonzero(ascendentes(z, offsets)), esperado)
+
+
+def test_interpolar_y_columna():
+    for semilla in range(5):
+        offsets, z, y, p, valido, capas = sondeos(semilla)
+        L = len(offsets) - 1
+        asc = ascendentes(z, offsets)
+        lanz = np.repeat(np.arange(L), np.diff(offsets))[asc]
+        z, y, p = z[asc], y[asc], p[asc]
+        inf, sup = capas_array(capas)
+
+        serie = interpolar_sondeos(z, lanz, L, {'y': y}, {'y': valido},
+                                   {'y': (inf, sup)})[:, :, 0]
+        columna = columna_ozono(y, p, z, lanz, L, valido, (inf, sup))
+        for i in range(L):
+            k = lanz == i
+            Hinf = [c[0] for c in capas[i]]
+            Hsup = [c[1] for c in capas[i]]
+            np.testing.assert_array_equal(
+                serie[i], interp_serie(Z_INTERP, z[k], y[k], prof_val=valido[i],
+                                       Hinf=Hinf, Hsup=Hsup))
+            np.testing.assert_array_equal(
+                columna[i], ozone_column(y[k], p[k], z[k], Z_INTERP, prof_val=valido[i],
+                                         Hinf=Hinf, Hsup=Hsup))
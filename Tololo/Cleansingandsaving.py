@@ -31,6 +31,16 @@ from info_Plotting import FHIST
 from info_Plotting import FHIST2
 from info_Plotting import FSERIES
 from pathlib import Path
+import argparse
+from __toolsStore import save_store, leer_csv, store_vigente, ventana
+from __toolsStore import leer_manifest_ingesta, guardar_manifest_ingesta, reemplazar_ventana
+from __toolsQC import filtro_picos, completitud, PipelineQC
+
+parser = argparse.ArgumentParser(description='Cleans and saves Tololo DMC ozone data')
+parser.add_argument('--incremental', action='store_true',
+                    help='only clean again the window of DMC data changed by Readingandsaving.py --incremental')
+#parse_known_args, so it can be run from Spyder/IPython
+args = parser.parse_known_args()[0]
 
 
 
@@ -53,8 +63,7 @@ from pathlib import Path
 
 orig = os.getcwd() #Says where the file is
 fn = os.path.join(orig,'DATA','EBAS-O3H-2013-2019.csv')
-df = pd.read_csv(fn, parse_dates=True, index_col=0)
-df.rename(columns={'Unnamed: 0': 'Date'}, inplace=True)
+df = leer_csv(fn)
 
 df_orig_ebas = df #Original EBAS data set
 
@@ -79,7 +88,7 @@ orig = os.getcwd() #Says where the file is
 #fn=orig+'/Data/'+'DMC-O3_RH_15m_dmc-1995-2012'  # cambiar fn linea inferior
 fn = os.path.join(orig,'DATA','DMC-O3_RH_15m_dmc-1995-2013.csv')
 
-df = pd.read_csv(fn,index_col=0,parse_dates=True) 
+df = leer_csv(fn)
 #df.rename(columns = {'Unnamed: 0':'Date'}, inplace = True)
 df_orig_dmc = df  #Original time series, before cleansing
 
@@ -119,8 +128,6 @@ def clean_series_demo(Min, Max, df):
 
 #Removing values below detection limit or the assumed range of calibration, i.e. 5 ppbv
 
-    a.O3_ppbv[a.O3_ppbv < Min] = np.nan
-
 # # WARNING
 # See the caveats in the documentation: https://pandas.pydata.org/pandas-docs/stable/user_guide/indexing.html#returning-a-view-versus-a-copy
 #   df.O3_ppbv[df.O3_ppbv <5] = np.nan
@@ -130,7 +137,7 @@ def clean_series_demo(Min, Max, df):
 #The time series evidences calibration spikes. In lack of the record of dates of calibration, 
 # we remove values above 65 ppbv, considering the data distribution of EBAS hourly values
 
-    a.O3_ppbv[a.O3_ppbv > Max] = np.nan
+    a['O3_ppbv'] = PipelineQC().rango(Min, Max).aplicar(a.O3_ppbv)[0]
     FSERIES('O3', 'DMC', a, 1)
     FHIST2('O3', 'DMC', a, 50)
     series = a.O3_ppbv
@@ -155,11 +162,8 @@ def clean_series(Min, Max, df):
         filtered data.
 
     """
-    inf = df.O3_ppbv < Min
-    df.O3_ppbv[inf] = np.nan
-    sup = df.O3_ppbv > Max
-    df.O3_ppbv[sup] = np.nan
-    return inf.sum() + sup.sum()
+    df['O3_ppbv'], mascara, rechazos = PipelineQC().rango(Min, Max).aplicar(df.O3_ppbv)
+    return rechazos['rango']
 #clean_series(min_filter, max_filter, df)
 #sum_first_filter = clean_series(5, 65, df)
 
@@ -170,81 +174,102 @@ def clean_near(df, n, c):
     Parameters
     ----------
     df : Dataframe
-        DESCRIPTION.
+        DMC data every 15 minutes.
     n : int
-        DESCRIPTION.
+        Number of previous values (15 minutes each) of the moving mean.
     c : float
-        DESCRIPTION.
-    d : float
-        DESCRIPTION.
+        Values over c times the mean, or under (c-1) times the mean, of the
+        n previous values are removed. Only O3_ppbv is filtered.
 
     Returns
     -------
     list
-        DESCRIPTION.
+        Filtered data, number of values removed over and under the mean.
 
     """
 
+    # Window in time, not in rows, so gaps in the index are not mixed up
+    # with the previous values (see __toolsQC.mascara_picos)
     df_2 = df.copy()
-    df_movil = df.rolling(window=n).mean()
-    first_hour = dt.strptime(str(df_movil.index[0]), '%Y-%m-%d %H:%M:%S')
-    last_hour = dt.strptime(str(df_movil.index[-1]), '%Y-%m-%d %H:%M:%S')
-    first_hour_des = first_hour + datetime.timedelta(minutes=15)
-    last_hour_des = last_hour + datetime.timedelta(minutes=15)
-    hour_mod = pd.date_range(str(first_hour_des), str(last_hour_des),
-                             freq='15min')
-    df_mod = pd.DataFrame({'O3_ppbv': df_movil.O3_ppbv.values}, index=hour_mod)
-    index_sup = (c*df_mod) - df < 0
-    df_2[index_sup] = np.nan
-    supr_date_1 = index_sup.sum()
-    index_sup = ((c-1)*df_mod) - df > 0
-    df_2[index_sup] = np.nan
-    supr_date_2 = index_sup.sum()
+    df_2['O3_ppbv'], rechazos = filtro_picos(df.O3_ppbv, ventana=n*pd.Timedelta('15min'),
+                                             criterio='media', c=c, min_periodos=n)
+    supr_date_1 = pd.Series(0, index=df.columns)
+    supr_date_2 = pd.Series(0, index=df.columns)
+    supr_date_1['O3_ppbv'] = rechazos['pico_alto']
+    supr_date_2['O3_ppbv'] = rechazos['pico_bajo']
 
     return [df_2, supr_date_1, supr_date_2]
-df = clean_near(df, 3 , 1.5)[0]
-#Removing values under 5 ppbv
-df[df <5] = np.nan
-#Removing values over 100 ppbv
-df[df >100] = np.nan
-# función que permite calcular las medias horarias para un intervalo con
-# una cierta cantidad de datos
-def completitud(df, n, frec):
+# Quality control of the DMC data: spikes as in clean_near(df, 3, 1.5), then
+# removing values under 5 ppbv and over 100 ppbv. The same range is applied
+# to the relative humidity
+QC_O3 = PipelineQC().picos(ventana='45min', criterio='media', c=1.5, min_periodos=3).rango(5, 100)
+QC_RH = PipelineQC().rango(5, 100)
+def limpiar(df):
     """
     Parameters
     ----------
-    df : DataFrame, contiene la información de las mediciones.
-    n : int, número de datos mínimo que debe contener el intervalo de tiempo 
-        para calcular la media.
-    frec : str, indica la frecuencia de los datos a promediar.
+    df : DataFrame
+        DMC data every 15 minutes.
 
     Returns
     -------
-    list
-        Entrega una lista con un DataFrame con los datos promediados en el 
-        intervalo de tiempo sugerido y un conteo de los datos no considerados.
+    df : DataFrame
+        Data after QC_O3 (ozone) and QC_RH (relative humidity).
+    qc : array of uint16
+        Rules that rejected each ozone value (__toolsQC.BITS_QC).
+    rechazos : dict
+        Number of ozone values rejected by each rule.
     """
-    bad_mean = np.isnan(df.O3_ppbv).astype(int).resample(frec).sum()
-    m = np.isnan(df.O3_ppbv).astype(int).resample(frec).sum().max()
-    good_mean = bad_mean > m-n
-    count_bad = good_mean.sum()
-    df_hourly = df.resample(frec).mean()
-    df_hourly[good_mean] = np.nan
-    return [df_hourly, count_bad]
-# Data frame que permite ver los cambios para el cálculo de promedios horarios
-# con 3 o mas mediciones en una hora     
-df2 = completitud(df,3,'H')[0] 
+    df = df.copy()
+    df['O3_ppbv'], qc, rechazos = QC_O3.aplicar(df.O3_ppbv)
+    df['RH_perc'] = QC_RH.aplicar(df.RH_perc)[0]
+    return df, qc, rechazos
+# completitud (__toolsQC.py) calcula las medias horarias para un intervalo
+# con una cierta cantidad de datos
+
+orig = os.getcwd()
+
+fn=os.path.join(orig,'DATA','DMC-O3_RH_1H_dmc-1995-2013_clear.csv')
+#fn=orig+'/Data/DMC-O3_RH_15m_dmc-1995-2012_clear'
+
+# With --incremental only the window of DMC data changed since the last run
+# (written by Readingandsaving.py in DATA/ingesta.json) is cleaned again, and
+# replaces the same window of the saved hourly series
+manifest = leer_manifest_ingesta(os.path.join(orig,'DATA'))
+incremental = args.incremental and manifest is not None and store_vigente(fn) is not None
+
+if not incremental:
+    df, qc_O3, rechazos_O3 = limpiar(df)
+    # Data frame que permite ver los cambios para el cálculo de promedios horarios
+    # con 3 o mas mediciones en una hora     
+    df2 = completitud(df,3,'H')[0] 
+elif manifest['pendiente'].get('DMC') is None:
+    # Nothing changed
+    df2 = leer_csv(fn)
+else:
+    inicio, fin = manifest['pendiente']['DMC']
+    inicio = pd.Timestamp(inicio).floor('D')
+    fin = pd.Timestamp(fin).floor('D') + pd.Timedelta('1D')
+    # One day more on each side, so the moving mean of the spike filter at the
+    # limits of the window uses the same data as in the whole series
+    df, qc_O3, rechazos_O3 = limpiar(ventana(df, inicio - pd.Timedelta('1D'), fin))
+    df2 = completitud(df,3,'H')[0]
+    df2 = df2[(df2.index >= inicio) & (df2.index < fin)]
+    df2 = reemplazar_ventana(leer_csv(fn), df2, inicio, fin)
+
 FSERIES('O3', 'DMC', df, 1)
 #grafico del dataframe mencionado anteriormente
 FSERIES('O3', 'DMC', df2, 1)
 
 #PENDING TIME AXES
 
-orig = os.getcwd()
-
-fn=os.path.join(orig,'DATA','DMC-O3_RH_1H_dmc-1995-2013_clear.csv')
-#fn=orig+'/Data/DMC-O3_RH_15m_dmc-1995-2012_clear'
 df2.to_csv(fn)
+save_store(df2, fn)
+
+# The DMC data are clean up to date
+if manifest is not None:
+    manifest['pendiente']['DMC'] = None
+    guardar_manifest_ingesta(os.path.join(orig,'DATA'), manifest)
 
 
 #Creating histograms of data
@@ -13,6 +13,10 @@ from datetime import date
 from datetime import timedelta
 from datetime import datetime as dt
 import pandas as pd
+from __toolsQC import PipelineQC
+
+# Preliminary filter of the comparison
+QC_2013 = PipelineQC().rango(5, 65)
 
 orig_ebas = os.getcwd()
 fn_ebas = orig_ebas+'\\DATA\\'+'EBAS-O3H-2013-2019.csv'
@@ -32,8 +36,7 @@ O3_dmc_2013 = Fecha_dmc_2013.O3_ppbv
 #Promedio horario de mediciones
 O3_dmc_2013_horario = O3_dmc_2013.resample("H").mean()
 #Se aplica un filtro preliminar
-O3_dmc_2013_horario[O3_dmc_2013_horario < 5] = np.nan
-O3_dmc_2013_horario[O3_dmc_2013_horario > 65] = np.nan
+O3_dmc_2013_horario = QC_2013.aplicar(O3_dmc_2013_horario)[0]
 #extracción de datos utiles EBAS
 Fecha_dmc_2013 = df_orig_ebas['2013']
 O3_ebas_2013 = Fecha_dmc_2013.O3_ppbv
@@ -70,8 +73,7 @@ ax4.set_xlabel('Date', fontsize=18)
 ax4.set_ylabel('Mixing Ratio $O_{3}$ [ppbv]', fontsize=18)
 ax4.legend()
 fig3.show()
-O3_dmc_2013[O3_dmc_2013 < 5] = np.nan
-O3_dmc_2013[O3_dmc_2013 > 65] = np.nan
+O3_dmc_2013 = QC_2013.aplicar(O3_dmc_2013)[0]
 fig4 = plt.figure(4)
 fig4.clf()
 ax5 = fig4.add_subplot(111)
@@ -25,6 +25,54 @@ import os as os                  # Directory management
 import numpy as np               # Numerics   
 import datetime
 from pathlib import Path
+import argparse
+from concurrent.futures import ProcessPoolExecutor  # Parallel reading of yearly files
+from __toolsStore import save_store  # Binary copy of the CSV files
+from __toolsStore import firma_fuente, leer_manifest_ingesta, guardar_manifest_ingesta
+from __toolsStore import unir_ventanas, reemplazar_ventana, leer_csv  # Incremental mode
+from __toolsNasaAmes import leer_nasa_ames  # EBAS files (NASA Ames 1001)
+from __toolsQC import PipelineQC, decodificar_flags  # Range of valid values, EBAS flags
+
+#Source files
+
+def archivo_ebas(inicio):
+    """
+    Parameters
+    ----------
+    inicio : string
+        Start date of file '20130101'
+
+    Returns
+    -------
+    Path of the EBAS file of that year. Files are named
+    station.startdate.revisiondate.(...).nas, if there is more than one
+    revision of a year the last one is used.
+    """
+    datadir = os.path.join(os.getcwd(), 'DATA', 'DB-EBAS')
+    return str(sorted(Path(datadir).glob('*.'+inicio+'000000.*.nas'))[-1])
+
+
+def archivo_dmc(inicio, tipo):
+    """
+    Parameters
+    ----------
+    inicio : string
+        Year of the file, e.g., '1995'
+    tipo : int
+        118 or 119, see leer_dmc. In 1997 there is one file of each type.
+
+    Returns
+    -------
+    Path of the DMC file.
+    """
+    datadir = os.path.join(os.getcwd(), 'DATA', 'DB-DMC')
+    if inicio=='1997':
+        if tipo==118:
+            return os.path.join(datadir, 'ET'+inicio+'_1'+'.csv')
+        elif tipo==119:
+            return os.path.join(datadir, 'ET'+inicio+'_2'+'.csv')
+    return os.path.join(datadir, 'ET'+inicio+'.csv')
+
 
 #Reading data downloaded from  http://ebas.nilu.no/
 #Hourly averages
@@ -42,7 +90,8 @@ def leer_ebas(inicio,fin):
           Reads ozone 1 hour average and standard deviation
     Returns
     -------
-    df : Dataframe containing O3 in ppbv and its standard deviation (hourly values)
+    df : Dataframe containing O3 in ppbv, its standard deviation (hourly values)
+         and the EBAS flags (uint16 bit field)
        Data downloaded from
         http://ebas.nilu.no/Pages/DataSetList.aspx?key=A4C1704036474C47AED6FA75E2A99882.
         The data format is described in (NASA Ames 1001).: 
@@ -62,39 +111,19 @@ def leer_ebas(inicio,fin):
     # O3.2 ozone, ug/m3, Statistics=stddev, 
     # O3.3 ozone, nmol/mol, Statistics=stddev, 
     #
+    # Columns, missing value codes and the reference date of the times are
+    # read from the header of the file (see __toolsNasaAmes.py)
     
-    orig = os.getcwd() #Says where the current file is
-    datadir=os.path.join(orig,'DATA', 'DB-EBAS')
-    
-    if inicio=='20190101':
-        name_data = 'CL0001R.'+inicio+'000000.20200630060000.uv_abs.ozone.air.1y.1h.CL01L_TEI49C_no72417371.CL01L_uv_abs.lev2.nas' # Define el nombre de los archivos a leer
-    else:
-        name_data = 'CL0001R.'+inicio+'000000.20201102112043.uv_abs.ozone.air.1y.1h.CL01L_TEI49C_no72417371.CL01L_uv_abs.lev2.nas'
+    name_data = archivo_ebas(inicio)
    
-    tiempo = pd.date_range(inicio,fin, freq= 'H')                                   
-    input_data = pd.read_csv(os.path.join(datadir,name_data),decimal=".", delimiter=r"\s+", header =76);  # lectura de datos
-  
+    input_data, cabecera = leer_nasa_ames(name_data)  # lectura de datos
     
-    input_data = input_data.rename(columns={input_data.keys()[2]: "O3_ug/m3", input_data.keys()[3]: "O3_ppbv",
-                               input_data.keys()[4]: "O3_ug/m3_std" , input_data.keys()[5]: "O3_ppbv_std", 
-                               input_data.keys()[6]: "flag"})                        # Redefine las columnas del dataframe
+    # Only the measurements that start before fin
+    input_data = input_data[input_data.index < pd.Timestamp(fin)]
     
-
-    # Replacing non values by NaN
-    
-               
-    input_data["O3_ppbv"].replace(999.99, np.nan, inplace=True)
-    input_data["O3_ppbv_std"].replace(99.99, np.nan, inplace=True)
-    input_data["O3_ppbv_std"].replace(999.99, np.nan, inplace=True)
-
-    # Generating indexed time series
-    
-          
-    O3_ppbv = pd.Series(input_data["O3_ppbv"].values, index=tiempo[0:-1])
-    O3_ppbv_2 = pd.Series(input_data["O3_ppbv_std"].values, index=tiempo[0:-1])
-
-    
-    df = pd.DataFrame({ "O3_ppbv" : O3_ppbv, "O3_ppbv_std" : O3_ppbv_2 })
+    df = input_data[["O3_ppbv", "O3_ppbv_std"]].copy()
+    # EBAS flags as a uint16 bit field, see __toolsQC.BITS_FLAG_EBAS
+    df["flag"] = decodificar_flags(input_data["flag"].values)
 
     #There are repeated dates in this data set
     
@@ -194,29 +223,19 @@ def leer_dmc(inicio,fin,tipo):
     # Data structure
     # Accordin to "tipo" 118 or 119
 
-    orig = os.getcwd() #Says where the file is
-    datadir=os.path.join(orig, 'DATA','DB-DMC')
-    #datadir=orig +'/Data/'
-
-    if inicio=='1997': 
-        if tipo==118:
-            name_data='ET'+inicio+'_1'+'.csv'
-        elif tipo==119:
-            name_data='ET'+inicio+'_2'+'.csv'
-    else:
-        name_data='ET'+inicio+'.csv'
+    name_data = archivo_dmc(inicio, tipo)
         
     
         
 #The file contains strange characters    
 
     if tipo==118:
-        input_data = pd.read_csv(os.path.join(datadir, name_data),decimal=",", delimiter=r";", header =0, na_values= ['?' , 'c '])  # lectura de datos
+        input_data = pd.read_csv(name_data,decimal=",", delimiter=r";", header =0, na_values= ['?' , 'c '])  # lectura de datos
     elif tipo==119:
-        input_data = pd.read_csv(os.path.join(datadir, name_data),decimal=",", delimiter=r";", header =0, na_values= '?')
+        input_data = pd.read_csv(name_data,decimal=",", delimiter=r";", header =0, na_values= '?')
         # In year 2013 the columns don't have labels
         if inicio=='2013':
-            input_data = pd.read_csv(os.path.join(orig,'DATA','DB-DMC','ET2013.csv'), decimal=",", delimiter=r";", na_values= '?',header = None)
+            input_data = pd.read_csv(name_data, decimal=",", delimiter=r";", na_values= '?',header = None)
             for i in range(31):
                 input_data = input_data.rename(columns={input_data.keys()[i]: str(i+1)})
     #Renaming column names
@@ -235,15 +254,15 @@ def leer_dmc(inicio,fin,tipo):
         h_aux = input_data['4']
         
         
-    # Make date string 
-    fecha_str = [inicio +'-'+ str(d) for d in j]
-    fecha = pd.to_datetime(fecha_str, format='%Y-%j')
+    # Make dates with integer arithmetic, no strings:
+    # start of year + (julian day - 1) days + HHMM converted to minutes
+    dias = np.asarray(j, dtype='int64') - 1
+    hhmm = np.asarray(h_aux, dtype='int64')
+    minutos = (hhmm // 100)*60 + hhmm % 100
     
-    dhora_str = [str(hi // 100).zfill(2) + ':' + str(hi % 100).zfill(2) 
-                 + ':00' for hi in h_aux]
-    dhora = pd.to_timedelta(dhora_str)
-    
-    tiempo = fecha + dhora
+    tiempo = (np.datetime64(inicio, 'Y') + dias.astype('timedelta64[D]')
+              + minutos.astype('timedelta64[m]'))
+    tiempo = pd.DatetimeIndex(tiempo.astype('datetime64[ns]'))
     
 
     # tiempo=pd.DatetimeIndex(vector_t)
@@ -262,62 +281,214 @@ def leer_dmc(inicio,fin,tipo):
     return df
 
 ############################READING AND SAVING##############
-#Reading DMC data 1995-2012
-dfold = pd.DataFrame()
 
-#From 1995 to 1996
-for i in range(1995,1997):
-    var=leer_dmc(str(i),str(i+1),118) 
-    dfold = pd.concat([dfold,var])
-    
-# 1997 tewo sections
-var=leer_dmc('1997','1998',118)
-dfold = pd.concat([dfold,var])
-
-var=leer_dmc('1997','1998',119)
-dfold = pd.concat([dfold,var])
-#1998 on
-for i in range(1998,2013):
-    var=leer_dmc(str(i),str(i+1),119)
-    dfold = pd.concat([dfold,var])
-
-#
-var = leer_dmc('2013','2013',119).astype(float)
-dfold = pd.concat([dfold,var])
-
-# Finding and removing dates (index) repeated
-data_old = len(dfold)
-dfold = dfold.iloc[~dfold.index.duplicated(keep='first')]
-data_new = len(dfold)
-clear_data = data_old - data_new
-#Removing negative values
-dfold[dfold < 0] = np.nan
-#Removing values over 1000
-dfold[dfold>1000] = np.nan
-data_new_no_negative = len(dfold)
-clear_data_no_negative = data_new - data_new_no_negative
-all_clear_data = clear_data_no_negative + clear_data
-#Se re-indexan datos cada 15 minutos
-dfdmc_O3_RH_15m = dfold.resample('15min').mean()
-
-#Reading EBAS data 2013-2020
-df_2013 = leer_ebas('20130101','20140101')
-df_2014 = leer_ebas('20140101','20150101')
-df_2015 = leer_ebas('20150101','20160101')
-df_2016 = leer_ebas('20160101','20170101')
-df_2017 = leer_ebas('20170101','20180101')
-df_2018 = leer_ebas('20180101','20190101')
-df_2019 = leer_ebas('20190101','20200101')
-# Concatena datos
-dfebas_O3H = pd.concat([ df_2013 ,  df_2014, df_2015 , df_2016 , df_2017, df_2018, df_2019])
-
-
-#Saving data frames
-    
-orig = os.getcwd() #Says where the file is 
-ruta=os.path.join(orig,'DATA')
-dfebas_O3H.to_csv(os.path.join(ruta,'EBAS-O3H-2013-2019.csv'))
-dfdmc_O3_RH_15m.to_csv(os.path.join(ruta,'DMC-O3_RH_15m_dmc-1995-2013.csv'))
+#Yearly files to be read, as arguments of leer_dmc and leer_ebas
+
+def tareas_dmc():
+    """
+    Returns
+    -------
+    list of tuples (inicio, fin, tipo), one per DMC file, in time order
+    """
+    #From 1995 to 1996
+    tareas = [(str(i), str(i+1), 118) for i in range(1995,1997)]
+    # 1997 two sections
+    tareas += [('1997','1998',118), ('1997','1998',119)]
+    #1998 on
+    tareas += [(str(i), str(i+1), 119) for i in range(1998,2013)]
+    tareas += [('2013','2013',119)]
+    return tareas
 
 
+def tareas_ebas():
+    """
+    Returns
+    -------
+    list of tuples (inicio, fin), one per EBAS yearly file in DATA/DB-EBAS,
+    in time order. A new year is read just by copying its file there.
+    """
+    datadir = os.path.join(os.getcwd(), 'DATA', 'DB-EBAS')
+    # station.startdate.revisiondate.(...).nas
+    inicios = sorted({f.name.split('.')[1][:8] for f in Path(datadir).glob('*.nas')})
+    return [(i, str(int(i[:4])+1)+i[4:]) for i in inicios]
 
+
+def ingesta(funcion, tareas, n_workers=None):
+    """
+    Read yearly files in parallel, one file per process.
+
+    Parameters
+    ----------
+    funcion : function
+        leer_dmc or leer_ebas.
+    tareas : list of tuples
+        Arguments of funcion for each file, see tareas_dmc and tareas_ebas.
+    n_workers : int, optional
+        Number of processes. With 1 the files are read one after the other
+        in this process. The default is None (number of CPUs).
+
+    Returns
+    -------
+    partes : list of DataFrames
+        One DataFrame per file, in the same order as tareas. Concatenate them
+        once, pd.concat(partes), instead of growing a DataFrame in a loop.
+    """
+    if n_workers == 1:
+        return [funcion(*t) for t in tareas]
+    # pool.map keeps the order of tareas, so the result is the same as the
+    # serial run
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return list(pool.map(funcion, *zip(*tareas)))
+
+
+def procesar_dmc(partes):
+    """
+    Parameters
+    ----------
+    partes : list of DataFrames
+        Result of leer_dmc for each file of tareas_dmc(), in order.
+
+    Returns
+    -------
+    dfdmc_O3_RH_15m : DataFrame
+        DMC data without repeated dates, negative values or values over
+        1000, every 15 minutes.
+    """
+    partes[-1] = partes[-1].astype(float)
+    dfold = pd.concat(partes)
+
+    # Finding and removing dates (index) repeated
+    data_old = len(dfold)
+    dfold = dfold.iloc[~dfold.index.duplicated(keep='first')]
+    data_new = len(dfold)
+    clear_data = data_old - data_new
+    #Removing negative values and values over 1000
+    qc = PipelineQC().rango(0, 1000)
+    clear_data_no_negative = 0
+    for columna in dfold.columns:
+        dfold[columna], mascara, rechazos = qc.aplicar(dfold[columna])
+        clear_data_no_negative += rechazos['rango']
+    all_clear_data = clear_data_no_negative + clear_data
+    #Se re-indexan datos cada 15 minutos
+    return dfold.resample('15min').mean()
+
+
+def guardar(df, fn):
+    """Save df as CSV and as binary store (read by the dashboards)."""
+    df.to_csv(fn)
+    #The store must be written after the CSV file
+    save_store(df, fn)
+
+
+def fuentes_cambiadas(fuentes, manifest):
+    """
+    Parameters
+    ----------
+    fuentes : dict
+        {path relative to DATA: serie ('DMC' or 'EBAS')}
+    manifest : dict or None
+        Manifest of the previous run, see leer_manifest_ingesta.
+
+    Returns
+    -------
+    firmas : dict
+        {path: signature} of every source file, to be saved in the manifest.
+    cambiadas : set
+        Paths of the files that are new or whose content changed.
+    """
+    anteriores = manifest['fuentes'] if manifest is not None else {}
+    firmas, cambiadas = {}, set()
+    for rel, serie in fuentes.items():
+        firma = firma_fuente(os.path.join('DATA', rel), anteriores.get(rel))
+        firma['serie'] = serie
+        firmas[rel] = firma
+        anterior = anteriores.get(rel)
+        if anterior is None or anterior['sha256'] != firma['sha256']:
+            cambiadas.add(rel)
+    return firmas, cambiadas
+
+
+# The files are read in child processes that import this file, so the script
+# only runs when it is executed directly
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Reads and saves Tololo ozone data')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes to read the files, 1 = serial (default: number of CPUs)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only read the source files that are new or changed since the last run')
+    #parse_known_args, so it can be run from Spyder/IPython
+    args = parser.parse_known_args()[0]
+
+    orig = os.getcwd() #Says where the file is 
+    ruta=os.path.join(orig,'DATA')
+    fn_ebas = os.path.join(ruta,'EBAS-O3H-2013-2019.csv')
+    fn_dmc = os.path.join(ruta,'DMC-O3_RH_15m_dmc-1995-2013.csv')
+
+    def relativa(fn):
+        return Path(os.path.relpath(fn, ruta)).as_posix()
+
+    t_dmc = tareas_dmc()
+    t_ebas = tareas_ebas()
+    fuentes = {relativa(archivo_dmc(t[0], t[2])): 'DMC' for t in t_dmc}
+    fuentes.update({relativa(archivo_ebas(t[0])): 'EBAS' for t in t_ebas})
+
+    manifest = leer_manifest_ingesta(ruta) if args.incremental else None
+    if manifest is not None and not (os.path.isfile(fn_ebas) and os.path.isfile(fn_dmc)):
+        manifest = None
+    firmas, cambiadas = fuentes_cambiadas(fuentes, manifest)
+    pendiente = manifest['pendiente'] if manifest is not None else {'DMC': None}
+
+    def rango(rel, parte):
+        # Time window of the data of one source file, before and after the change
+        firmas[rel]['ventana'] = [str(parte.index.min()), str(parte.index.max())]
+        anterior = manifest['fuentes'].get(rel) if manifest is not None else None
+        return unir_ventanas(anterior.get('ventana') if anterior else None, firmas[rel]['ventana'])
+
+    #Reading DMC data 1995-2013
+    # The DMC files are read together (repeated dates between files), so if
+    # one of them changed the whole DMC series is built again
+    if manifest is None or any(fuentes[rel] == 'DMC' for rel in cambiadas):
+        partes = ingesta(leer_dmc, t_dmc, args.workers)
+        for t, parte in zip(t_dmc, partes):
+            rel = relativa(archivo_dmc(t[0], t[2]))
+            cambio = rango(rel, parte)
+            # Window to be cleaned again by Cleansingandsaving.py
+            if manifest is None or rel in cambiadas:
+                pendiente['DMC'] = unir_ventanas(pendiente.get('DMC'), cambio)
+        dfdmc_O3_RH_15m = procesar_dmc(partes)
+        guardar(dfdmc_O3_RH_15m, fn_dmc)
+    else:
+        for rel in fuentes:
+            if fuentes[rel] == 'DMC':
+                firmas[rel]['ventana'] = manifest['fuentes'][rel].get('ventana')
+
+    #Reading EBAS data 2013-2020
+    if manifest is None:
+        # Concatena datos
+        partes = ingesta(leer_ebas, t_ebas, args.workers)
+        for t, parte in zip(t_ebas, partes):
+            rango(relativa(archivo_ebas(t[0])), parte)
+        dfebas_O3H = pd.concat(partes)
+        guardar(dfebas_O3H, fn_ebas)
+    else:
+        # Only the yearly files that are new or changed, their years are
+        # replaced in the saved series
+        with open(fn_ebas) as f:
+            if 'flag' not in f.readline().strip().split(','):
+                # Saved before the flags were kept, all the years are read
+                cambiadas |= {relativa(archivo_ebas(t[0])) for t in t_ebas}
+        t_nuevas = [t for t in t_ebas if relativa(archivo_ebas(t[0])) in cambiadas]
+        for t in t_ebas:
+            rel = relativa(archivo_ebas(t[0]))
+            if rel not in cambiadas:
+                firmas[rel]['ventana'] = manifest['fuentes'][rel].get('ventana')
+        if t_nuevas:
+            # From the CSV, the store has the values as float32
+            dfebas_O3H = leer_csv(fn_ebas)
+            for t, parte in zip(t_nuevas, ingesta(leer_ebas, t_nuevas, args.workers)):
+                rango(relativa(archivo_ebas(t[0])), parte)
+                dfebas_O3H = reemplazar_ventana(dfebas_O3H, parte, t[0], t[1])
+            guardar(dfebas_O3H, fn_ebas)
+
+    guardar_manifest_ingesta(ruta, {'fuentes': firmas, 'pendiente': pendiente})
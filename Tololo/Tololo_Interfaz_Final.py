@@ -31,14 +31,20 @@ from __TrendGraphs import *
 from __MonthHourGraphs import *
 from __BoxplotGraphs import *
 from __HistGraphs import *
+from __toolsStore import *
+from __toolsCache import cache_info
 
 
 orig = os.getcwd()
 fn_dmc = os.path.join(orig,'DATA','DMC-O3_RH_1H_dmc-1995-2013_clear.csv')
-DMC_data = pd.read_csv(fn_dmc, index_col=0, parse_dates=True)
+# Memory-mapped binary store, the CSV is read only if the store is missing or stale
+DMC_data = load_store(fn_dmc)
 fn_ebas = os.path.join(orig,'DATA','EBAS-O3H-2013-2019.csv')
-EBAS_data = pd.read_csv(fn_ebas, parse_dates=True, index_col=0)
-EBAS_data.rename(columns={'Unnamed: 0': 'Date'}, inplace=True)
+EBAS_data = load_store(fn_ebas)
+# DMC and EBAS merged once, sorted and without repeated dates (see merge_tololo)
+TOLOLO_data = merge_tololo(DMC_data, EBAS_data)
+# Daily, monthly and yearly aggregates, saved in DATA and rebuilt only if the data change
+PIRAMIDE = load_pyramid(TOLOLO_data, os.path.join(orig,'DATA'))
 
 image_filename_cr2 = 'logo_footer110.png'
 encoded_image_cr2 = base64.b64encode(open(image_filename_cr2, 'rb').read()).decode('ascii')
@@ -96,6 +102,11 @@ colors = {
 }
 app = dash.Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
 
+# Hit/miss counters of the figure and statistics caches, for monitoring
+@app.server.route('/cache_info')
+def cache_info_route():
+    return cache_info()
+
 app.layout = html.Div([
 ################################### Configuración Encabezado Página Web##############    
     html.Div([
@@ -444,8 +455,8 @@ def render_content(tab, Switch_Lang):
                                           en el calendario y a continuación presionar el botón de descargas:
                 '''), style={'margin-left':'60px'}),dcc.DatePickerRange(
                 id='calendario_descarga',
-                start_date=min(DMC_data.index),
-                end_date=max(EBAS_data.index)
+                start_date=TOLOLO_data.index[0],
+                end_date=TOLOLO_data.index[-1]
                 , style={'margin-left':'60px'}) ,dbc.Button("Descargar ", id="btn_descarga_2", n_clicks=0, style={'margin-left':'5px','display':'inline-block', 'backgroundColor':'#0668a1'}),Download(id="download_2")
                 ,dcc.Markdown(dedent(f''' CITATION – If you use this dataset please acknowledge the Chilean Weather Office, and cite Anet, G. J., Steinbacher, M., Gallardo, L., Velásquez Álvarez, A. P., Emmenegger, L., and Buchmann, B. (2017). Surface ozone in the Southern Hemisphere: 20 years of data from a site with a unique setting in El Tololo, Chile. Atmos. Chem. Phys. 17, 6477–6492. doi:10.5194/acp-17-6477-2017.'''
                     ), style = {'margin-top':'50px', 'margin-left':'60px'}) 
@@ -468,8 +479,8 @@ def render_content(tab, Switch_Lang):
                                           en el calendario y a continuación presionar el botón de descargas:
                 '''), style={'margin-left':'60px'}),dcc.DatePickerRange(
                 id='calendario_descarga',
-                start_date=min(DMC_data.index),
-                end_date=max(EBAS_data.index)
+                start_date=TOLOLO_data.index[0],
+                end_date=TOLOLO_data.index[-1]
                 , style={'margin-left':'60px'}) ,dbc.Button("Descargar ", id="btn_descarga_2", n_clicks=0, style={'margin-left':'5px','display':'inline-block', 'backgroundColor':'#0668a1'}),Download(id="download_2")
                 ,dcc.Markdown(dedent(f''' CITATION – If you use this dataset please acknowledge the Chilean Weather Office, and cite Anet, G. J., Steinbacher, M., Gallardo, L., Velásquez Álvarez, A. P., Emmenegger, L., and Buchmann, B. (2017). Surface ozone in the Southern Hemisphere: 20 years of data from a site with a unique setting in El Tololo, Chile. Atmos. Chem. Phys. 17, 6477–6492. doi:10.5194/acp-17-6477-2017.'''
                     ), style = {'margin-top':'50px', 'margin-left':'60px'}) 
@@ -540,7 +551,7 @@ def render_content(tab, Switch_Lang):
               )
 def update_graph(radio_trends,radio_trends_period):
     
-    fig = trend(DMC_data, EBAS_data, radio_trends,radio_trends_period, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)  
+    fig = trend(PIRAMIDE, radio_trends,radio_trends_period, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)  
 
     return fig
 ########################################Grafico de Tendencia###################
@@ -550,7 +561,7 @@ def update_graph(radio_trends,radio_trends_period):
               )
 def update_graph(radio_trends_esp, radio_trends_period_esp):
     
-    fig = tendencia(DMC_data, EBAS_data, radio_trends_esp,radio_trends_period_esp,encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)
+    fig = tendencia(PIRAMIDE, radio_trends_esp,radio_trends_period_esp,encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)
 
     return fig
 
@@ -657,7 +668,7 @@ def render_content(Switch_ENG):
       Input('calendar_1', 'end_date')])
 def update_graph(start_date, end_date):
  
-    fig = MonthHour(DMC_data, EBAS_data, start_date, end_date, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)
+    fig = MonthHour(TOLOLO_data, start_date, end_date, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)
     return fig
 #######################################Diagrama Mes Hora###################### 
 @app.callback(
@@ -666,7 +677,7 @@ def update_graph(start_date, end_date):
       Input('calendario_1', 'end_date')])
 def update_graph(start_date, end_date):
  
-    fig = MesHora(DMC_data, EBAS_data, start_date, end_date, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)
+    fig = MesHora(TOLOLO_data, start_date, end_date, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)
     return fig
 #######################################Boxplot#################################
 @app.callback(
@@ -675,7 +686,7 @@ def update_graph(start_date, end_date):
       Input('calendar_2', 'end_date'), 
       Input('radio_boxplot_eng', 'value')])
 def update_graph(start_date, end_date, radio_boxplot_eng):
-    fig = BoxENG(DMC_data, EBAS_data, start_date, end_date, radio_boxplot_eng, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)
+    fig = BoxENG(TOLOLO_data, start_date, end_date, radio_boxplot_eng, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)
     return fig  
 
 ###################################Diagrama cajas y bigotes ###################
@@ -685,7 +696,7 @@ def update_graph(start_date, end_date, radio_boxplot_eng):
       Input('calendario_2', 'end_date'), 
       Input('radio_boxplot_esp', 'value')])
 def update_graph(start_date, end_date, radio_boxplot_esp):
-    fig = BoxESP(DMC_data, EBAS_data, start_date, end_date, radio_boxplot_esp, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)
+    fig = BoxESP(TOLOLO_data, start_date, end_date, radio_boxplot_esp, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA)
     return fig  
 #####################################Histogram#################################
 @app.callback(
@@ -693,7 +704,7 @@ def update_graph(start_date, end_date, radio_boxplot_esp):
       [Input('calendar_3', 'start_date'),
       Input('calendar_3', 'end_date')])
 def update_graph(start_date, end_date):
-    fig = HistENG(DMC_data, EBAS_data, start_date, end_date)    
+    fig = HistENG(TOLOLO_data, start_date, end_date)    
     return fig  
 
 #####################################Histograma###############################
@@ -702,7 +713,7 @@ def update_graph(start_date, end_date):
       [Input('calendario_3', 'start_date'),
       Input('calendario_3', 'end_date')])
 def update_graph(start_date, end_date):
-    fig = HistESP(DMC_data, EBAS_data, start_date, end_date)    
+    fig = HistESP(TOLOLO_data, start_date, end_date)    
     return fig  
 ############### DEscarga de datos#############################################
 
@@ -712,10 +723,18 @@ def generate_csv(n_clicks, start_date, end_date):
     if n_clicks==0:
         return None
     else:
-        df_all = pd.concat([DMC_data,EBAS_data]).loc[start_date:end_date]
+        df_all = ventana(TOLOLO_data, start_date, end_date)
         return send_data_frame(df_all.to_csv, filename="Tololo_Time_Series_Dates_Selected.csv")    
 if __name__ == '__main__':
-    app.run_server(debug=True, port = 8050)
+    DEBUG = True
+    # Every trend method x period x date range, read from DATA or computed in the
+    # background by a pool of processes, the trend callbacks only look them up.
+    # With debug the reloader runs this file in a watcher process and again in
+    # the process that serves the app (WERKZEUG_RUN_MAIN), only the latter
+    # computes them
+    if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        TENDENCIAS.iniciar(PIRAMIDE, os.path.join(orig,'DATA'))
+    app.run_server(debug=DEBUG, port = 8050)
 
 
                                                               
\ No newline at end of file
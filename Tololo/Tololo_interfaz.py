@@ -21,20 +21,14 @@ from textwrap import dedent
 from datetime import datetime as dt
 from scipy.optimize import leastsq
 import dash_bootstrap_components as dbc
+from __toolsStore import load_store, merge_tololo, ventana
+from __toolsQC import completitud
 orig = os.getcwd()
 fn_dmc = orig+'\\DATA\\'+'DMC-O3_RH_1H_dmc-1995-2013_clear.csv'
-DMC_data = pd.read_csv(fn_dmc, index_col=0, parse_dates=True)
+DMC_data = load_store(fn_dmc)
 fn_ebas = orig+'\\DATA\\'+'EBAS-O3H-2013-2019.csv'
-EBAS_data = pd.read_csv(fn_ebas, parse_dates=True, index_col=0)
-EBAS_data.rename(columns={'Unnamed: 0': 'Date'}, inplace=True)
-def completitud(df, n, frec):
-    bad_mean = np.isnan(df.O3_ppbv).astype(int).resample(frec).sum()
-    m = np.isnan(df.O3_ppbv).astype(int).resample(frec).sum().max()
-    good_mean = bad_mean > m-n
-    count_bad = good_mean.sum()
-    df_hourly = df.resample(frec).mean()
-    df_hourly[good_mean] = np.nan
-    return [df_hourly, count_bad]
+EBAS_data = load_store(fn_ebas)
+TOLOLO_data = merge_tololo(DMC_data, EBAS_data)
 #-----------------------------------------------------------------------------
     
 image_filename_top = '[www.cr2.cl][151]header_full.png'
@@ -392,7 +386,7 @@ View in Tellus'''))]),
       Input('Language', 'children')])
 def update_graph(start_date, end_date, Language):
  
-    g =pd.concat([DMC_data,EBAS_data]).loc[start_date:end_date]
+    g = ventana(TOLOLO_data, start_date, end_date)
     a = g.groupby([g.index.month, g.index.hour]).mean()
     O3_mesh = [a.O3_ppbv.values[24*i:24*(i+1)] for i in range (0,13)]
     if Language == 'English':
@@ -457,7 +451,7 @@ def update_graph(start_date, end_date, Language):
               Input('Language', 'children'))
 def update_graph(btn1, btn2, btn3, Language):
     
-    df =  pd.concat([DMC_data,EBAS_data]).resample('D').mean()
+    df =  TOLOLO_data.resample('D').mean()
     #aux_a , aux_b = info_data('2015-01-01 01','2020-08-09 23',df,'D')
 
     df_m = df.resample('M').mean()["O3_ppbv"]
@@ -565,7 +559,7 @@ def update_graph(btn1, btn2, btn3, Language):
       Input('btn_Monthly', 'n_clicks'),
       Input('Language','children')])
 def update_graph(start_date, end_date, btn_Hourly, btn_Monthly, Language):
-    g =pd.concat([DMC_data,EBAS_data]).loc[start_date:end_date]
+    g = ventana(TOLOLO_data, start_date, end_date)
     changed_id = [p['prop_id'] for p in dash.callback_context.triggered][0]
     if 'btn_Hourly' in changed_id :           
         mat_h = g.set_index(g.index.hour, append=False).unstack()['O3_ppbv']    
@@ -618,7 +612,7 @@ def update_graph(start_date, end_date, btn_Hourly, btn_Monthly, Language):
       Input('calendar_3', 'end_date'),
       Input('Language','children')])
 def update_graph(start_date, end_date, Language):
-    g =pd.concat([DMC_data,EBAS_data]).loc[start_date:end_date]
+    g = ventana(TOLOLO_data, start_date, end_date)
     fig = px.histogram(g, x=g.O3_ppbv, histnorm='probability density')
     if Language == 'English':
         ylabel = 'Probability Density'
@@ -26,17 +26,29 @@ from datetime import timedelta
 from textwrap import dedent
 from datetime import datetime as dt
 from scipy.optimize import leastsq
+from __toolsStore import ventana
+from __toolsCache import memo_stats, memo_figura
 
-def BoxENG(DMC_data, EBAS_data, start_date, end_date, radio_boxplot_eng, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
-    g =pd.concat([DMC_data,EBAS_data]).loc[start_date:end_date]
+@memo_stats('matriz_box')
+def matriz_box(TOLOLO_data, start_date, end_date, periodo):
+    # Ozone grouped by hour of the day or by month, shared by both languages
+    g = ventana(TOLOLO_data, start_date, end_date)
+    if periodo == 'hora':
+        mat_h = g.set_index(g.index.hour, append=False).unstack()['O3_ppbv']
+    elif periodo == 'mes':
+        mat_h = g.set_index(g.index.month, append=False).unstack()['O3_ppbv']
+    return mat_h
+
+@memo_figura('BoxENG')
+def BoxENG(TOLOLO_data, start_date, end_date, radio_boxplot_eng, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
     if radio_boxplot_eng =='Hourly':           
-        mat_h = g.set_index(g.index.hour, append=False).unstack()['O3_ppbv']    
+        mat_h = matriz_box(TOLOLO_data, start_date, end_date, 'hora')
         fig = px.box(mat_h,x=mat_h.index, y=mat_h.values,points=False)
         aux1 = [i for i in range(0,24)]
         aux2 = None       
         xlabel = 'Hour'    
     elif radio_boxplot_eng=='Monthly':
-        mat_h = g.set_index(g.index.month, append=False).unstack()['O3_ppbv']
+        mat_h = matriz_box(TOLOLO_data, start_date, end_date, 'mes')
         fig = px.box(mat_h, x=mat_h.index, y=mat_h.values, points=False)
         aux1 = ["Jan", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dec"]
         xlabel = 'Mes' 
@@ -128,16 +140,16 @@ def BoxENG(DMC_data, EBAS_data, start_date, end_date, radio_boxplot_eng, encoded
 # button_layer_1_height = 1.08
     return fig
 
-def BoxESP(DMC_data, EBAS_data, start_date, end_date, radio_boxplot_esp, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
-    g =pd.concat([DMC_data,EBAS_data]).loc[start_date:end_date]
+@memo_figura('BoxESP')
+def BoxESP(TOLOLO_data, start_date, end_date, radio_boxplot_esp, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
     if radio_boxplot_esp =='Horario':           
-        mat_h = g.set_index(g.index.hour, append=False).unstack()['O3_ppbv']    
+        mat_h = matriz_box(TOLOLO_data, start_date, end_date, 'hora')
         fig = px.box(mat_h,x=mat_h.index, y=mat_h.values,points=False)
         aux1 = [i for i in range(0,24)]
         aux2 = None       
         xlabel = 'Hora'    
     elif radio_boxplot_esp=='Mensual':
-        mat_h = g.set_index(g.index.month, append=False).unstack()['O3_ppbv']
+        mat_h = matriz_box(TOLOLO_data, start_date, end_date, 'mes')
         fig = px.box(mat_h, x=mat_h.index, y=mat_h.values, points=False)
         aux1 = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
         xlabel = 'Mes' 
@@ -26,9 +26,12 @@ from datetime import timedelta
 from textwrap import dedent
 from datetime import datetime as dt
 from scipy.optimize import leastsq
+from __toolsStore import ventana
+from __toolsCache import memo_figura
 
-def HistENG(DMC_data, EBAS_data, start_date, end_date):
-    g =pd.concat([DMC_data,EBAS_data]).loc[start_date:end_date]
+@memo_figura('HistENG')
+def HistENG(TOLOLO_data, start_date, end_date):
+    g = ventana(TOLOLO_data, start_date, end_date)
     fig = px.histogram(g, x=g.O3_ppbv, histnorm='probability density')
     ylabel = 'Probabity'
     fig.update_layout(
@@ -53,8 +56,9 @@ def HistENG(DMC_data, EBAS_data, start_date, end_date):
     )
     return fig 
 
-def HistESP(DMC_data, EBAS_data, start_date, end_date):
-    g =pd.concat([DMC_data,EBAS_data]).loc[start_date:end_date]
+@memo_figura('HistESP')
+def HistESP(TOLOLO_data, start_date, end_date):
+    g = ventana(TOLOLO_data, start_date, end_date)
     fig = px.histogram(g, x=g.O3_ppbv, histnorm='probability density')
     ylabel = 'Probabilidad'
     fig.update_layout(
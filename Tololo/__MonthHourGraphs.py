@@ -26,12 +26,21 @@ from datetime import timedelta
 from textwrap import dedent
 from datetime import datetime as dt
 from scipy.optimize import leastsq
+from __toolsStore import ventana
+from __toolsCache import memo_stats, memo_figura
 
 
-def MesHora(DMC_data, EBAS_data, start_date, end_date, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
-    g =pd.concat([DMC_data,EBAS_data]).loc[start_date:end_date]
+@memo_stats('mes_hora')
+def mes_hora(TOLOLO_data, start_date, end_date):
+    # Mean ozone per month (rows) and hour (columns), shared by both languages
+    g = ventana(TOLOLO_data, start_date, end_date)
     a = g.groupby([g.index.month, g.index.hour]).mean()
     O3_mesh = [a.O3_ppbv.values[24*i:24*(i+1)] for i in range (0,13)]
+    return O3_mesh
+
+@memo_figura('MesHora')
+def MesHora(TOLOLO_data, start_date, end_date, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
+    O3_mesh = mes_hora(TOLOLO_data, start_date, end_date)
 
     Months = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
     xlabel = 'Hora'
@@ -121,11 +130,10 @@ def MesHora(DMC_data, EBAS_data, start_date, end_date, encoded_image_cr2_celeste
 
     return fig
 
-def MonthHour(DMC_data, EBAS_data, start_date, end_date, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
+@memo_figura('MonthHour')
+def MonthHour(TOLOLO_data, start_date, end_date, encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
     
-    g =pd.concat([DMC_data,EBAS_data]).loc[start_date:end_date]
-    a = g.groupby([g.index.month, g.index.hour]).mean()
-    O3_mesh = [a.O3_ppbv.values[24*i:24*(i+1)] for i in range (0,13)]
+    O3_mesh = mes_hora(TOLOLO_data, start_date, end_date)
 
     Months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
     xlabel = 'Hour'
@@ -27,34 +27,40 @@ from textwrap import dedent
 from datetime import datetime as dt
 from scipy.optimize import leastsq
 from __toolsTrend import *
+from __toolsTrendStore import TENDENCIAS, medias_tendencia
+from __toolsStore import ventana
+from __toolsCache import memo_stats, memo_figura
 
-def tendencia(DMC_data, EBAS_data, radio_trends, 
-              radio_trends_period_esp,encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
+# The Tololo graphs have always shown the Lamsal slope multiplied by 1.03
+# (lamsal_trend). The trend registry gives the fitted slope, the factor is
+# applied here only
+CORRECCION_LAMSAL = 1.03
+
+@memo_stats('ajuste_tendencia')
+def ajuste_tendencia(piramide, radio_trends, nivel, desde):
+    # Trend fit, shared by the English and Spanish graphs.
+    # nivel is the level of the pyramid, 'D' or 'M'. The fits are precomputed
+    # at startup (TENDENCIAS, __toolsTrendStore), here they are looked up
+    df_m = medias_tendencia(piramide, nivel, desde)
+    resultado = TENDENCIAS.obtener(piramide, radio_trends, nivel, desde)
+    pendiente = resultado.pendiente
+    if radio_trends == 'Lamsal':
+        pendiente = pendiente*CORRECCION_LAMSAL
+    model_trend = (resultado.ajuste, pendiente)
+    error = resultado.error
     
-    df_d =  pd.concat([DMC_data,EBAS_data]).loc['1997':'2020']
+    return df_m, model_trend, error
+
+@memo_figura('tendencia')
+def tendencia(piramide, radio_trends, 
+              radio_trends_period_esp,encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
     
+    # Daily and monthly means are read from the aggregate pyramid (load_pyramid)
     #aux_a , aux_b = info_data('2015-01-01 01','2020-08-09 23',df,'D')
     if radio_trends_period_esp == 'Diario':
-        df_m = df_d.resample('D').mean().loc['1997':'2020']
+        df_m, model_trend, error = ajuste_tendencia(piramide, radio_trends, 'D', '1997')
     elif radio_trends_period_esp == 'Mensual':
-        df_m = df_d.resample('M').mean().loc['1997':'2020']    
-    df_m.O3_ppbv[df_m.O3_ppbv<20] = np.nan
-    df_m = df_m.fillna(df_m.mean()) 
-    s    = df_m.O3_ppbv.values 
-    s_df = df_m.O3_ppbv
-    ###################
-
-    if radio_trends == 'Lamsal':        
-        model_trend =  lamsal_trend(s)
-    elif radio_trends == 'Linear':
-        model_trend = linear_trend(s)
-    elif radio_trends == 'EMD':
-        model_trend = emd_trend(s)    
-    elif radio_trends == 'STL':
-        model_trend = stl_trend(s_df)    
-    elif radio_trends == 'ThielSen':
-        model_trend = TheillSen_trend(s) 
-        
+        df_m, model_trend, error = ajuste_tendencia(piramide, radio_trends, 'M', '1997')
 
 
 
@@ -86,7 +92,7 @@ def tendencia(DMC_data, EBAS_data, radio_trends,
                     y= [57 , 57] , #df_m[0:1]*2.0
                     mode='text', 
                     marker=dict(size= 6, color='black'),
-                    text=["Tendencia Decadal= " + str(round(model_trend[1]*10*12,1)) + ' +/- ' + str(round(tiao(model_trend[0], s)*10,2)) +'[ppbv]  <br>Promedio= '+ str(round(df_m["O3_ppbv"].mean(),1)) + " [ppbv]"],
+                    text=["Tendencia Decadal= " + str(round(model_trend[1]*10,1)) + ' +/- ' + str(round(error*10,2)) +'[ppbv]  <br>Promedio= '+ str(round(df_m["O3_ppbv"].mean(),1)) + " [ppbv]"],
                     textposition="top right",
                     textfont=dict(
                     family="Times New Roman",
@@ -136,32 +142,17 @@ images= [       dict(
                     layer="above")])
     return fig
 
-def trend(DMC_data, EBAS_data, radio_trends, radio_trends_period,
+@memo_figura('trend')
+def trend(piramide, radio_trends, radio_trends_period,
           encoded_image_cr2_celeste, encoded_image_DMC, encoded_image_GWA):
-    df_d =  pd.concat([DMC_data,EBAS_data]).loc['2012':'2020']
     
+    # Daily and monthly means are read from the aggregate pyramid (load_pyramid)
     #aux_a , aux_b = info_data('2015-01-01 01','2020-08-09 23',df,'D')
 
     if radio_trends_period == 'Daily':
-        df_m = df_d.resample('D').mean().loc['1997':'2020']
+        df_m, model_trend, error = ajuste_tendencia(piramide, radio_trends, 'D', '2012')
     elif radio_trends_period == 'Monthly':
-        df_m = df_d.resample('M').mean().loc['1997':'2020']
-    df_m.O3_ppbv[df_m.O3_ppbv<20] = np.nan
-    df_m = df_m.fillna(df_m.mean()) 
-    s    = df_m.O3_ppbv.values 
-    s_df = df_m.O3_ppbv
-    ###################
-
-    if radio_trends == 'Lamsal':        
-        model_trend =  lamsal_trend(s)
-    elif radio_trends == 'Linear':
-        model_trend = linear_trend(s)
-    elif radio_trends == 'EMD':
-        model_trend = emd_trend(s)    
-    elif radio_trends == 'STL':
-        model_trend = stl_trend(s_df)    
-    elif radio_trends == 'ThielSen':
-        model_trend = TheillSen_trend(s) 
+        df_m, model_trend, error = ajuste_tendencia(piramide, radio_trends, 'M', '2012')
 
     fig = go.Figure()       
     fig.add_trace(go.Scatter(
@@ -191,7 +182,7 @@ def trend(DMC_data, EBAS_data, radio_trends, radio_trends_period,
                     y= [57 , 57],
                     mode='text', 
                     marker=dict(size= 6, color='black'),
-                    text=["Decadal Trend = " + str(round(model_trend[1]*10*12,1)) + ' +/- xx [ppbv]  <br>Mean= '+ str(round(df_m["O3_ppbv"].mean(),1)) + " [ppbv]"],
+                    text=["Decadal Trend = " + str(round(model_trend[1]*10,1)) + ' +/- ' + str(round(error*10,2)) +' [ppbv]  <br>Mean= '+ str(round(df_m["O3_ppbv"].mean(),1)) + " [ppbv]"],
                     textposition="top right",
                     textfont=dict(
                     family="Times New Roman",
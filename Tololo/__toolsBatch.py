@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:48:05 2026
+
+Trends of many series at once.
+
+The series are the columns of a 2-D array Y (time x series), e.g. the monthly
+means of each hour of the day at Tololo (tabla_lote). All columns share the
+time axis, so the Linear and Lamsal fits use the same design matrix
+(__toolsHarmonic.matriz_diseno) and are solved for every column in one
+product of matrices. Theil-Sen is the median of the slopes between all pairs
+of samples, computed for a block of columns at a time, or with the
+O(n log n) selection of __toolsSen for long series.
+
+NaN are allowed: columns without NaN are solved with the cached QR
+factorization, columns with NaN by weighted normal equations, all of them in
+one batched np.linalg.solve.
+"""
+
+import functools
+import warnings
+import numpy as np
+import pandas as pd
+from __toolsHarmonic import matriz_diseno, diseno
+from __toolsSen import sen
+
+# Maximum number of elements of the temporary arrays (pairs x columns)
+BLOQUE = 2**23
+
+
+def _lineal(Y, periodo, armonicos, t):
+    n, m = Y.shape
+    if t is None:
+        X, Q, R, var_coef = matriz_diseno(n, periodo, armonicos)
+    else:
+        X, Q, R, var_coef = diseno(t, periodo, armonicos)
+    p = X.shape[1]
+    valido = ~np.isnan(Y)
+    completa = valido.all(axis=0)
+    coef = np.full((p, m), np.nan)
+    stderr = np.full((p, m), np.nan)
+
+    if completa.any():
+        Yc = Y[:, completa]
+        c = np.linalg.solve(R, Q.T @ Yc)
+        gl = max(n - p, 1)
+        sigma2 = ((Yc - X @ c)**2).sum(axis=0)/gl
+        coef[:, completa] = c
+        stderr[:, completa] = np.sqrt(np.multiply.outer(var_coef, sigma2))
+
+    # Columns with gaps and enough samples: X'WX c = X'Wy, W = 1 where valid.
+    # The columns of X are scaled to unit norm to keep X'WX well conditioned
+    nv = valido.sum(axis=0)
+    huecos = ~completa & (nv > p)
+    if huecos.any():
+        escala = np.sqrt((X**2).sum(axis=0))
+        Xs = X/escala
+        W = valido[:, huecos].astype(np.float64)
+        Yh = np.where(valido[:, huecos], Y[:, huecos], 0.)
+        A = np.einsum('ni,nm,nj->mij', Xs, W, Xs)
+        b = np.einsum('ni,nm->mi', Xs, Yh)
+        c = np.linalg.solve(A, b[..., None])[..., 0]
+        resid = (Yh - Xs @ c.T)*W
+        sigma2 = (resid**2).sum(axis=0)/(nv[huecos] - p)
+        var = np.diagonal(np.linalg.inv(A), axis1=1, axis2=2)
+        coef[:, huecos] = (c/escala).T
+        stderr[:, huecos] = (np.sqrt(var*sigma2[:, None])/escala).T
+
+    return coef, stderr, X @ coef
+
+
+@functools.lru_cache(maxsize=8)
+def _pares(n):
+    # Indices (i, j), i < j, of all the pairs of samples
+    return np.triu_indices(n, k=1)
+
+
+def _theilsen(Y, max_pares, t):
+    n, m = Y.shape
+    t = np.arange(n, dtype=np.float64) if t is None else np.asarray(t, dtype=np.float64)
+    if n*(n - 1)//2 > max_pares:
+        # long series: exact O(n log n) selection, one column at a time
+        pendiente, intercepto = np.array([sen(Y[:, k], t) for k in range(m)]).T
+        return intercepto, pendiente, intercepto + pendiente*t[:, None]
+    i, j = _pares(n)
+    dt = (t[j] - t[i])[:, None]
+    t = t[:, None]
+    pendiente = np.full(m, np.nan)
+    por_bloque = max(1, BLOQUE//len(i)) if len(i) else m
+    with warnings.catch_warnings():
+        # columns without two valid samples give NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for a in range(0, m, por_bloque):
+            b = min(a + por_bloque, m)
+            bloque = Y[:, a:b]
+            if np.isnan(bloque).all():
+                continue
+            pendiente[a:b] = np.nanmedian((bloque[j] - bloque[i])/dt, axis=0)
+        intercepto = np.nanmedian(Y - pendiente*t, axis=0)
+    return intercepto, pendiente, intercepto + pendiente*t
+
+
+def tendencias_lote(Y, metodo='Linear', periodo=12, armonicos=9, max_pares=200000, t=None):
+    """
+    Trend of every column of Y.
+
+    Parameters
+    ----------
+    Y : array or DataFrame (n, m)
+        Series, one per column. NaN are ignored.
+    metodo : str, optional
+        'Linear', 'Lamsal' (line plus harmonics) or 'ThielSen', vectorized.
+        Any other method of the registry of __toolsTrend (e.g. 'STL', 'EMD')
+        is fitted column by column. The default is 'Linear'.
+    periodo : float, optional
+        Period of the seasonal cycle in units of t, for 'Lamsal' and the
+        seasonal methods of the registry. The default is 12.
+    armonicos : int, optional
+        Number of harmonics, for 'Lamsal' (and registry methods that take
+        it). The default is 9.
+    max_pares : int, optional
+        For 'ThielSen', maximum number of pairs of samples for which all
+        the slopes are built. Longer series use __toolsSen.sen column by
+        column. The default is 200000.
+    t : array (n,), optional
+        Time of each row, e.g. fractional years (anio_fraccional) with
+        periodo=1. The default is 0..n-1.
+
+    Returns
+    -------
+    dict
+        pendiente : (m,) trend per unit of t
+        error     : (m,) standard error of the trend, assuming independent
+                    residuals (NaN for 'ThielSen')
+        intercepto: (m,) value at t = 0
+        ajuste    : (n, m) fitted values
+        n         : (m,) number of valid samples
+    A DataFrame Y gives Series indexed by its columns and a DataFrame ajuste.
+    """
+    columnas = indice = None
+    if isinstance(Y, pd.DataFrame):
+        columnas, indice = Y.columns, Y.index
+    Y = np.asarray(Y, dtype=np.float64)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+
+    if metodo in ('Linear', 'Lamsal'):
+        coef, stderr, ajuste = _lineal(Y, periodo, armonicos if metodo == 'Lamsal' else 0, t)
+        intercepto, pendiente, error = coef[0], coef[1], stderr[1]
+    elif metodo == 'ThielSen':
+        intercepto, pendiente, ajuste = _theilsen(Y, max_pares, t)
+        error = np.full(Y.shape[1], np.nan)
+    else:
+        # other methods of the registry of __toolsTrend, one column at a time
+        from __toolsTrend import ajustar_tendencia
+        if indice is not None and isinstance(indice, pd.DatetimeIndex):
+            columnas_s = [pd.Series(Y[:, k], index=indice) for k in range(Y.shape[1])]
+        else:
+            columnas_s = [Y[:, k] for k in range(Y.shape[1])]
+        # periodo and armonicos go to the methods that take them, in units
+        # of t (0..n-1 if not given)
+        tt = np.arange(Y.shape[0], dtype=np.float64) if t is None else t
+        ajustes = [ajustar_tendencia(metodo, c, tt, periodo=periodo, armonicos=armonicos)
+                   for c in columnas_s]
+        ajuste = np.column_stack([r.ajuste for r in ajustes])
+        pendiente = np.array([r.pendiente for r in ajustes])
+        error = np.array([r.error for r in ajustes])
+        intercepto = np.full(Y.shape[1], np.nan)
+
+    resultado = {'pendiente': pendiente, 'error': error, 'intercepto': intercepto,
+                 'ajuste': ajuste, 'n': (~np.isnan(Y)).sum(axis=0)}
+    if columnas is not None:
+        for k in ('pendiente', 'error', 'intercepto', 'n'):
+            resultado[k] = pd.Series(resultado[k], index=columnas)
+        resultado['ajuste'] = pd.DataFrame(ajuste, index=indice, columns=columnas)
+    return resultado
+
+
+def tabla_lote(df, columna, por, frec='M'):
+    """
+    Table time x series for tendencias_lote: means of columna at frequency
+    frec, one column per value of por.
+
+    Parameters
+    ----------
+    df : DataFrame with a DatetimeIndex
+    columna : str
+        Variable, e.g. 'O3_ppbv'.
+    por : str or array
+        Name of the column of df with the group of each row, or array with
+        the groups (e.g. df.index.hour at Tololo).
+    frec : str, optional
+        Frequency of the means. The default is 'M'.
+
+    Returns
+    -------
+    DataFrame
+        Regular time index at frec (missing months are NaN rows), one column
+        per group.
+    """
+    grupos = df[por].values if isinstance(por, str) else np.asarray(por)
+    tabla = (df[columna].groupby([pd.Grouper(freq=frec), grupos]).mean()
+             .unstack())
+    return tabla.asfreq(frec)
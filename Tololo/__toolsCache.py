@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:40:12 2026
+
+Server side cache for the Tololo dashboard.
+
+Two LRU caches with bounded memory:
+    - CACHE_STATS  : statistics computed from the data (windows, month-hour
+                     means, boxplot matrices, trend fits). Their keys do not
+                     include the language, so the English and Spanish graphs
+                     share them.
+    - CACHE_FIGURAS: figures serialized as JSON, keyed by graph, dates,
+                     options and language.
+
+The least recently used entries are removed when a cache is over its limit.
+cache_info() returns the hit/miss counters of both caches.
+"""
+
+import numpy as np
+import pandas as pd
+import functools
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Dictionary with a maximum size in bytes and in number of entries, that
+    removes the least recently used entries first.
+    """
+
+    def __init__(self, max_bytes, max_items):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.datos = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, clave):
+        with self.lock:
+            if clave in self.datos:
+                self.datos.move_to_end(clave)
+                self.hits += 1
+                return True, self.datos[clave][0]
+            self.misses += 1
+            return False, None
+
+    def put(self, clave, valor):
+        tamano = tamano_objeto(valor)
+        with self.lock:
+            if tamano > self.max_bytes:
+                return
+            if clave in self.datos:
+                self.bytes -= self.datos.pop(clave)[1]
+            self.datos[clave] = (valor, tamano)
+            self.bytes += tamano
+            while self.bytes > self.max_bytes or len(self.datos) > self.max_items:
+                self.bytes -= self.datos.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self.lock:
+            self.datos.clear()
+            self.bytes = 0
+
+    def info(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_ratio': self.hits/total if total else None,
+                    'items': len(self.datos), 'bytes': self.bytes,
+                    'max_bytes': self.max_bytes}
+
+
+CACHE_STATS = CacheLRU(max_bytes=256*2**20, max_items=512)
+CACHE_FIGURAS = CacheLRU(max_bytes=128*2**20, max_items=512)
+
+
+def tamano_objeto(obj):
+    """Approximate memory used by obj, in bytes."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=False).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=False))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (tuple, list)):
+        return sys.getsizeof(obj) + sum(tamano_objeto(o) for o in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(tamano_objeto(o) for o in obj.values())
+    return sys.getsizeof(obj)
+
+
+def _clave(arg):
+    # The data (DataFrames, pyramid dict) are the same objects during the
+    # whole life of the server, they are identified by id
+    try:
+        hash(arg)
+        return arg
+    except TypeError:
+        return ('id', id(arg))
+
+
+def memo_stats(nombre):
+    """
+    Decorator, caches the value returned by a function that computes
+    statistics. The value must not be modified by the caller.
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltura(*args):
+            clave = (nombre,) + tuple(_clave(a) for a in args)
+            hay, valor = CACHE_STATS.get(clave)
+            if not hay:
+                valor = func(*args)
+                CACHE_STATS.put(clave, valor)
+            return valor
+        return envoltura
+    return decorador
+
+
+def memo_figura(nombre):
+    """
+    Decorator for the functions that build the figures of the dashboard. The
+    figure is cached as JSON and returned as a dict, that Dash accepts as the
+    'figure' property of a dcc.Graph.
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltura(*args):
+            clave = (nombre,) + tuple(_clave(a) for a in args)
+            hay, fig_json = CACHE_FIGURAS.get(clave)
+            if not hay:
+                fig_json = func(*args).to_json()
+                CACHE_FIGURAS.put(clave, fig_json)
+            return json.loads(fig_json)
+        return envoltura
+    return decorador
+
+
+def cache_info():
+    """Hit/miss counters and size of the caches."""
+    return {'stats': CACHE_STATS.info(), 'figuras': CACHE_FIGURAS.info()}
+
+
+def cache_clear():
+    """Empty both caches, e.g. after the data were reloaded."""
+    CACHE_STATS.clear()
+    CACHE_FIGURAS.clear()
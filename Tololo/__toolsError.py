@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:21:44 2026
+
+Uncertainty of the trends, used by the Tololo and Rapa Nui dashboards.
+
+The standard error of a linear trend fitted to a series with autocorrelated
+noise is (Tiao et al. 1990, https://doi.org/10.1029/JD095iD12p20507;
+Weatherhead et al. 1998, https://doi.org/10.1029/98JD00995)
+
+    sigma_w = sigma_N / sqrt(sum (t - mean(t))^2) * sqrt((1 + phi)/(1 - phi))
+
+where sigma_N is the standard deviation of the residuals of the fit (data
+minus model) and phi their lag-1 autocorrelation. With n regular samples the
+sum is n(n^2 - 1)/12, i.e. sigma_N/n^(3/2)*sqrt(12) as in Weatherhead et al.
+for monthly data. The error is in the units of t, the same units as the
+trend.
+
+Only the lag-1 autocorrelation is needed, it is computed in O(n). The full
+autocorrelation function, when needed, is computed with the FFT in
+O(n log n).
+"""
+
+import numpy as np
+
+
+def autocorr_lag1(x):
+    """
+    Lag-1 autocorrelation of x, NaN are ignored (pairs with a NaN are left
+    out).
+
+    Parameters
+    ----------
+    x : array (n,)
+
+    Returns
+    -------
+    float
+        NaN if there are fewer than 3 valid samples.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    valido = ~np.isnan(x)
+    if valido.sum() < 3:
+        return np.nan
+    d = x - x[valido].mean()
+    d[~valido] = 0.
+    varianza = (d**2).sum()
+    if varianza == 0:
+        return 0.
+    return (d[:-1]*d[1:]).sum()/varianza
+
+
+def acf(x, nlags=None):
+    """
+    Autocorrelation function of x, computed with the FFT. Lag k is normalized
+    by the number of pairs of valid samples at that lag, NaN are ignored.
+
+    Parameters
+    ----------
+    x : array (n,)
+    nlags : int, optional
+        Last lag returned. The default is n-1.
+
+    Returns
+    -------
+    ndarray (nlags+1,)
+        acf[0] = 1.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    nlags = n - 1 if nlags is None else min(nlags, n - 1)
+    valido = ~np.isnan(x)
+    d = np.where(valido, x - np.nanmean(x), 0.)
+    w = valido.astype(np.float64)
+    # zero padding to 2n avoids the circular wrap around
+    nfft = 1 << int(np.ceil(np.log2(2*n)))
+
+    def correlacion(a):
+        fa = np.fft.rfft(a, nfft)
+        return np.fft.irfft(fa*np.conj(fa), nfft)[:nlags+1]
+
+    suma = correlacion(d)
+    pares = np.round(correlacion(w))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        c = np.where(pares > 0, suma/pares, np.nan)
+    return c/c[0]
+
+
+def error_tendencia(residuo, t=None):
+    """
+    Standard error of a linear trend (Tiao et al. 1990, Weatherhead et al.
+    1998), from the residuals of the fit.
+
+    Parameters
+    ----------
+    residuo : array (n,)
+        Data minus model, NaN are ignored.
+    t : array (n,), optional
+        Time of each sample, in the units of the trend. The default is
+        0..n-1 (trend per sample).
+
+    Returns
+    -------
+    float
+    """
+    residuo = np.asarray(residuo, dtype=np.float64)
+    t = np.arange(len(residuo), dtype=np.float64) if t is None else np.asarray(t, dtype=np.float64)
+    valido = ~np.isnan(residuo)
+    if valido.sum() < 3:
+        return np.nan
+    sigma = residuo[valido].std()
+    dispersion = ((t[valido] - t[valido].mean())**2).sum()
+    phi = autocorr_lag1(residuo)
+    return sigma/np.sqrt(dispersion)*np.sqrt((1 + phi)/(1 - phi))
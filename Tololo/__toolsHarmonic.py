@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:12:30 2026
+
+Harmonic regression used by the Lamsal trend (Tololo and Rapa Nui dashboards).
+
+The model is
+    y(t) = c0 + c1*t + sum_k [ a_k*sin(2*pi*k*t/periodo) + b_k*cos(2*pi*k*t/periodo) ]
+with k = 1..armonicos. It is linear in the coefficients, so it is solved
+directly by least squares (QR factorization of the design matrix) instead of
+iterating with scipy.optimize.leastsq. The design matrix and its factorization
+only depend on the length of the series, they are built once per
+(n, periodo, armonicos) and cached. With real times t (fractional years,
+anio_fraccional) and gaps, only the valid samples enter the fit.
+
+Harmonics that cannot be resolved with the sampling of the series (k >=
+periodo/2, e.g. k = 6..9 with monthly data and periodo = 12) are aliases of
+lower harmonics, their columns are not included.
+"""
+
+import functools
+import numpy as np
+import pandas as pd
+
+
+def anio_fraccional(fechas):
+    """
+    Fractional year of each date, e.g. 2000-07-02 12:00 -> 2000.5. Used as
+    the time axis of the trends, so gaps in the series keep their length and
+    the trends are per year.
+
+    Parameters
+    ----------
+    fechas : DatetimeIndex or array of datetime64
+
+    Returns
+    -------
+    ndarray of float64
+    """
+    fechas = pd.DatetimeIndex(fechas)
+    inicio = pd.to_datetime(fechas.year.astype(str), format='%Y')
+    fin = pd.to_datetime((fechas.year + 1).astype(str), format='%Y')
+    return (fechas.year + (fechas - inicio)/(fin - inicio)).values.astype(np.float64)
+
+
+def columnas_armonicas(periodo, armonicos, paso=1.):
+    """
+    Harmonics of the model that can be resolved with one sample every paso
+    units of t.
+
+    Returns
+    -------
+    list of (k, 'sin' | 'cos')
+    """
+    columnas = []
+    for k in range(1, armonicos+1):
+        # fraction of the Nyquist frequency, the tolerance allows months of
+        # different length when t is in fractional years
+        r = 2*k*paso/periodo
+        if r < 0.95:
+            columnas += [(k, 'sin'), (k, 'cos')]
+        elif r <= 1.05:
+            # Nyquist frequency, sin(pi*t) is 0 for integer t
+            columnas.append((k, 'cos'))
+    return columnas
+
+
+def _columnas(t, periodo, armonicos, paso):
+    columnas = [np.ones(len(t)), t]
+    for k, f in columnas_armonicas(periodo, armonicos, paso):
+        w = 2*np.pi*k*t/periodo
+        columnas.append(np.sin(w) if f == 'sin' else np.cos(w))
+    return np.column_stack(columnas)
+
+
+def _qr(X):
+    Q, R = np.linalg.qr(X)
+    R_inv = np.linalg.inv(R)
+    var_coef = (R_inv**2).sum(axis=1)
+    return Q, R, var_coef
+
+
+def _paso(t):
+    return float(np.median(np.diff(t))) if len(t) > 1 else 1.
+
+
+def diseno(t, periodo=12, armonicos=9):
+    """
+    Design matrix of the model and its QR factorization, for the times t.
+
+    Parameters
+    ----------
+    t : array (n,)
+        Time of each sample, e.g. fractional years (see anio_fraccional).
+    periodo : float, optional
+        Period of the seasonal cycle in units of t. The default is 12.
+    armonicos : int, optional
+        Number of harmonics. The default is 9.
+
+    Returns
+    -------
+    X, Q, R, var_coef
+        See matriz_diseno.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    X = _columnas(t, periodo, armonicos, _paso(t))
+    return (X,) + _qr(X)
+
+
+@functools.lru_cache(maxsize=32)
+def matriz_diseno(n, periodo=12, armonicos=9):
+    """
+    Design matrix of the model and its QR factorization, for t = 0..n-1.
+
+    Parameters
+    ----------
+    n : int
+        Length of the series.
+    periodo : float, optional
+        Period of the seasonal cycle in samples, 12 for monthly data, 365.25
+        for daily data. The default is 12.
+    armonicos : int, optional
+        Number of harmonics. The default is 9.
+
+    Returns
+    -------
+    X : ndarray (n, p)
+        Columns 1, t, and the sin/cos of columnas_armonicas.
+    Q : ndarray (n, p)
+    R : ndarray (p, p)
+    var_coef : ndarray (p,)
+        Diagonal of (X'X)^-1, the variance of each coefficient is
+        var_coef*sigma^2.
+    """
+    resultado = diseno(np.arange(n, dtype=np.float64), periodo, armonicos)
+    for a in resultado:
+        a.setflags(write=False)
+    return resultado
+
+
+def ajuste_armonico(y, periodo=12, armonicos=9, t=None):
+    """
+    Least squares fit of the harmonic model.
+
+    Parameters
+    ----------
+    y : array (n,) or (n, m)
+        Series. With a 2-D array each column is fitted separately (same
+        design matrix). NaN are left out of the fit (with a 2-D array, the
+        rows with a NaN in any column).
+    periodo : float, optional
+        Period of the seasonal cycle in units of t. The default is 12.
+    armonicos : int, optional
+        Number of harmonics, 0 fits only the straight line. The default is 9.
+    t : array (n,), optional
+        Time of each sample, e.g. fractional years with periodo=1. The
+        default is t = 0..n-1, whose design matrix is cached.
+
+    Returns
+    -------
+    coef : ndarray (p,) or (p, m)
+        c0, c1 (trend per unit of t), and the coefficients of the harmonics
+        in the order of columnas_armonicas. NaN if there are fewer valid
+        samples than coefficients.
+    stderr : ndarray, same shape as coef
+        Standard error of each coefficient, assuming independent residuals.
+    ajuste : ndarray, same shape as y
+        Fitted values, also at the times of the NaN.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    valido = ~np.isnan(y) if y.ndim == 1 else ~np.isnan(y).any(axis=1)
+    if t is None and valido.all():
+        X, Q, R, var_coef = matriz_diseno(len(y), periodo, armonicos)
+    else:
+        t = np.arange(len(y), dtype=np.float64) if t is None else np.asarray(t, dtype=np.float64)
+        # harmonics resolved by the sampling of the whole series
+        X = _columnas(t, periodo, armonicos, _paso(t))
+        if valido.sum() < X.shape[1]:
+            coef = np.full((X.shape[1],) + y.shape[1:], np.nan)
+            return coef, coef.copy(), np.full(y.shape, np.nan)
+        Q, R, var_coef = _qr(X[valido])
+    p = X.shape[1]
+    yv = y[valido]
+    coef = np.linalg.solve(R, Q.T @ yv)
+    ajuste = X @ coef
+    gl = max(len(yv) - p, 1)
+    sigma2 = ((yv - ajuste[valido])**2).sum(axis=0)/gl
+    stderr = np.sqrt(np.multiply.outer(var_coef, sigma2))
+    return coef, stderr, ajuste
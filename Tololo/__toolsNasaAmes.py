@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:05:48 2026
+
+Reader of NASA Ames 1001 files (format of the data downloaded from EBAS,
+http://ebas.nilu.no/, extension .nas).
+
+Format description: https://cloud1.arc.nasa.gov/solve/archiv/archive.tutorial.html
+and DATA/DB-EBAS/EBAS data format.pdf. The header is:
+    NLHEAD FFI           number of header lines, format (1001)
+    ONAME                originator
+    ORG                  organization
+    SNAME                source
+    MNAME                mission / project
+    IVOL NVOL
+    DATE RDATE           reference date of the times, revision date
+    DX                   interval of the independent variable
+    XNAME                name of the independent variable (starttime)
+    NV                   number of dependent variables
+    VSCAL                scale factor of each variable
+    VMISS                missing value code of each variable
+    VNAME                NV lines, name, unit and statistics of each variable
+    NSCOML               number of special comment lines, and the lines
+    NNCOML               number of normal comment lines, and the lines. In
+                         EBAS files they are 'Key: value' pairs and the last
+                         one has the short names of the columns.
+
+Everything needed to read the data block (where it starts, the columns, the
+missing value codes and the reference date) is taken from the header, so any
+EBAS station or year can be read.
+"""
+
+import pandas as pd
+import numpy as np
+
+
+def leer_cabecera(fn):
+    """
+    Parameters
+    ----------
+    fn : str
+        Path of the .nas file.
+
+    Returns
+    -------
+    cabecera : dict
+        nlhead    : number of header lines (the data start at line nlhead+1)
+        ffi       : file format index, 1001
+        referencia: reference date of the times, Timestamp
+        revision  : revision date, Timestamp
+        dx        : interval of the independent variable (days), 0 if irregular
+        xname     : name of the independent variable
+        vscal     : list of scale factors, one per dependent variable
+        vmiss     : list of missing value codes, one per dependent variable
+        vname     : list of descriptions, one per dependent variable
+        columnas  : short names of the columns of the data block (from the
+                    last comment line), independent variable first
+        metadatos : dict with the 'Key: value' lines of the normal comments
+    """
+    with open(fn, encoding='latin-1') as f:
+        nlhead, ffi = [int(x) for x in f.readline().split()[:2]]
+        lineas = [f.readline().rstrip('\r\n') for i in range(nlhead-1)]
+
+    if ffi != 1001:
+        raise ValueError(fn + ': NASA Ames format ' + str(ffi) + ' is not supported, only 1001')
+
+    # lineas[0] is line 2 of the file
+    fecha = [int(x) for x in lineas[5].split()]
+    nv = int(lineas[8])
+    vscal = [float(x) for x in lineas[9].split()]
+    vmiss = [float(x) for x in lineas[10].split()]
+    vname = lineas[11:11+nv]
+
+    i = 11 + nv
+    nscoml = int(lineas[i])
+    i += 1 + nscoml
+    nncoml = int(lineas[i])
+    comentarios = lineas[i+1:i+1+nncoml]
+
+    metadatos = {}
+    for linea in comentarios[:-1]:
+        clave, sep, valor = linea.partition(':')
+        if sep:
+            metadatos[clave.strip()] = valor.strip()
+
+    if len(vscal) != nv or len(vmiss) != nv:
+        raise ValueError(fn + ': VSCAL/VMISS do not have ' + str(nv) + ' values')
+
+    return {'nlhead': nlhead, 'ffi': ffi,
+            'referencia': pd.Timestamp(*fecha[:3]),
+            'revision': pd.Timestamp(*fecha[3:6]),
+            'dx': float(lineas[6].split()[0]),
+            'xname': lineas[7],
+            'vscal': vscal, 'vmiss': vmiss, 'vname': vname,
+            'columnas': comentarios[-1].split() if comentarios else None,
+            'metadatos': metadatos}
+
+
+def nombre_variable(vname):
+    """
+    Short name of a dependent variable of an EBAS ozone file, built from its
+    description, e.g.
+        'ozone, nmol/mol, Statistics=arithmetic mean, ...' -> 'O3_ppbv'
+        'ozone, ug/m3, Statistics=stddev, ...'             -> 'O3_ug/m3_std'
+        'numflag, no unit'                                 -> 'flag'
+        'end_time of measurement, days from ...'           -> 'endtime'
+
+    Parameters
+    ----------
+    vname : str
+        One VNAME line of the header.
+
+    Returns
+    -------
+    str
+    """
+    partes = [p.strip() for p in vname.split(',')]
+    if partes[0].startswith('end_time'):
+        return 'endtime'
+    if partes[0] == 'numflag':
+        return 'flag'
+    unidades = {'nmol/mol': 'ppbv', 'ug/m3': 'ug/m3'}
+    nombre = {'ozone': 'O3'}.get(partes[0], partes[0])
+    if len(partes) > 1 and partes[1] in unidades:
+        nombre = nombre + '_' + unidades[partes[1]]
+    if 'Statistics=stddev' in partes:
+        nombre = nombre + '_std'
+    return nombre
+
+
+def leer_nasa_ames(fn, chunksize=100000):
+    """
+    Read a NASA Ames 1001 file. The data block is read in pieces of chunksize
+    lines, all columns as float64.
+
+    Missing value codes (VMISS) are replaced by NaN and the scale factors
+    (VSCAL) are applied, except to the flag column, that keeps the codes
+    as they are (0.999 = missing, see the EBAS flag list). The time of each
+    row is the reference date plus starttime (days), rounded to the second,
+    so gaps and leap years are handled by the file itself.
+
+    Parameters
+    ----------
+    fn : str
+        Path of the .nas file.
+    chunksize : int, optional
+        Number of lines read at a time. The default is 100000.
+
+    Returns
+    -------
+    df : DataFrame
+        Indexed by the start time of each measurement, one column per
+        dependent variable, named with nombre_variable.
+    cabecera : dict
+        See leer_cabecera.
+    """
+    cabecera = leer_cabecera(fn)
+    # XNAME is a description ('days from file reference point'), the first
+    # column is always the start time
+    nombres = ['starttime'] + [nombre_variable(v) for v in cabecera['vname']]
+    # Columns with the same description get a suffix, as pandas does
+    for i, n in enumerate(nombres):
+        if nombres[:i].count(n):
+            nombres[i] = n + '.' + str(nombres[:i].count(n))
+
+    vmiss = np.array(cabecera['vmiss'])
+    vscal = np.array(cabecera['vscal'])
+    escalar = np.array([n != 'flag' for n in nombres[1:]])
+
+    partes = []
+    lector = pd.read_csv(fn, delimiter=r"\s+", header=None, skiprows=cabecera['nlhead'],
+                         names=nombres, dtype=np.float64, chunksize=chunksize,
+                         encoding='latin-1')
+    for trozo in lector:
+        valores = trozo.values[:, 1:]
+        valores[valores == vmiss] = np.nan
+        if (vscal[escalar] != 1).any():
+            valores[:, escalar] = valores[:, escalar]*vscal[escalar]
+        segundos = np.round(trozo.values[:, 0]*86400).astype('int64')
+        tiempo = (np.datetime64(cabecera['referencia'], 's')
+                  + segundos.astype('timedelta64[s]'))
+        partes.append(pd.DataFrame(valores, columns=nombres[1:],
+                                   index=pd.DatetimeIndex(tiempo.astype('datetime64[ns]'))))
+
+    if partes:
+        df = pd.concat(partes)
+    else:
+        df = pd.DataFrame(columns=nombres[1:], index=pd.DatetimeIndex([]), dtype=np.float64)
+
+    return df, cabecera
@@ -0,0 +1,608 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:02:17 2026
+
+Quality control tools for the Tololo time series.
+
+The functions work on the numpy arrays of a series (times as datetime64 and
+values as float) and not on shifted copies of the DataFrame, so gaps and
+irregular times are handled by the times themselves: a moving window is a
+time interval, not a number of rows.
+
+    - mascara_picos / filtro_picos: spike filter. Each value is compared with
+      the mean or median of the values around it (trailing or centered
+      window), or with the median absolute deviation (MAD).
+    - agregar_completitud / completitud: count, sum, mean and std per hour,
+      day, month or year, valid only if the interval has enough samples
+      compared with the number expected from the sampling step.
+    - media_movil: running means (e.g. 8 hours) with the same rule.
+    - decodificar_flags: EBAS flags as a uint16 bit field.
+    - PipelineQC: chain of rules (range, spikes, constant values,
+      completeness, EBAS flags) applied in order, with a bit mask of the
+      rules that rejected each value.
+"""
+
+import pandas as pd
+import numpy as np
+
+
+# Rows processed at a time by the moving window functions, bounds the memory
+# of the (rows x window) matrices
+BLOQUE = 2**16
+
+
+############################### EBAS flags ##################################
+
+# The EBAS numflag column has up to three 3 digit codes per value (e.g.
+# 0.659999 = codes 659 and 999). They are decoded to a uint16 bit field, one
+# bit per code below, saved in the 'flag' column next to O3_ppbv, so the
+# values can be filtered with bit operations: (flag & FLAG_INVALIDO) != 0
+BITS_FLAG_EBAS = {999: 0x0001,  # missing measurement, unspecified reason
+                  980: 0x0002,  # missing due to calibration or zero/span check
+                  900: 0x0004,  # hidden and invalidated by data originator
+                  899: 0x0008,  # measurement undefined, unspecified reason
+                  659: 0x0010,  # unspecified instrument/sampling anomaly
+                  599: 0x0020}  # inconsistent with another measurement
+# Any other code
+FLAG_OTRO = 0x8000
+# Codes for which the value is not used
+FLAG_INVALIDO = 0x0001 | 0x0002 | 0x0004 | 0x0008 | 0x0010 | 0x0020
+
+
+def codigos_flag(numflag):
+    """
+    Parameters
+    ----------
+    numflag : array of float
+        EBAS flag column, up to three 3 digit codes after the decimal point,
+        e.g. 0.999 or 0.659999. NaN = no code.
+
+    Returns
+    -------
+    array of int, (values x 3)
+        Codes of each value, 0 = no code.
+    """
+    r = np.round(np.nan_to_num(np.asarray(numflag, dtype='float64'))*1e9).astype('int64')
+    return np.stack([r//1000000 % 1000, r//1000 % 1000, r % 1000], axis=1)
+
+
+def decodificar_flags(numflag):
+    """
+    Parameters
+    ----------
+    numflag : array of float
+        EBAS flag column.
+
+    Returns
+    -------
+    array of uint16
+        Bit field of the codes of each value (BITS_FLAG_EBAS, FLAG_OTRO).
+    """
+    codigos = codigos_flag(numflag)
+    bits = np.zeros(len(codigos), dtype='uint16')
+    conocido = codigos == 0
+    for codigo, bit in BITS_FLAG_EBAS.items():
+        es = codigos == codigo
+        bits[es.any(axis=1)] |= bit
+        conocido |= es
+    bits[~conocido.all(axis=1)] |= FLAG_OTRO
+    return bits
+
+
+def mascara_flags(flags, mascara=FLAG_INVALIDO):
+    """True for the values whose flag has one of the bits of mascara."""
+    return (np.asarray(flags).astype('uint16') & np.uint16(mascara)) != 0
+
+
+def _limites(tiempo, ventana, centrada):
+    """
+    First and last+1 position of the window of each value (sorted times).
+    Trailing windows are [t-ventana, t), centered windows are
+    [t-ventana/2, t+ventana/2]; in both cases the value itself is excluded
+    later.
+    """
+    t = tiempo.astype('datetime64[ns]').view('int64')
+    w = pd.Timedelta(ventana).value
+    if centrada:
+        lo = np.searchsorted(t, t - w//2, side='left')
+        hi = np.searchsorted(t, t + w//2, side='right')
+    else:
+        lo = np.searchsorted(t, t - w, side='left')
+        hi = np.searchsorted(t, t, side='left')
+    return lo, hi
+
+
+def _matriz_ventana(valores, lo, hi, filas):
+    """
+    Values of the windows of the rows filas, one row per value, NaN where
+    the window has no value (shorter windows, gaps, the value itself).
+    """
+    lo, hi = lo[filas], hi[filas]
+    ancho = max(int((hi - lo).max()), 1) if len(filas) else 1
+    idx = lo[:, None] + np.arange(ancho)[None, :]
+    fuera = (idx >= hi[:, None]) | (idx == filas[:, None])
+    m = valores[np.minimum(idx, len(valores)-1)]
+    m[fuera] = np.nan
+    return m
+
+
+def _mediana_filas(m):
+    """Median of each row of m ignoring NaN (NaN for rows without values)."""
+    m = np.sort(m, axis=1)  # NaN go to the end
+    n = (~np.isnan(m)).sum(axis=1)
+    filas = np.arange(len(m))
+    a = m[filas, np.maximum((n-1)//2, 0)]
+    b = m[filas, np.maximum(n//2, 0)]
+    med = (a + b)/2
+    med[n == 0] = np.nan
+    return med
+
+
+def mascara_picos(tiempo, valores, ventana='45min', centrada=False,
+                  criterio='media', c=1.5, k=3.5, min_periodos=1):
+    """
+    Find spikes in a time series.
+
+    Each value x is compared with a reference computed from the other values
+    of its window:
+        criterio='media'   ref = mean of the window,
+        criterio='mediana' ref = median of the window,
+            'pico_alto' if x > c*ref, 'pico_bajo' if x < (c-1)*ref
+        criterio='mad'     ref = median and MAD of the window,
+            'pico_mad' if |x - median| > k*1.4826*MAD
+
+    Windows with less than min_periodos valid values do not reject anything.
+
+    Parameters
+    ----------
+    tiempo : array of datetime64 or DatetimeIndex
+        Times, sorted. Gaps and irregular steps are allowed.
+    valores : array of float
+        Values, NaN = missing.
+    ventana : str or Timedelta, optional
+        Length of the window. The default is '45min' (3 DMC values).
+    centrada : bool, optional
+        Window centered on the value instead of the values before it. The
+        default is False.
+    criterio : str, optional
+        'media', 'mediana' or 'mad'. The default is 'media'.
+    c : float, optional
+        Factor of the 'media' and 'mediana' criteria. The default is 1.5.
+    k : float, optional
+        Number of (scaled) MAD of the 'mad' criterion. The default is 3.5.
+    min_periodos : int, optional
+        Minimum number of valid values in the window. The default is 1.
+
+    Returns
+    -------
+    mascaras : dict
+        {rule: boolean array}, True where the rule rejects the value.
+    """
+    if criterio not in ('media', 'mediana', 'mad'):
+        raise ValueError("criterio must be 'media', 'mediana' or 'mad'")
+    tiempo = np.asarray(tiempo)
+    x = np.asarray(valores, dtype='float64')
+    lo, hi = _limites(tiempo, ventana, centrada)
+
+    if criterio == 'mad':
+        mascaras = {'pico_mad': np.zeros(len(x), dtype=bool)}
+    else:
+        mascaras = {'pico_alto': np.zeros(len(x), dtype=bool),
+                    'pico_bajo': np.zeros(len(x), dtype=bool)}
+
+    for i in range(0, len(x), BLOQUE):
+        filas = np.arange(i, min(i+BLOQUE, len(x)))
+        m = _matriz_ventana(x, lo, hi, filas)
+        n = (~np.isnan(m)).sum(axis=1)
+        xi = x[filas]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if criterio == 'media':
+                ref = np.where(np.isnan(m), 0, m).sum(axis=1)/n
+            else:
+                ref = _mediana_filas(m)
+            ref[n < min_periodos] = np.nan
+            if criterio == 'mad':
+                mad = _mediana_filas(np.abs(m - ref[:, None]))*1.4826
+                mascaras['pico_mad'][filas] = np.abs(xi - ref) > k*mad
+            else:
+                mascaras['pico_alto'][filas] = c*ref - xi < 0
+                mascaras['pico_bajo'][filas] = (c-1)*ref - xi > 0
+
+    return mascaras
+
+
+def filtro_picos(serie, **opciones):
+    """
+    Remove the spikes of a series, see mascara_picos for the options.
+
+    Parameters
+    ----------
+    serie : Series
+        Time series, e.g. DMC O3_ppbv every 15 minutes.
+
+    Returns
+    -------
+    limpia : Series
+        Copy of serie with NaN in the rejected values.
+    rechazos : dict
+        {rule: number of values rejected by the rule}. A value can be
+        rejected by more than one rule.
+    """
+    mascaras = mascara_picos(serie.index.values, serie.values, **opciones)
+    rechazo = np.zeros(len(serie), dtype=bool)
+    for m in mascaras.values():
+        rechazo |= m
+    limpia = serie.copy()
+    limpia[rechazo] = np.nan
+    return limpia, {regla: int(m.sum()) for regla, m in mascaras.items()}
+
+
+def paso_muestreo(tiempo):
+    """
+    Sampling step of a series, the median of the time differences. NaT if
+    there are less than two times (the step is unknown).
+    """
+    t = np.asarray(tiempo).astype('datetime64[ns]').view('int64')
+    if len(t) < 2:
+        return pd.NaT
+    return pd.Timedelta(int(np.median(np.diff(t))))
+
+
+def _intervalos(tiempo, frec):
+    """
+    Interval of each time and the intervals from the first to the last time.
+
+    Returns
+    -------
+    codigo : array of int
+        Interval of each time, 0 = first interval.
+    etiquetas : DatetimeIndex
+        Label of each interval, the same as resample(frec): the start of the
+        interval for hours/days, the last day for months ('M') and years ('A').
+    duracion : array of int
+        Length of each interval, in ns.
+    """
+    t = tiempo.astype('datetime64[ns]')
+    frec_mayus = frec.upper()
+    if frec_mayus in ('M', 'A', 'Y'):
+        unidad = 'M' if frec_mayus == 'M' else 'Y'
+        p = t.astype('datetime64[' + unidad + ']')
+        rango = np.arange(p[0], p[-1] + 1)
+        inicio = rango.astype('datetime64[ns]')
+        fin = (rango + 1).astype('datetime64[ns]')
+        codigo = (p - p[0]).astype('int64')
+        etiquetas = pd.DatetimeIndex(fin - np.timedelta64(1, 'D'))
+        return codigo, etiquetas, (fin - inicio).astype('int64')
+    offset = pd.tseries.frequencies.to_offset(frec)
+    if not isinstance(offset, pd.offsets.Tick):
+        raise ValueError("frec must be a fixed length ('15min', 'H', '8H', 'D') or 'M', 'A'")
+    w = offset.nanos
+    # Intervals start at multiples of w since 1970-01-01, for lengths that
+    # divide one day this is the same as resample
+    c = t.view('int64') // w
+    codigo = c - c[0]
+    etiquetas = pd.DatetimeIndex((np.arange(c[0], c[-1] + 1)*w).astype('datetime64[ns]'))
+    return codigo, etiquetas, np.full(len(etiquetas), w, dtype='int64')
+
+
+def agregar_completitud(serie, frec, n_min=None, fraccion=0.75, paso=None,
+                        flags=None, mascara=FLAG_INVALIDO):
+    """
+    Statistics per interval of a time series, computed in one grouped pass
+    (np.bincount) over the valid values. The mean and standard deviation of
+    an interval are valid only if it has at least n_min values.
+
+    Parameters
+    ----------
+    serie : Series
+        Time series indexed by time, sorted. NaN = missing.
+    frec : str
+        Intervals: 'H', 'D', other fixed lengths ('8H', '15min'), 'M' or 'A'.
+    n_min : int, optional
+        Minimum number of valid values of an interval. The default is None,
+        fraccion of the values expected in the interval.
+    fraccion : float, optional
+        Fraction of the expected values required when n_min is None. The
+        default is 0.75 (WMO/GAW rule, e.g. 18 hours for a daily mean).
+    paso : str or Timedelta, optional
+        Sampling step of the series, to compute the number of expected
+        values (interval length / paso). The default is None, the median
+        time difference of the series (unknown for a single value, then
+        esperado is NaN and the intervals are valid only with n_min).
+    flags : array of uint16, optional
+        EBAS flags of the values (decodificar_flags). Values with a bit of
+        mascara are not used. The default is None (no flags).
+    mascara : int, optional
+        Bits of the flags that invalidate a value. The default is
+        FLAG_INVALIDO.
+
+    Returns
+    -------
+    DataFrame
+        Indexed by interval (all the intervals from the first to the last
+        value), columns:
+            count    : number of valid values
+            sum      : sum of the valid values
+            mean     : mean, NaN if the interval is not valid
+            std      : standard deviation (ddof=1), NaN if not valid
+            esperado : number of values expected
+            valido   : count >= n_min
+            flag     : only with flags, OR of the flags of the interval
+    """
+    tiempo = np.asarray(serie.index.values)
+    x = np.asarray(serie.values, dtype='float64')
+    if len(x) == 0:
+        return pd.DataFrame(columns=['count', 'sum', 'mean', 'std', 'esperado', 'valido'])
+    codigo, etiquetas, duracion = _intervalos(tiempo, frec)
+    paso = paso_muestreo(tiempo) if paso is None else pd.Timedelta(paso)
+    if pd.isna(paso):
+        # unknown step (a single value): the number of values expected is
+        # unknown, only an explicit n_min makes an interval valid
+        esperado = np.full(len(duracion), np.nan)
+    else:
+        esperado = duracion // paso.value
+
+    ok = ~np.isnan(x)
+    if flags is not None:
+        ok &= ~mascara_flags(flags, mascara)
+    k = len(etiquetas)
+    n = np.bincount(codigo[ok], minlength=k)
+    s = np.bincount(codigo[ok], weights=x[ok], minlength=k)
+    # For the variance, values minus the global mean, so the sum of squares
+    # does not lose precision when the mean is large compared with the
+    # deviations
+    x0 = x[ok].mean() if ok.any() else 0.
+    d = x[ok] - x0
+    sd = np.bincount(codigo[ok], weights=d, minlength=k)
+    sd2 = np.bincount(codigo[ok], weights=d*d, minlength=k)
+
+    if n_min is None:
+        n_min = np.ceil(fraccion*esperado)
+    valido = n >= np.maximum(n_min, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = s/n
+        var = (sd2 - sd*sd/n)/(n - 1)
+    std = np.sqrt(np.maximum(var, 0))
+    std[n < 2] = np.nan
+
+    agregado = pd.DataFrame({'count': n, 'sum': s,
+                             'mean': np.where(valido, media, np.nan),
+                             'std': np.where(valido, std, np.nan),
+                             'esperado': esperado, 'valido': valido},
+                            index=etiquetas)
+    if flags is not None:
+        # OR of the flags of each interval, one bincount per bit
+        flags = np.asarray(flags).astype('uint16')
+        flag = np.zeros(k, dtype='uint16')
+        for b in range(16):
+            con_bit = (flags >> b) & 1 == 1
+            if con_bit.any():
+                flag[np.bincount(codigo[con_bit], minlength=k) > 0] |= np.uint16(1 << b)
+        agregado['flag'] = flag
+    return agregado
+
+
+def completitud(df, n, frec, columna='O3_ppbv', mascara=FLAG_INVALIDO):
+    """
+    Parameters
+    ----------
+    df : DataFrame, contiene la información de las mediciones. Si tiene la
+        columna 'flag' (EBAS, uint16) los datos con algún bit de mascara no
+        se consideran.
+    n : int, número de datos válidos mínimo que debe contener el intervalo
+        de tiempo para calcular la media.
+    frec : str, indica la frecuencia de los datos a promediar.
+    columna : str, columna que define si el intervalo es válido. Por defecto
+        'O3_ppbv'.
+    mascara : int, bits de 'flag' que invalidan un dato. Por defecto
+        FLAG_INVALIDO.
+
+    Returns
+    -------
+    list
+        Entrega una lista con un DataFrame con los datos promediados en el 
+        intervalo de tiempo sugerido (NaN en todas las columnas si columna
+        tiene menos de n datos, 'flag' es el OR de los flags del intervalo)
+        y el número de intervalos no considerados.
+    """
+    flags = df['flag'].values if 'flag' in df.columns else None
+    columnas = [c for c in df.columns if c != 'flag']
+    agregados = {c: agregar_completitud(df[c], frec, n_min=1, flags=flags, mascara=mascara)
+                 for c in columnas}
+    valido = agregados[columna]['count'].values >= n
+    df_mean = pd.DataFrame({c: agregados[c]['mean'].values.astype(df[c].dtype)
+                            for c in columnas}, index=agregados[columna].index)
+    df_mean[~valido] = np.nan
+    if flags is not None:
+        df_mean['flag'] = agregados[columna]['flag'].values
+        df_mean = df_mean[list(df.columns)]
+    return [df_mean, int((~valido).sum())]
+
+
+def media_movil(serie, ventana='8H', n_min=None, fraccion=0.75, paso=None):
+    """
+    Running mean over the values in (t - ventana, t], e.g. the 8 hour ozone
+    means of the WMO/GAW and air quality statistics.
+
+    Parameters
+    ----------
+    serie : Series
+        Time series indexed by time, sorted. NaN = missing.
+    ventana : str or Timedelta, optional
+        Length of the window. The default is '8H'.
+    n_min : int, optional
+        Minimum number of valid values in the window. The default is None,
+        fraccion of the values expected (6 of 8 hourly values).
+    fraccion : float, optional
+        See agregar_completitud. The default is 0.75.
+    paso : str or Timedelta, optional
+        See agregar_completitud.
+
+    Returns
+    -------
+    Series
+        Mean of the window that ends at each time, NaN if the window has
+        less than n_min values.
+    """
+    tiempo = np.asarray(serie.index.values).astype('datetime64[ns]').view('int64')
+    x = np.asarray(serie.values, dtype='float64')
+    w = pd.Timedelta(ventana).value
+    if n_min is None:
+        paso = paso_muestreo(serie.index.values) if paso is None else pd.Timedelta(paso)
+        # unknown step (a single value): no window is valid
+        n_min = np.inf if pd.isna(paso) else int(np.ceil(fraccion*(w // paso.value)))
+
+    ok = ~np.isnan(x)
+    cn = np.concatenate([[0], np.cumsum(ok)])
+    cs = np.concatenate([[0.], np.cumsum(np.where(ok, x, 0.))])
+    lo = np.searchsorted(tiempo, tiempo - w, side='right')
+    hi = np.arange(1, len(x) + 1)
+    n = cn[hi] - cn[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = (cs[hi] - cs[lo])/n
+    media[n < max(n_min, 1)] = np.nan
+    return pd.Series(media, index=serie.index, name=serie.name)
+
+
+############################# Quality control pipeline ######################
+
+# Bit of each rule in the rejection mask of PipelineQC (uint16)
+BITS_QC = {'rango': 1, 'pico_alto': 2, 'pico_bajo': 4, 'pico_mad': 8,
+           'plano': 16, 'completitud': 32, 'flag_ebas': 64}
+
+def mascara_plano(tiempo, valores, ventana='6H', tolerancia=0.):
+    """
+    Values that stay constant (consecutive valid values that differ by at most
+    tolerancia) during ventana or more, e.g. a frozen instrument output.
+
+    Returns
+    -------
+    array of bool
+        True for the values of the constant sections.
+    """
+    t = np.asarray(tiempo).astype('datetime64[ns]').view('int64')
+    x = np.asarray(valores, dtype='float64')
+    v = np.flatnonzero(~np.isnan(x))
+    mascara = np.zeros(len(x), dtype=bool)
+    if len(v) < 2:
+        return mascara
+    xv, tv = x[v], t[v]
+    nuevo = np.concatenate([[True], np.abs(np.diff(xv)) > tolerancia])
+    tramo = np.cumsum(nuevo) - 1
+    ultimo = np.concatenate([nuevo[1:], [True]])
+    duracion = tv[ultimo] - tv[nuevo]
+    mascara[v] = (duracion >= pd.Timedelta(ventana).value)[tramo]
+    return mascara
+
+
+class PipelineQC:
+    """
+    Chain of quality control rules, applied in order to one time series.
+    Each rule sees the values left by the previous ones. Rules are added with
+    the methods rango, picos, plano, completitud and flag_ebas, that return
+    the pipeline, e.g. the cleaning of the DMC data:
+
+        qc = PipelineQC().picos(ventana='45min', c=1.5, min_periodos=3).rango(5, 100)
+        limpia, mascara, rechazos = qc.aplicar(df.O3_ppbv)
+
+    mascara has one bit per rule (BITS_QC) for each value, so the rejected
+    values can be inspected, or the thresholds tuned, without reading the
+    data again.
+    """
+
+    def __init__(self):
+        self.reglas = []
+
+    def __repr__(self):
+        return 'PipelineQC(' + ', '.join(n + str(o) for n, o in self.reglas) + ')'
+
+    def rango(self, minimo=None, maximo=None):
+        """Reject values < minimo or > maximo."""
+        self.reglas.append(('rango', {'minimo': minimo, 'maximo': maximo}))
+        return self
+
+    def picos(self, **opciones):
+        """Reject spikes, options of mascara_picos."""
+        self.reglas.append(('picos', opciones))
+        return self
+
+    def plano(self, ventana='6H', tolerancia=0.):
+        """Reject constant sections, see mascara_plano."""
+        self.reglas.append(('plano', {'ventana': ventana, 'tolerancia': tolerancia}))
+        return self
+
+    def completitud(self, frec='H', n_min=None, fraccion=0.75, paso=None):
+        """Reject all the values of the intervals with less than n_min values,
+        see agregar_completitud."""
+        self.reglas.append(('completitud', {'frec': frec, 'n_min': n_min,
+                                            'fraccion': fraccion, 'paso': paso}))
+        return self
+
+    def flag_ebas(self, mascara=FLAG_INVALIDO):
+        """Reject values whose flag has a bit of mascara, aplicar needs flags."""
+        self.reglas.append(('flag_ebas', {'mascara': mascara}))
+        return self
+
+    def _regla(self, nombre, op, tiempo, x, flags):
+        """Boolean masks {bit: mask} of one rule over the current values."""
+        if nombre == 'rango':
+            m = np.zeros(len(x), dtype=bool)
+            with np.errstate(invalid='ignore'):
+                if op['minimo'] is not None:
+                    m |= x < op['minimo']
+                if op['maximo'] is not None:
+                    m |= x > op['maximo']
+            return {'rango': m}
+        if nombre == 'picos':
+            return mascara_picos(tiempo, x, **op)
+        if nombre == 'plano':
+            return {'plano': mascara_plano(tiempo, x, **op)}
+        if nombre == 'completitud':
+            serie = pd.Series(x, index=tiempo)
+            agregado = agregar_completitud(serie, op['frec'], op['n_min'], op['fraccion'], op['paso'])
+            codigo = _intervalos(tiempo, op['frec'])[0]
+            return {'completitud': ~agregado['valido'].values[codigo]}
+        if nombre == 'flag_ebas':
+            if flags is None:
+                raise ValueError('the flag_ebas rule needs the flags of the values')
+            return {'flag_ebas': mascara_flags(flags, op['mascara'])}
+        raise ValueError('unknown rule ' + nombre)
+
+    def aplicar(self, serie, flags=None):
+        """
+        Parameters
+        ----------
+        serie : Series
+            Time series indexed by time, sorted.
+        flags : array of uint16, optional
+            EBAS flags of each value (decodificar_flags), for the flag_ebas
+            rule.
+
+        Returns
+        -------
+        limpia : Series
+            serie with NaN in the rejected values, same dtype.
+        mascara : array of uint16
+            Bits (BITS_QC) of the rules that rejected each value.
+        rechazos : dict
+            {bit: number of values rejected}. Each value is counted once, by
+            the first rule that rejected it.
+        """
+        tiempo = np.asarray(serie.index.values)
+        # The only copy of the values, rejected values are set to NaN in it
+        x = np.array(serie.values, dtype='float64')
+        mascara = np.zeros(len(x), dtype='uint16')
+        rechazos = {}
+        for nombre, op in self.reglas:
+            mascaras = self._regla(nombre, op, tiempo, x, flags)
+            validos = ~np.isnan(x)
+            rechazo = np.zeros(len(x), dtype=bool)
+            for bit, m in mascaras.items():
+                m = m & validos
+                mascara[m] |= BITS_QC[bit]
+                rechazos[bit] = rechazos.get(bit, 0) + int(m.sum())
+                rechazo |= m
+            x[rechazo] = np.nan
+        limpia = pd.Series(x.astype(serie.dtype), index=serie.index, name=serie.name)
+        return limpia, mascara, rechazos
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:58:16 2026
+
+Sen slope (median of the slopes between all pairs of samples), Mann-Kendall
+test and Sen confidence interval, for one series.
+
+The N ~ n^2/2 slopes are never built. For a value theta, the number of pairs
+with slope <= theta is the number of inversions of the series
+z = y - theta*t (pair i, j with t_i < t_j: slope <= theta <=> z_j <= z_i),
+counted with a merge sort in O(n log n). The k-th smallest slope is found by
+  1. taking the slopes of a random sample of pairs and choosing from them an
+     interval (lo, hi) that contains the k-th slope (a sample slope that is
+     the k-th slope, frequent when y has ties, is returned at once),
+  2. narrowing the interval with the sample slopes that fall inside it,
+     while it contains more than LIMITE pairs,
+  3. listing the pairs whose order changes between theta = lo and
+     theta = hi (the pairs with slope in (lo, hi)) and selecting among them.
+The result is the exact k-th slope, the random sample only changes how fast
+it is found.
+
+Gilbert, R.O. (1987), Statistical Methods for Environmental Pollution
+Monitoring, chapters 16 and 17.
+"""
+
+import numpy as np
+from statistics import NormalDist
+
+# Maximum number of pairs listed in step 3
+LIMITE = 2**20
+# Maximum number of narrowing steps (step 2)
+ITERACIONES = 64
+
+
+def _inversiones(p, enumerar=False):
+    """
+    Pairs a < b with p[a] > p[b], p a permutation of 0..n-1. Bottom-up merge
+    sort, each level is one searchsorted.
+
+    Returns the number of pairs, or two arrays (a, b) with enumerar=True.
+    """
+    n = len(p)
+    v = np.asarray(p, dtype=np.int64)
+    pos = np.arange(n)
+    total = 0
+    lista_a, lista_b = [], []
+    w = 1
+    while w < n:
+        bloque = np.arange(n)//(2*w)
+        derecha = (np.arange(n) % (2*w)) >= w
+        clave = v + bloque*n
+        kL, kR = clave[~derecha], clave[derecha]
+        # left elements of the same block greater than each right element
+        desde = np.searchsorted(kL, kR, side='right')
+        hasta = np.searchsorted(kL, (bloque[derecha] + 1)*n, side='left')
+        cuenta = hasta - desde
+        total += int(cuenta.sum())
+        if enumerar and cuenta.sum():
+            rep = np.repeat(np.arange(len(kR)), cuenta)
+            desp = np.arange(len(rep)) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+            lista_a.append(pos[~derecha][np.repeat(desde, cuenta) + desp])
+            lista_b.append(pos[derecha][rep])
+        # merge: the halves are sorted, a stable sort of the blocks merges them
+        orden = np.argsort(clave, kind='stable')
+        v, pos = v[orden], pos[orden]
+        w *= 2
+    if enumerar:
+        if lista_a:
+            return np.concatenate(lista_a), np.concatenate(lista_b)
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return total
+
+
+def _orden(t, y, theta, estricto=False):
+    # Samples (sorted by t, y) in the order of z = y - theta*t, ties last
+    # index first, so that equal z count as inversions (slope <= theta).
+    # With estricto=True ties first index first (slope < theta)
+    idx = np.arange(len(t)) if estricto else -np.arange(len(t))
+    if theta == -np.inf:
+        return np.lexsort((idx, y, t))
+    if theta == np.inf:
+        return np.lexsort((idx, y, -t))
+    return np.lexsort((idx, y - theta*t))
+
+
+def _rango(orden):
+    p = np.empty(len(orden), dtype=np.int64)
+    p[orden] = np.arange(len(orden))
+    return p
+
+
+class _Pendientes:
+    """Order statistics of the slopes of the pairs with different t."""
+
+    def __init__(self, t, y, semilla=0):
+        orden = np.lexsort((y, t))
+        self.t, self.y = t[orden], y[orden]
+        n = len(t)
+        # pairs with the same t: no slope. Those with also the same y are
+        # counted as inversions for every theta
+        _, grupos_t = np.unique(self.t, return_counts=True)
+        _, grupos_ty = np.unique(np.column_stack([self.t, self.y]), axis=0, return_counts=True)
+        self.c_igual = int((grupos_ty*(grupos_ty - 1)//2).sum())
+        self.N = n*(n - 1)//2 - int((grupos_t*(grupos_t - 1)//2).sum())
+        self.rng = np.random.default_rng(semilla)
+        self.muestra = self._muestra(min(self.N, 8*n + 1000))
+
+    def _muestra(self, m):
+        n = len(self.t)
+        i = self.rng.integers(0, n, 2*m)
+        j = self.rng.integers(0, n, 2*m)
+        ok = self.t[i] != self.t[j]
+        i, j = i[ok][:m], j[ok][:m]
+        return np.sort((self.y[j] - self.y[i])/(self.t[j] - self.t[i]))
+
+    def contar(self, theta, estricto=False):
+        """Number of pairs with slope <= theta (< theta with estricto=True)."""
+        if theta == -np.inf:
+            return 0
+        if theta == np.inf:
+            return self.N
+        # pairs with the same t and y are inversions only with ties last
+        # index first
+        igual = 0 if estricto else self.c_igual
+        return _inversiones(_rango(_orden(self.t, self.y, theta, estricto))) - igual
+
+    def k_esima(self, k):
+        """k-th smallest slope, k = 1..N."""
+        muestra = self.muestra
+        # the k-th slope is in the open interval (lo, hi), c_lo pairs have
+        # slope <= lo and c_hi pairs slope < hi
+        lo, hi = -np.inf, np.inf
+        c_lo, c_hi = 0, self.N
+        for _ in range(ITERACIONES):
+            # sample slopes inside (lo, hi), choose the bounds around the
+            # expected position of the k-th slope
+            dentro = muestra[(muestra > lo) & (muestra < hi)]
+            if c_hi - c_lo <= LIMITE or len(dentro) < 2:
+                break
+            q = (k - c_lo)/(c_hi - c_lo)
+            d = 3/np.sqrt(len(dentro))
+            cotas = lo, hi
+            for theta in np.unique(np.quantile(dentro, [max(q - d, 0.), min(q + d, 1.)],
+                                               method='lower')):
+                if not lo < theta < hi:
+                    continue
+                c = self.contar(theta)
+                if c < k:
+                    lo, c_lo = theta, c
+                    continue
+                # many pairs can have exactly the slope theta (tied series)
+                c_menor = self.contar(theta, estricto=True)
+                if c_menor < k:
+                    return theta
+                hi, c_hi = theta, c_menor
+            if (lo, hi) == cotas:
+                break
+        # pairs with slope in (lo, hi): order of lo versus order of hi
+        orden_lo = _orden(self.t, self.y, lo)
+        p_hi = _rango(_orden(self.t, self.y, hi, estricto=True))
+        a, b = _inversiones(p_hi[orden_lo], enumerar=True)
+        e1, e2 = orden_lo[a], orden_lo[b]
+        dt = self.t[e2] - self.t[e1]
+        pendientes = (self.y[e2] - self.y[e1])[dt != 0]/dt[dt != 0]
+        r = min(max(k - c_lo - 1, 0), len(pendientes) - 1)
+        return np.partition(pendientes, r)[r]
+
+
+def _validos(y, t):
+    y = np.asarray(y, dtype=np.float64)
+    t = np.arange(len(y), dtype=np.float64) if t is None else np.asarray(t, dtype=np.float64)
+    valido = ~np.isnan(y) & ~np.isnan(t)
+    return y[valido], t[valido]
+
+
+def _mediana(pares):
+    N = pares.N
+    if N % 2:
+        return pares.k_esima((N + 1)//2)
+    return (pares.k_esima(N//2) + pares.k_esima(N//2 + 1))/2
+
+
+def sen(y, t=None):
+    """
+    Only the Sen slope and intercept, see pendiente_sen. NaN are ignored.
+
+    Returns
+    -------
+    pendiente, intercepto : float
+        NaN if there are not two samples with different t.
+    """
+    y, t = _validos(y, t)
+    if len(y) < 2:
+        return np.nan, np.nan
+    pares = _Pendientes(t, y)
+    if pares.N == 0:
+        return np.nan, np.nan
+    pendiente = _mediana(pares)
+    return pendiente, np.median(y - pendiente*t)
+
+
+def pendiente_sen(y, t=None, alfa=0.05):
+    """
+    Sen slope, Mann-Kendall test and confidence interval of the slope.
+
+    Parameters
+    ----------
+    y : array (n,)
+        Series, NaN are ignored.
+    t : array (n,), optional
+        Time of each sample (e.g. fractional years). The default is 0..n-1.
+    alfa : float, optional
+        Significance level of the confidence interval. The default is 0.05.
+
+    Returns
+    -------
+    dict
+        pendiente  : Sen slope, in units of y per unit of t
+        intercepto : median of y - pendiente*t
+        inferior, superior : confidence interval of the slope at 1 - alfa
+        S, var_S   : Mann-Kendall statistic and its variance (with ties in y)
+        z, p       : normal score of S and two sided p-value
+        n          : number of valid samples
+    """
+    y, t = _validos(y, t)
+    n = len(y)
+    resultado = dict.fromkeys(['pendiente', 'intercepto', 'inferior', 'superior',
+                               'S', 'var_S', 'z', 'p'], np.nan)
+    resultado['n'] = n
+    if n < 2:
+        return resultado
+
+    pares = _Pendientes(t, y)
+    N = pares.N
+    if N == 0:
+        return resultado
+    pendiente = _mediana(pares)
+
+    # Mann-Kendall: S = #(y_j > y_i) - #(y_j < y_i) over the pairs t_i < t_j
+    orden = np.lexsort((np.arange(n), pares.y))
+    negativos = _inversiones(_rango(orden))
+    no_positivos = pares.contar(0.)
+    S = (N - no_positivos) - negativos
+    _, empates = np.unique(pares.y, return_counts=True)
+    var_S = (n*(n - 1)*(2*n + 5) - (empates*(empates - 1)*(2*empates + 5)).sum())/18
+    if var_S > 0:
+        z = (S - np.sign(S))/np.sqrt(var_S)
+        p = 2*(1 - NormalDist().cdf(abs(z)))
+    else:
+        z, p = 0., 1.
+
+    # Confidence interval, ranks M1 and M2 + 1 of the ordered slopes
+    C = NormalDist().inv_cdf(1 - alfa/2)*np.sqrt(var_S)
+    M1 = int(np.floor((N - C)/2))
+    M2 = int(np.ceil((N + C)/2))
+    inferior = pares.k_esima(M1) if M1 >= 1 else np.nan
+    superior = pares.k_esima(M2 + 1) if M2 + 1 <= N else np.nan
+
+    resultado.update({'pendiente': pendiente,
+                      'intercepto': np.median(y - pendiente*t),
+                      'inferior': inferior, 'superior': superior,
+                      'S': int(S), 'var_S': var_S, 'z': z, 'p': p})
+    return resultado
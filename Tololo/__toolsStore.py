@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:31 2026
+
+Binary columnar store for the Tololo time series.
+
+Every CSV written by Readingandsaving.py and Cleansingandsaving.py is also
+saved as a directory next to it (same name, extension '.store') containing:
+    - time.npy      : timestamps, datetime64[ns]
+    - values.npy    : measurements, float32 matrix (rows x columns)
+    - int-<i>.npy   : integer columns (e.g. the EBAS 'flag' bit field, uint16),
+                      one file each, i = position of the column
+    - manifest.json : columns, dtypes, number of rows and the size/mtime of
+                      the CSV the store was written with
+
+The dashboards open the .npy files memory-mapped, so no date parsing is done
+at start up and the DataFrame is a view of the file (pages are read from disk
+only when used). If the store is missing or older than its CSV, the CSV is read
+instead.
+
+The same format is used for the daily, monthly and yearly aggregates of the
+merged series (load_pyramid), saved in DATA as TOLOLO-pyramid-{D,M,A}.store.
+
+DATA/ingesta.json is the manifest of the source files (DB-DMC, DB-EBAS)
+already read by Readingandsaving.py, with their size, mtime and SHA-256, and
+the time window of the DMC data that Cleansingandsaving.py still has to clean
+(see leer_manifest_ingesta).
+"""
+
+import pandas as pd
+import numpy as np
+import os as os
+import json
+import zlib
+import hashlib
+from __toolsQC import FLAG_INVALIDO, mascara_flags
+
+
+STORE_VERSION = 1
+
+
+def ruta_store(fn):
+    """
+    Parameters
+    ----------
+    fn : str
+        Path of the CSV file, e.g. DATA/EBAS-O3H-2013-2019.csv
+
+    Returns
+    -------
+    str
+        Path of the store directory, e.g. DATA/EBAS-O3H-2013-2019.store
+    """
+    return os.path.splitext(fn)[0] + '.store'
+
+
+def _firma(fn):
+    """Size and modification time of a file, None if it does not exist."""
+    if not os.path.isfile(fn):
+        return None
+    st = os.stat(fn)
+    return {'name': os.path.basename(fn), 'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns}
+
+
+def save_store(df, fn, dtype='float32'):
+    """
+    Save a time indexed DataFrame as a binary columnar store next to the CSV
+    file fn. Call it right after df.to_csv(fn), so the store is bound to that
+    version of the CSV.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Data indexed by a DatetimeIndex, e.g. columns O3_ppbv, O3_ppbv_std.
+    fn : str
+        Path of the CSV file with the same data.
+    dtype : str, optional
+        Type used to store the values. The default is 'float32'. Integer
+        columns keep their own type.
+
+    Returns
+    -------
+    ruta : str
+        Path of the store directory.
+    """
+    ruta = ruta_store(fn)
+    os.makedirs(ruta, exist_ok=True)
+
+    # The manifest is written last, a store without manifest is not valid
+    fn_manifest = os.path.join(ruta, 'manifest.json')
+    if os.path.isfile(fn_manifest):
+        os.remove(fn_manifest)
+
+    enteras = {i: c for i, c in enumerate(df.columns)
+               if pd.api.types.is_integer_dtype(df[c].dtype)}
+    flotantes = [c for c in df.columns if c not in enteras.values()]
+
+    tiempo = pd.DatetimeIndex(df.index).values.astype('datetime64[ns]')
+    valores = np.ascontiguousarray(df[flotantes].values, dtype=dtype)
+    np.save(os.path.join(ruta, 'time.npy'), tiempo)
+    np.save(os.path.join(ruta, 'values.npy'), valores)
+    for i, c in enteras.items():
+        np.save(os.path.join(ruta, 'int-' + str(i) + '.npy'), df[c].values)
+
+    manifest = {'version': STORE_VERSION,
+                'columns': [str(c) for c in df.columns],
+                'int_columns': {str(i): df[c].dtype.name for i, c in enteras.items()},
+                'dtype': np.dtype(dtype).name,
+                'rows': int(len(df)),
+                'start': str(df.index[0]) if len(df) else None,
+                'end': str(df.index[-1]) if len(df) else None,
+                'source': _firma(fn)}
+    with open(fn_manifest + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(fn_manifest + '.tmp', fn_manifest)
+
+    return ruta
+
+
+def store_vigente(fn):
+    """
+    Parameters
+    ----------
+    fn : str
+        Path of the CSV file.
+
+    Returns
+    -------
+    manifest : dict or None
+        Manifest of the store, or None if the store does not exist, was
+        written by another version of this module or is older than the CSV.
+    """
+    fn_manifest = os.path.join(ruta_store(fn), 'manifest.json')
+    if not os.path.isfile(fn_manifest):
+        return None
+    with open(fn_manifest) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != STORE_VERSION:
+        return None
+
+    # If the CSV was rewritten after the store, the store is stale
+    firma = _firma(fn)
+    if firma is not None and firma != manifest['source']:
+        return None
+
+    return manifest
+
+
+def leer_csv(fn):
+    """
+    Read a time series CSV file written by Readingandsaving.py or
+    Cleansingandsaving.py at full precision (float64), for the scripts that
+    compute new data files from it. The dashboards use load_store.
+
+    Returns
+    -------
+    df : DataFrame
+        Data indexed by time, EBAS flags as uint16.
+    """
+    df = pd.read_csv(fn, index_col=0, parse_dates=True)
+    df.index.name = None
+    if 'flag' in df.columns:
+        df['flag'] = df['flag'].astype('uint16')
+    return df
+
+
+def load_store(fn, mmap=True):
+    """
+    Read a time series saved with save_store. Falls back to the CSV file when
+    the store is missing or stale.
+
+    Parameters
+    ----------
+    fn : str
+        Path of the CSV file.
+    mmap : bool, optional
+        Memory-map the arrays (read only, no copy). Use False if the data will
+        be modified in place. The default is True.
+
+    Returns
+    -------
+    df : DataFrame
+        Data indexed by time, values as float32 (use leer_csv for full
+        precision), EBAS flags as uint16.
+    """
+    manifest = store_vigente(fn)
+
+    if manifest is None:
+        df = leer_csv(fn)
+        return df.astype({c: 'float32' for c in df.columns if c != 'flag'})
+
+    ruta = ruta_store(fn)
+    modo = 'r' if mmap else None
+    tiempo = np.load(os.path.join(ruta, 'time.npy'), mmap_mode=modo)
+    valores = np.load(os.path.join(ruta, 'values.npy'), mmap_mode=modo)
+
+    enteras = {int(i): manifest['columns'][int(i)] for i in manifest.get('int_columns', {})}
+    flotantes = [c for i, c in enumerate(manifest['columns']) if i not in enteras]
+    df = pd.DataFrame(np.asarray(valores), index=pd.DatetimeIndex(np.asarray(tiempo)),
+                      columns=flotantes, copy=False)
+    if enteras:
+        for i, c in enteras.items():
+            df[c] = np.asarray(np.load(os.path.join(ruta, 'int-' + str(i) + '.npy'), mmap_mode=modo))
+        df = df[manifest['columns']]
+    return df
+
+
+def merge_tololo(DMC_data, EBAS_data):
+    """
+    Merge DMC (1995-2013) and EBAS (2013-) hourly data in one series, sorted
+    by time and without repeated dates. Built once when the dashboard starts,
+    callbacks take windows of it with ventana().
+
+    Overlap rule: DMC and EBAS share the first months of 2013. For each hour
+    and each column the EBAS value is used if it is valid (not NaN and
+    without an invalid flag), because EBAS data are level 2 GAW data,
+    manually inspected. DMC fills the hours where EBAS has no valid value,
+    and the columns that only DMC measures (RH_perc).
+
+    Parameters
+    ----------
+    DMC_data : DataFrame
+        Hourly DMC data, columns O3_ppbv and RH_perc.
+    EBAS_data : DataFrame
+        Hourly EBAS data, columns O3_ppbv, O3_ppbv_std and optionally flag
+        (uint16 bit field, see __toolsQC.decodificar_flags).
+
+    Returns
+    -------
+    serie : DataFrame
+        Columns O3_ppbv, RH_perc and O3_ppbv_std, float32, and flag, uint16
+        (0 in the hours with DMC ozone), indexed by a unique and increasing
+        DatetimeIndex.
+    """
+    dmc = DMC_data[~DMC_data.index.duplicated(keep='first')].sort_index()
+    ebas = EBAS_data[~EBAS_data.index.duplicated(keep='first')].sort_index()
+
+    if 'flag' in ebas.columns:
+        # Values with invalid flags are not used
+        invalido = mascara_flags(ebas['flag'].values, FLAG_INVALIDO)
+        if invalido.any():
+            ebas = ebas.copy()
+            ebas.loc[invalido, [c for c in ebas.columns if c != 'flag']] = np.nan
+
+    serie = ebas.combine_first(dmc)
+
+    # Same column order as pd.concat([DMC_data, EBAS_data])
+    columnas = list(dmc.columns) + [c for c in ebas.columns if c not in dmc.columns]
+    serie = serie[columnas].astype({c: 'float32' for c in columnas if c != 'flag'})
+
+    if 'flag' in ebas.columns:
+        # The flags describe the EBAS ozone, 0 where the ozone is from DMC
+        flag = ebas['flag'].reindex(serie.index, fill_value=0).values.astype('uint16')
+        o3_ebas = ebas['O3_ppbv'].reindex(serie.index)
+        flag[o3_ebas.isna().values & serie['O3_ppbv'].notna().values] = 0
+        serie['flag'] = flag
+
+    return serie
+
+
+def ventana(serie, start_date=None, end_date=None):
+    """
+    Rows of serie between start_date and end_date, both included, with the
+    same rules as serie.loc[start_date:end_date] (e.g. '2013' or '2013-05-03'
+    include the whole year or day). The limits are found by binary search on
+    the sorted index and the result is a view of serie, not a copy, so the
+    cost depends on the size of the window and not on the size of the archive.
+
+    Parameters
+    ----------
+    serie : DataFrame
+        Series returned by merge_tololo.
+    start_date : str or datetime, optional
+        First date of the window. The default is the start of the series.
+    end_date : str or datetime, optional
+        Last date of the window. The default is the end of the series.
+
+    Returns
+    -------
+    DataFrame
+        Window of the series.
+    """
+    i, j = serie.index.slice_locs(start_date, end_date)
+    return serie.iloc[i:j]
+
+
+############################ Aggregate pyramid ##############################
+
+# Levels of the pyramid and the resample rule of each one
+NIVELES = {'D': 'D', 'M': 'M', 'A': 'A'}
+
+
+def _firma_serie(serie, filas=None):
+    """Number of rows, last date and CRC32 of the first filas rows of serie."""
+    if filas is None:
+        filas = len(serie)
+    tiempo = np.ascontiguousarray(serie.index.values[:filas]).view('int64')
+    valores = np.ascontiguousarray(serie.values[:filas], dtype='float32')
+    crc = zlib.crc32(valores.tobytes(), zlib.crc32(tiempo.tobytes()))
+    return {'rows': int(filas), 'end': str(serie.index[filas-1]) if filas else None,
+            'crc': int(crc)}
+
+
+def agregar(s, regla):
+    """
+    Parameters
+    ----------
+    s : Series
+        Time series, e.g. hourly ozone.
+    regla : str
+        Resample rule, 'D', 'M' or 'A'.
+
+    Returns
+    -------
+    DataFrame
+        Mean, number of valid values, standard deviation and 25th and 75th
+        percentiles per interval.
+    """
+    r = s.resample(regla)
+    df = r.agg(['mean', 'count', 'std'])
+    df['q25'] = r.quantile(0.25)
+    df['q75'] = r.quantile(0.75)
+    return df
+
+
+def build_pyramid(serie, columna='O3_ppbv', desde=None, piramide=None):
+    """
+    Daily, monthly and yearly aggregates (mean, count, std, q25, q75) of one
+    column of the hourly series.
+
+    Parameters
+    ----------
+    serie : DataFrame
+        Series returned by merge_tololo.
+    columna : str, optional
+        Column to aggregate. The default is 'O3_ppbv'.
+    desde : str or datetime, optional
+        Only intervals from this date on are computed again and replaced in
+        piramide. Must be the first day of a year. The default is None
+        (everything is computed).
+    piramide : dict, optional
+        Pyramid to update when desde is given.
+
+    Returns
+    -------
+    piramide : dict
+        Keys 'D', 'M' and 'A', each one a DataFrame indexed by the labels of
+        resample ('M' and 'A' use the last day of the interval).
+    """
+    s = ventana(serie, desde, None)[columna]
+    nueva = {}
+    for nivel, regla in NIVELES.items():
+        agregado = agregar(s, regla).astype('float32')
+        if desde is not None and piramide is not None:
+            viejo = piramide[nivel]
+            viejo = viejo.iloc[:viejo.index.searchsorted(pd.Timestamp(desde))]
+            agregado = pd.concat([viejo, agregado])
+        nueva[nivel] = agregado
+    return nueva
+
+
+def load_pyramid(serie, datadir, columna='O3_ppbv', nombre='TOLOLO-pyramid'):
+    """
+    Read the aggregate pyramid saved in datadir, or build it if it does not
+    exist or does not correspond to serie. If serie is the saved series plus
+    new data at the end, only the years from the last saved year on are
+    computed again.
+
+    Parameters
+    ----------
+    serie : DataFrame
+        Series returned by merge_tololo.
+    datadir : str
+        Directory of the data files, e.g. DATA.
+    columna : str, optional
+        Column to aggregate. The default is 'O3_ppbv'.
+    nombre : str, optional
+        Prefix of the files. The default is 'TOLOLO-pyramid'.
+
+    Returns
+    -------
+    piramide : dict
+        See build_pyramid.
+    """
+    fn_manifest = os.path.join(datadir, nombre + '.json')
+    fns = {nivel: os.path.join(datadir, nombre + '-' + nivel + '.csv')
+           for nivel in NIVELES}
+
+    manifest = None
+    if os.path.isfile(fn_manifest):
+        with open(fn_manifest) as f:
+            manifest = json.load(f)
+        if (manifest.get('version') != STORE_VERSION or manifest['columna'] != columna
+                or any(store_vigente(fn) is None for fn in fns.values())):
+            manifest = None
+
+    firma = _firma_serie(serie)
+    if manifest is not None and manifest['serie'] == firma:
+        return {nivel: load_store(fn) for nivel, fn in fns.items()}
+
+    desde, piramide = None, None
+    if (manifest is not None and manifest['serie']['rows'] <= len(serie)
+            and _firma_serie(serie, manifest['serie']['rows']) == manifest['serie']):
+        # Only new data at the end: recompute from the start of the last year
+        desde = pd.Timestamp(manifest['serie']['end']).to_period('A').start_time
+        piramide = {nivel: load_store(fn) for nivel, fn in fns.items()}
+
+    piramide = build_pyramid(serie, columna, desde, piramide)
+
+    if os.path.isfile(fn_manifest):
+        os.remove(fn_manifest)
+    for nivel, fn in fns.items():
+        save_store(piramide[nivel], fn)
+    with open(fn_manifest, 'w') as f:
+        json.dump({'version': STORE_VERSION, 'columna': columna, 'serie': firma},
+                  f, indent=1)
+
+    return {nivel: load_store(fn) for nivel, fn in fns.items()}
+
+
+########################## Manifest of source files ##########################
+
+MANIFEST_INGESTA = 'ingesta.json'
+
+
+def hash_archivo(fn, bloque=2**20):
+    """SHA-256 of the content of a file, as a hexadecimal string."""
+    h = hashlib.sha256()
+    with open(fn, 'rb') as f:
+        for trozo in iter(lambda: f.read(bloque), b''):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def firma_fuente(fn, anterior=None):
+    """
+    Parameters
+    ----------
+    fn : str
+        Path of a source file, e.g. DATA/DB-DMC/ET1995.csv
+    anterior : dict, optional
+        Signature of the same file in the manifest. If the size and mtime are
+        the same the file is not read again and its hash is reused.
+
+    Returns
+    -------
+    dict
+        size, mtime_ns and sha256 of the file.
+    """
+    st = os.stat(fn)
+    firma = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if (anterior is not None and anterior.get('size') == firma['size']
+            and anterior.get('mtime_ns') == firma['mtime_ns']):
+        firma['sha256'] = anterior['sha256']
+    else:
+        firma['sha256'] = hash_archivo(fn)
+    return firma
+
+
+def leer_manifest_ingesta(datadir):
+    """
+    Parameters
+    ----------
+    datadir : str
+        Directory of the data files, e.g. DATA.
+
+    Returns
+    -------
+    manifest : dict or None
+        None if there is no manifest (or it was written by another version).
+        Otherwise:
+            fuentes   : {path relative to datadir: {'serie', 'size',
+                        'mtime_ns', 'sha256', 'ventana'}}, ventana is the
+                        [start, end] of the data read from the file
+            pendiente : {'DMC': [start, end] or None}, window of the DMC data
+                        changed since the last run of Cleansingandsaving.py
+    """
+    fn = os.path.join(datadir, MANIFEST_INGESTA)
+    if not os.path.isfile(fn):
+        return None
+    with open(fn) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != STORE_VERSION:
+        return None
+    return manifest
+
+
+def guardar_manifest_ingesta(datadir, manifest):
+    """Write the manifest of source files (see leer_manifest_ingesta)."""
+    fn = os.path.join(datadir, MANIFEST_INGESTA)
+    manifest['version'] = STORE_VERSION
+    with open(fn + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(fn + '.tmp', fn)
+
+
+def unir_ventanas(a, b):
+    """Smallest window [start, end] that contains the windows a and b (None = empty)."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return [min(a[0], b[0]), max(a[1], b[1])]
+
+
+def reemplazar_ventana(serie, nueva, inicio, fin):
+    """
+    Replace the rows of serie with time in [inicio, fin) by the rows of nueva.
+
+    Parameters
+    ----------
+    serie : DataFrame
+        Time series already saved, e.g. EBAS hourly data.
+    nueva : DataFrame
+        New data of the window, same columns as serie.
+    inicio, fin : str or datetime
+        Limits of the window, fin is not included.
+
+    Returns
+    -------
+    DataFrame
+        Sorted by time, without repeated dates.
+    """
+    tiempo = serie.index
+    fuera = (tiempo < pd.Timestamp(inicio)) | (tiempo >= pd.Timestamp(fin))
+    df = pd.concat([serie[fuera], nueva]).sort_index(kind='stable')
+    df = df[~df.index.duplicated(keep='first')]
+    # Integer columns (flags) become float if serie did not have them
+    enteras = {c: nueva[c].dtype for c in nueva.columns
+               if pd.api.types.is_integer_dtype(nueva[c].dtype) and df[c].notna().all()}
+    return df.astype(enteras)
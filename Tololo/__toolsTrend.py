@@ -12,10 +12,18 @@ import matplotlib.pyplot as plt
 from matplotlib.offsetbox import AnchoredText
 from scipy.optimize import leastsq
 import pandas as pd
+import time
+import inspect
+from collections import namedtuple
 
 
 
-def plot_regression(pu , pu_m,t,x,error,titulo,trend = True):
+def plot_regression(pu , pu_m,t,x,error,titulo,trend = True, nivel_m = None):
+    """
+    nivel_m: optional, monthly level of the aggregate pyramid (load_pyramid).
+    If given, the monthly mean and quartiles are read from it instead of
+    resampling pu three times.
+    """
         
     plt.rcParams["font.family"] = "Times New Roman"
     plt.rcParams['xtick.labelsize'] = 22
@@ -35,8 +43,9 @@ def plot_regression(pu , pu_m,t,x,error,titulo,trend = True):
     plt.ylabel('PM$_{2.5}$ $\mu g/m^3$',fontsize=16)
     plt.legend(loc='upper center',ncol=3,frameon=False, fontsize=14)
     
-    plt.fill_between(pu_m.index, pu_m.resample('M').mean() , pu.resample('M').quantile(0.25),facecolor='gray', alpha=0.21) ;    
-    plt.fill_between(pu_m.index, pu.resample('M').mean()   , pu.resample('M').quantile(0.75),facecolor='gray', alpha=0.21) ;    
+    media, q25, q75 = _mensual(pu, nivel_m, pu_m.index)
+    plt.fill_between(pu_m.index, media , q25,facecolor='gray', alpha=0.21) ;    
+    plt.fill_between(pu_m.index, media   , q75,facecolor='gray', alpha=0.21) ;    
     
     # quantile(0.75)*(pu.PM25.resample('M').std()/len(pu.PM25.resample('M'))) intervalo de confianza
     if trend == True:
@@ -58,7 +67,17 @@ def plot_regression(pu , pu_m,t,x,error,titulo,trend = True):
 
 
 
-def plot_m(pu , pu_m, titulo):
+def _mensual(pu, nivel_m, fechas):
+    # Monthly mean and quartiles, from the pyramid if available
+    if nivel_m is None:
+        r = pu.resample('M')
+        return r.mean(), r.quantile(0.25), r.quantile(0.75)
+    nivel_m = nivel_m.loc[fechas[0]:fechas[-1]]
+    return nivel_m['mean'], nivel_m['q25'], nivel_m['q75']
+
+
+
+def plot_m(pu , pu_m, titulo, nivel_m = None):
         
     plt.rcParams["font.family"] = "Times New Roman"
     plt.rcParams['xtick.labelsize'] = 22
@@ -75,10 +94,11 @@ def plot_m(pu , pu_m, titulo):
     plt.ylabel('PM$_{2.5}$ $\mu g/m^3$',fontsize=20)
     plt.legend(loc='upper center',ncol=3,frameon=False, fontsize=20)
     
-    plt.fill_between(pu_m.index, pu_m.resample('M').mean() , pu.resample('M').quantile(0.25),facecolor='gray', alpha=0.18) ;    
+    media, q25, q75 = _mensual(pu, nivel_m, pu_m.index)
+    plt.fill_between(pu_m.index, media , q25,facecolor='gray', alpha=0.18) ;    
 #    plt.fill_between(pu_m.index, pu_m.resample('M').mean() , pu.resample('M').quantile(0.05),facecolor='gray', alpha=0.18) ;    
 
-    plt.fill_between(pu_m.index, pu.resample('M').mean()   , pu.resample('M').quantile(0.75),facecolor='gray', alpha=0.18) ;    
+    plt.fill_between(pu_m.index, media   , q75,facecolor='gray', alpha=0.18) ;    
 #    plt.fill_between(pu_m.index, pu.resample('M').mean()   , pu.resample('M').quantile(0.95),facecolor='gray', alpha=0.18) ;    
     
     # quantile(0.75)*(pu.PM25.resample('M').std()/len(pu.PM25.resample('M'))) intervalo de confianza
@@ -92,137 +112,242 @@ def plot_m(pu , pu_m, titulo):
 ####################### Regressions #####################################
 #####################################################################
 
-from scipy.optimize import leastsq
-from PyEMD import EMD
+from __toolsHarmonic import ajuste_armonico, anio_fraccional
+from __toolsError import error_tendencia
 
 
-def Linear_trend_lastq(s):
+# All the estimators take the series s and, optionally, the time of each
+# sample t (fractional years, anio_fraccional). The default is t = 0..n-1.
+# NaN in s are left out of the fit, the fitted curve y is returned for every
+# t, and trend is in units of s per unit of t.
 
-    def model(t, coeffs):
-       return  coeffs[0] + coeffs[1]*t
-    
-    
-    def residuals(coeffs, y, t):
-        return y - model(t, coeffs)
-    
-    
-    x0 = np.array([1, 1 ], dtype=float)
-    
-    t = np.arange(len(s))
-    x, flag = leastsq(residuals, x0, args=(s, t))
-    y = model(t,x)
-    trend = (y[-1] - y[0])/len(y)
+def _tiempo(s, t):
+    return np.arange(len(s), dtype=np.float64) if t is None else np.asarray(t, dtype=np.float64)
+
+
+def _pendiente_curva(y, t):
+    # mean slope of a fitted curve, first to last valid point
+    y = np.asarray(y, dtype=np.float64)
+    valido = np.flatnonzero(~np.isnan(y))
+    if len(valido) < 2:
+        return np.nan
+    a, b = valido[0], valido[-1]
+    return (y[b] - y[a])/(t[b] - t[a])
+
+
+def Linear_trend_lastq(s, t=None):
+
+    t = _tiempo(s, t)
+    x, stderr, y = ajuste_armonico(s, armonicos=0, t=t)
+    trend = x[1]
     
     return y , trend
     
 
-def emd_trend(s):
+def emd_trend(s, t=None):
 
-    IMF = EMD().emd(s)
+    # PyEMD is imported only when EMD is used
+    from PyEMD import EMD
+    t = _tiempo(s, t)
+    s = np.asarray(s, dtype=np.float64)
+    valido = ~np.isnan(s)
+    IMF = EMD().emd(s[valido], t[valido])
     N = IMF.shape[0]+1
     
-    y = IMF[N-2,:]
+    # the residual of the decomposition, at the valid samples
+    y = np.interp(t, t[valido], IMF[N-2,:])
 #    trend = (y[-1] - y[0])/len(y)
-    trend = np.nanmean(np.diff(y))
+    trend = _pendiente_curva(y, t)
     
     return y , trend
 
 
 
-def lamsal_trend(s):
+def lamsal_trend(s, t=None, periodo=12, armonicos=9):
+    """
+    Linear trend plus 9 seasonal harmonics (Lamsal et al.), solved in closed
+    form by ajuste_armonico (__toolsHarmonic).
 
-    
-    def model(t, coeffs):
-       return  (coeffs[0] + coeffs[1]*t + coeffs[2]*np.sin(2*np.pi*t/12) + coeffs[3]*np.cos(2*np.pi*t/12) +
-                coeffs[4]*np.sin(4*np.pi*t/12) + coeffs[5]*np.cos(4*np.pi*t/12) + 
-                coeffs[6]*np.sin(6*np.pi*t/12) + coeffs[7]*np.cos(6*np.pi*t/12) +
-                coeffs[8]*np.sin(8*np.pi*t/12) + coeffs[9]*np.cos(8*np.pi*t/12) +
-                coeffs[10]*np.sin(10*np.pi*t/12) + coeffs[11]*np.cos(10*np.pi*t/12) +
-                coeffs[12]*np.sin(12*np.pi*t/12) + coeffs[13]*np.cos(12*np.pi*t/12) +
-                coeffs[14]*np.sin(14*np.pi*t/12) + coeffs[15]*np.cos(14*np.pi*t/12) +
-                coeffs[15]*np.sin(16*np.pi*t/12) + coeffs[16]*np.cos(16*np.pi*t/12) +
-                coeffs[17]*np.sin(18*np.pi*t/12) + coeffs[18]*np.cos(18*np.pi*t/12) 
-    )
-    
-    def residuals(coeffs, y, t):
-        return y - model(t, coeffs)
-    
-    
-    
-    x0 = np.array([1, 1 ,1, 1,1 ,1,1,1,1,1,1,1,1,1,1,1,1,1,1], dtype=float)
-    
-    t = np.arange(len(s))
-    x, flag = leastsq(residuals, x0, args=(s, t))
-    y = model(t,x)
+    periodo: length of the seasonal cycle in units of t, 1 with t in
+    fractional years, 12 for monthly means with t = 0..n-1.
+    armonicos: number of harmonics, 9 in Lamsal et al.
+    """
+    x, stderr, y = ajuste_armonico(s, periodo=periodo, armonicos=armonicos, t=t)
 #    y = x[0] + x[1]*t 
     trend = x[1]*1.03
     
     return y , trend
  
 
-def stl_trend(s_df):
+def stl_trend(s_df, t=None):
+    """
+    STL needs a regular series without gaps: the NaN of s_df are linearly
+    interpolated in t only for the decomposition.
+    """
 
     from statsmodels.tsa.seasonal import STL
-    stl = STL(s_df, seasonal=15)
+    t = _tiempo(s_df, t)
+    valido = s_df.notna().values
+    s_reg = s_df
+    if not valido.all():
+        s_reg = pd.Series(np.interp(t, t[valido], s_df.values[valido]), index=s_df.index)
+    stl = STL(s_reg, seasonal=15)
     res = stl.fit()
 
     y = res.trend
 #    trend = (y[-1] - y[0])/len(y)
-    trend = np.nanmean(np.diff(y))
+    trend = _pendiente_curva(y, t)
 
     return res.trend , trend
 
 
-from sklearn.linear_model import LinearRegression, TheilSenRegressor
+from __toolsSen import pendiente_sen
 
-def TheillSen_trend(s) :
-    t = np.arange(len(s))
-    X = t[:, np.newaxis]
-    
-    reg = TheilSenRegressor(random_state=0).fit(X, s)
-    y =  reg.predict(X)
-
-#    trend = (y[-1] - y[0])/len(y)
-    trend = np.nanmean(np.diff(y))
+def TheillSen_trend(s, t=None) :
+    """
+    Exact Sen slope (median of the pairwise slopes, see __toolsSen), NaN are
+    ignored.
+    """
+    t = _tiempo(s, t)
+    sen = pendiente_sen(s, t)
+    y = sen['intercepto'] + sen['pendiente']*t
+    trend = sen['pendiente']
 
     return y , trend
 
 
 
-def linear_trend(s) :
-    t = np.arange(len(s))
-    X = t[:, np.newaxis]
-    
-    reg = LinearRegression().fit(X, s)
-    y =  reg.predict(X)
+def linear_trend(s, t=None) :
+    t = _tiempo(s, t)
+    x, stderr, y = ajuste_armonico(s, armonicos=0, t=t)
 
 #    trend = (y[-1] - y[0])/len(y)
-    trend = np.nanmean(np.diff(y))
+    trend = x[1]
 
     return y , trend
 ############################################################## Tiao##################################################################
 
-def tiao(mod,obs) : 
+def tiao(mod,obs,t=None) : 
     """
     Tiao et al 1990 https://doi.org/10.1029/JD095iD12p20507
-    http://stackoverflow.com/q/14297012/190597
-    http://en.wikipedia.org/wiki/Autocorrelation#Estimation
+    Standard error of the trend (per unit of t, same units as the trend),
+    from the residuals obs - mod and their lag-1 autocorrelation. NaN are
+    ignored. See __toolsError.
     """
     
-    def autocorr(x):
-        x = pd.Series(x)
-        n = len(x)
-        variance = x.var()
-        x = x-x.mean()
-        r = np.correlate(x, x, mode = 'full')[-n:]
-        result = r/(variance*(np.arange(n, 0, -1)))
-        return result
-
-    
-    residuo = obs - mod
-    Tiao  = (1-autocorr(mod)[1])**(-1/2)*np.std(residuo)*0.023/12      
-    
-    return Tiao
+    return error_tendencia(np.asarray(obs, dtype=np.float64) - np.asarray(mod, dtype=np.float64), t)
     
 ########## Error de la tendencia #########################################################################3
 
+
+########## Registro de metodos #########################################################################
+
+# Common result of every trend method:
+#   ajuste   : fitted values, float64 array, one per sample
+#   pendiente: trend per unit of t (per year with fractional years)
+#   error    : Tiao/Weatherhead standard error of the trend, same units
+#   segundos : run time of the fit
+ResultadoTendencia = namedtuple('ResultadoTendencia', ['ajuste', 'pendiente', 'error', 'segundos'])
+
+# name -> function(s, t, **opciones) returning (y, trend). The heavy packages
+# (PyEMD, statsmodels) are imported inside the functions, when first used.
+METODOS_TENDENCIA = {}
+
+
+def registrar_metodo(nombre):
+    """
+    Decorator, adds a trend method to METODOS_TENDENCIA. The function takes
+    the series s (array, or Series for methods that need the dates), the
+    times t and options, and returns (fitted values, trend per unit of t).
+    """
+    def decorador(func):
+        METODOS_TENDENCIA[nombre] = func
+        return func
+    return decorador
+
+
+@registrar_metodo('Lamsal')
+def _lamsal(s, t, periodo=1, armonicos=9):
+    # periodo in units of t, one year with fractional years. The trend is the
+    # fitted slope, without the 1.03 factor of lamsal_trend (the Tololo
+    # graphs apply it, see __TrendGraphs.CORRECCION_LAMSAL)
+    x, stderr, y = ajuste_armonico(np.asarray(s, dtype=np.float64), periodo=periodo,
+                                   armonicos=armonicos, t=t)
+    return y, x[1]
+
+
+@registrar_metodo('Linear')
+def _linear(s, t):
+    return linear_trend(np.asarray(s, dtype=np.float64), t)
+
+
+@registrar_metodo('EMD')
+def _emd(s, t):
+    return emd_trend(np.asarray(s, dtype=np.float64), t)
+
+
+@registrar_metodo('STL')
+def _stl(s, t):
+    if not isinstance(s, pd.Series):
+        raise TypeError('STL needs a Series with a regular DatetimeIndex')
+    return stl_trend(s, t)
+
+
+@registrar_metodo('ThielSen')
+def _thielsen(s, t):
+    return TheillSen_trend(np.asarray(s, dtype=np.float64), t)
+
+
+def ajustar_tendencia(metodo, s, t=None, **opciones):
+    """
+    Fit one of the registered trend methods.
+
+    Parameters
+    ----------
+    metodo : str
+        Key of METODOS_TENDENCIA, 'Lamsal', 'Linear', 'EMD', 'STL' or
+        'ThielSen'.
+    s : array or Series
+        Series, NaN are skipped.
+    t : array, optional
+        Time of each sample. The default is the fractional year of the index
+        of s if it is a Series with dates, else 0..n-1.
+    **opciones
+        Passed to the method if it takes them, e.g. periodo and armonicos
+        for 'Lamsal'. The seasonal methods (with a periodo option) need
+        periodo when s has no dates and t is not given, the default period
+        of one year only makes sense in fractional years.
+
+    Returns
+    -------
+    ResultadoTendencia
+    """
+    if metodo not in METODOS_TENDENCIA:
+        raise ValueError('Unknown trend method: ' + str(metodo))
+    func = METODOS_TENDENCIA[metodo]
+    parametros = inspect.signature(func).parameters
+    opciones = {k: v for k, v in opciones.items() if k in parametros}
+    if t is None and isinstance(getattr(s, 'index', None), pd.DatetimeIndex):
+        t = anio_fraccional(s.index)
+    elif t is None and 'periodo' in parametros and 'periodo' not in opciones:
+        raise ValueError(metodo + ' needs periodo (length of the seasonal cycle in '
+                         'units of t) for a series without dates')
+    t = _tiempo(s, t)
+    inicio = time.perf_counter()
+    y, trend = func(s, t, **opciones)
+    ajuste = np.asarray(y, dtype=np.float64)
+    error = tiao(ajuste, np.asarray(s, dtype=np.float64), t)
+    return ResultadoTendencia(ajuste, float(trend), float(error), time.perf_counter() - inicio)
+
+
+def comparar_tendencias(s, t=None, metodos=None, **opciones):
+    """
+    Fit several registered methods to the same series, e.g. to compare or
+    benchmark them. opciones as in ajustar_tendencia.
+
+    Returns
+    -------
+    dict
+        metodo -> ResultadoTendencia, for metodos (default: all of them).
+    """
+    return {m: ajustar_tendencia(m, s, t, **opciones) for m in (metodos or METODOS_TENDENCIA)}
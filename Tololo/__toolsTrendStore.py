@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:03:37 2026
+
+Precomputed trends of the Tololo dashboard.
+
+The trend graphs only offer a few combinations (COMBINACIONES): registered
+method (__toolsTrend.METODOS_TENDENCIA) x level of the pyramid (daily or
+monthly means) x start year of the window.
+The data do not change while the server runs, so all of them are computed
+once, at startup, in a pool of worker processes, and the callbacks only look
+them up (TablaTendencias.obtener). A callback that arrives before its
+combination is ready waits for that one only.
+
+The results are saved in DATA next to the pyramid (TOLOLO-trends.json with
+slopes, errors and run times, TOLOLO-trends.npz with the fitted curves) and
+read again at the next startup, unless the pyramid they were computed from
+changed (same signature as load_pyramid).
+"""
+
+import os
+import json
+import zipfile
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from __toolsStore import ventana, _firma_serie, STORE_VERSION
+from __toolsTrend import ajustar_tendencia, ResultadoTendencia, METODOS_TENDENCIA
+
+METODOS = list(METODOS_TENDENCIA)
+# Levels of the pyramid and start of the window of the Spanish ('1997') and
+# English ('2012') graphs
+COMBINACIONES = [(metodo, nivel, desde) for metodo in METODOS
+                 for nivel in ('D', 'M') for desde in ('1997', '2012')]
+FIN = '2020'
+# Version of the saved results, 2: Lamsal slope without the 1.03 factor
+TENDENCIAS_VERSION = 2
+
+
+def medias_tendencia(piramide, nivel, desde):
+    """
+    Means of the level nivel of the pyramid used by the trends, values below
+    20 ppbv and gaps are NaN.
+
+    Returns
+    -------
+    DataFrame with the column O3_ppbv
+    """
+    df_m = ventana(piramide[nivel], desde, FIN)[['mean']].rename(columns={'mean': 'O3_ppbv'})
+    return df_m.where(df_m >= 20)
+
+
+def calcular_tendencia(s_df, metodo):
+    """
+    Fit one registered trend method (__toolsTrend.ajustar_tendencia) to the
+    series s_df (index of dates, NaN allowed), on fractional years.
+
+    Returns
+    -------
+    ResultadoTendencia
+    """
+    return ajustar_tendencia(metodo, s_df)
+
+
+def _firma_piramide(piramide):
+    return {nivel: _firma_serie(piramide[nivel]['mean']) for nivel in ('D', 'M')}
+
+
+def _clave(metodo, nivel, desde):
+    return metodo + '|' + nivel + '|' + desde
+
+
+class TablaTendencias:
+    """
+    Results of calcular_tendencia for every combination, for one pyramid.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.resultados = {}
+        self.futuros = {}
+        self.piramide = None
+        self.firma = None
+        self.fns = None
+
+    def iniciar(self, piramide, datadir, n_workers=None, nombre='TOLOLO-trends'):
+        """
+        Read the saved results of piramide or start computing the missing
+        ones in the background. Nothing is started inside a worker process
+        (the dashboard module is imported again by the workers on Windows).
+        Call it once, from the process that serves the app (not in the
+        watcher process of the debug reloader).
+        """
+        if multiprocessing.parent_process() is not None:
+            return
+        with self.lock:
+            self.piramide = piramide
+            self.firma = _firma_piramide(piramide)
+            self.resultados, self.futuros = {}, {}
+            self.fns = (os.path.join(datadir, nombre + '.json'),
+                        os.path.join(datadir, nombre + '.npz'))
+            self._leer()
+            faltan = [c for c in COMBINACIONES if _clave(*c) not in self.resultados]
+            if not faltan:
+                return
+            n_workers = n_workers or max(1, min(len(faltan), (os.cpu_count() or 2) - 1))
+            pool = ProcessPoolExecutor(max_workers=n_workers)
+            for metodo, nivel, desde in faltan:
+                self.futuros[_clave(metodo, nivel, desde)] = pool.submit(
+                    calcular_tendencia, medias_tendencia(piramide, nivel, desde).O3_ppbv, metodo)
+        threading.Thread(target=self._recoger, args=(pool, self.firma), daemon=True).start()
+
+    def _recoger(self, pool, firma):
+        # Wait for all the results, then save them
+        for clave, futuro in list(self.futuros.items()):
+            try:
+                resultado = futuro.result()
+            except Exception:
+                # computed again (and raised) by the callback that asks for it
+                continue
+            with self.lock:
+                if self.firma is firma:
+                    self.resultados[clave] = resultado
+        pool.shutdown()
+        with self.lock:
+            if self.firma is firma:
+                self.futuros = {}
+                self._guardar()
+
+    def _leer(self):
+        fn_json, fn_npz = self.fns
+        if not (os.path.isfile(fn_json) and os.path.isfile(fn_npz)):
+            return
+        try:
+            with open(fn_json) as f:
+                manifest = json.load(f)
+            if (manifest.get('version') != STORE_VERSION or manifest.get('tendencias') != TENDENCIAS_VERSION
+                    or manifest.get('piramide') != self.firma):
+                return
+            with np.load(fn_npz) as curvas:
+                resultados = {clave: ResultadoTendencia(**dict(r, ajuste=curvas[clave]))
+                              for clave, r in manifest['resultados'].items()
+                              if clave in curvas.files}
+        except (ValueError, OSError, EOFError, zipfile.BadZipFile):
+            # damaged files, as if there were no saved results
+            return
+        self.resultados.update(resultados)
+
+    def _guardar(self):
+        fn_json, fn_npz = self.fns
+        # The manifest is written last, results without manifest are not read.
+        # Both files are written to .tmp and moved into place
+        if os.path.isfile(fn_json):
+            os.remove(fn_json)
+        with open(fn_npz + '.tmp', 'wb') as f:
+            np.savez(f, **{clave: r.ajuste for clave, r in self.resultados.items()})
+        os.replace(fn_npz + '.tmp', fn_npz)
+        manifest = {'version': STORE_VERSION, 'tendencias': TENDENCIAS_VERSION, 'piramide': self.firma,
+                    'resultados': {clave: {k: v for k, v in r._asdict().items() if k != 'ajuste'}
+                                   for clave, r in self.resultados.items()}}
+        with open(fn_json + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(fn_json + '.tmp', fn_json)
+
+    def obtener(self, piramide, metodo, nivel, desde):
+        """
+        Result of calcular_tendencia for one combination. Computed here if
+        piramide is not the one of the table or the combination is not
+        precomputed.
+        """
+        clave = _clave(metodo, nivel, desde)
+        with self.lock:
+            propia = piramide is self.piramide
+            resultado = self.resultados.get(clave) if propia else None
+            futuro = self.futuros.get(clave) if propia else None
+        if resultado is not None:
+            return resultado
+        if futuro is not None:
+            try:
+                return futuro.result()
+            except Exception:
+                pass
+        return calcular_tendencia(medias_tendencia(piramide, nivel, desde).O3_ppbv, metodo)
+
+
+TENDENCIAS = TablaTendencias()
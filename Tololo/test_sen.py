@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:52:06 2026
+
+Sen slope of __toolsSen against the median of all the pair slopes.
+"""
+
+import numpy as np
+from __toolsSen import sen, pendiente_sen
+
+
+def pendientes(y, t):
+    i, j = np.triu_indices(len(y), 1)
+    ok = t[i] != t[j]
+    return np.sort((y[j] - y[i])[ok]/(t[j] - t[i])[ok])
+
+
+def test_sen_empates():
+    # Quantized series, most of the slopes tied at the median
+    y = np.random.default_rng(0).integers(0, 3, 2000)*1.0
+    t = np.arange(len(y), dtype=np.float64)
+    assert sen(y)[0] == np.median(pendientes(y, t))
+
+
+def test_sen_intervalo_empates():
+    y = np.random.default_rng(1).integers(0, 5, 2500)*1.0
+    t = np.arange(len(y), dtype=np.float64)
+    sl = pendientes(y, t)
+    r = pendiente_sen(y, t)
+    assert r['pendiente'] == np.median(sl)
+    assert sl[0] <= r['inferior'] <= r['pendiente'] <= r['superior'] <= sl[-1]